@@ -3,29 +3,49 @@ Flask API for accessing Google Sheets data (Film data)
 This API serves as a backend for the Performance Surgery Schedule system.
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
 from flask_compress import Compress
 import os
 import sys
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime, timedelta
-from functools import wraps
 import gspread
-from google.oauth2.service_account import Credentials
 from dotenv import load_dotenv
 import requests
 import json
-from facebook_business.api import FacebookAdsApi
-from facebook_business.adobjects.adaccount import AdAccount
-from google.ads.googleads.client import GoogleAdsClient
 from google.ads.googleads.errors import GoogleAdsException
-from db_connection import get_db_connection
+from db_connection import get_db_pool
 from psycopg2 import Error
+from psycopg2.pool import PoolError
 
 # Import Call Matrix services
 from services.google_sheets import GoogleSheetsService
 from services.call_matrix import CallMatrixService
+from services.call_counts import CALL_EVENTS_COMPACT_INTERVAL, CALL_MATRIX_FLUSH_INTERVAL
+from services.sheets_client import MissingColumnsError, get_sheets_registry
+from services.sheet_snapshots import get_snapshot_cache
+from services.call_log import get_call_log_reader
+from services.call_matrix_index import (
+    MIN_DURATION_SECONDS, TARGET_AGENTS, TIME_SLOTS, get_call_matrix_indexer
+)
+from services.response_cache import ResponseCache, is_refresh_request
+from services.prefetch import PrefetchScheduler, PREFETCH_ENABLED
+from services.cache_backend import CACHE_SWEEP_INTERVAL, get_cache_backend
+from services.facebook_insights import (
+    FB_ADS_CACHE_DURATION, InsightsQuery, ReportRunTimeout, get_facebook_insights_service
+)
+from services.google_ads_client import get_google_ads_client_manager
+from services.google_ads_report import GOOGLE_ADS_CACHE_DURATION, get_google_ads_report_service
+from services.sheets_read_model import (
+    FILM_CONTACT_COLUMNS, SHEETS_DATA_COLUMNS, ReadModelUnavailable, get_sheets_read_model
+)
+from services.bjh_leads import (
+    DATA_BJH_MAX_PAGE_SIZE, LEADS_SOURCE, InvalidLeadsQuery, build_leads_query, decode_cursor,
+    encode_cursor, estimate_row_count, exact_row_count, get_table_info, iter_leads
+)
 
 # Load environment variables
 load_dotenv()
@@ -33,7 +53,9 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 
-# Enable response compression (gzip)
+# Enable response compression (gzip); streamed responses are sent as-is, since
+# compressing them would buffer the whole body and defeat streaming
+app.config['COMPRESS_STREAMS'] = False
 Compress(app)
 
 # Configure CORS for production
@@ -45,74 +67,54 @@ CORS(app, resources={
     }
 })
 
-# In-memory cache
-cache = {
-    'data': None,
-    'timestamp': None,
-    'expires_at': None
-}
+# Cache backend shared by all gunicorn workers (SQLite file by default, see CACHE_BACKEND)
+cache_backend = get_cache_backend()
+
+# Response cache (keyed by route + query string + JSON body, LRU bounded)
 CACHE_DURATION = int(os.getenv('CACHE_DURATION', 30))  # seconds
+DATA_BJH_CACHE_DURATION = int(os.getenv('DATA_BJH_CACHE_DURATION', 60))  # seconds
+response_cache = ResponseCache(cache_backend)
 
-# Facebook Ads cache (แยกออกมาต่างหาก)
-fb_ads_cache = {
-    'data': {},  # เก็บตาม cache_key
-    'timestamps': {},
-    'expires_at': {}
-}
-FB_ADS_CACHE_DURATION = int(os.getenv('FB_ADS_CACHE_DURATION', 300))  # 5 นาที (300 วินาที)
+# Facebook Ads insights (sync/async report runs, cached in namespace 'facebook_ads')
+facebook_insights = get_facebook_insights_service()
+
+# PostgreSQL connection pool (per worker, remembers the last reachable host)
+db_pool = get_db_pool()
+
+# Google Ads client + GoogleAdsService stub built once per worker, token refreshed in background
+google_ads_clients = get_google_ads_client_manager()
+# Google Ads reports built from per-(customer, campaign, day) totals in namespace 'google_ads_days'
+google_ads_reports = get_google_ads_report_service()
+
+# Shared gspread client + Spreadsheet/Worksheet handle pool (read-only scopes, used by every read route)
+sheets_registry = get_sheets_registry(readonly=True)
+# Separate read-write client, used only by the Call Matrix writes
+sheets_write_registry = get_sheets_registry()
+
+# Raw worksheet values shared by every Sheets route (TTL + revision check + single-flight)
+sheet_snapshots = get_snapshot_cache()
+
+# Append-only 'สรุป call_AI' call log, synced incrementally
+call_log_reader = get_call_log_reader()
+
+# Per-day agent x time-slot counts built from the call log (only new rows are parsed)
+call_matrix_indexer = get_call_matrix_indexer()
+
+# Typed, indexed PostgreSQL mirror of the Sheets (see SHEETS_READ_MODEL_ENABLED); routes fall back
+# to the sheets above whenever it is disabled, stale or unreachable
+sheets_read_model = get_sheets_read_model()
 
 # Initialize Call Matrix services
-sheets_service = GoogleSheetsService()
+sheets_service = GoogleSheetsService(
+    sheets_write_registry, sheet_snapshots, call_log_reader, call_matrix_indexer, sheets_read_model
+)
 call_matrix_service = CallMatrixService(sheets_service)
 
 
 def get_google_sheets_client():
-    """Initialize Google Sheets client with service account credentials"""
+    """Return the process-wide gspread client (authorized once per worker)"""
     try:
-        # Get credentials from environment variables
-        project_id = os.getenv('GOOGLE_PROJECT_ID')
-        private_key_id = os.getenv('GOOGLE_PRIVATE_KEY_ID')
-        private_key = os.getenv('GOOGLE_SERVICE_ACCOUNT_PRIVATE_KEY', '')
-        client_email = os.getenv('GOOGLE_SERVICE_ACCOUNT_EMAIL')
-        client_id = os.getenv('GOOGLE_CLIENT_ID')
-        client_cert_url = os.getenv('GOOGLE_CLIENT_CERT_URL')
-
-        if not client_email or not private_key:
-            raise ValueError("Missing required Google credentials in environment variables")
-
-        # Replace escaped newlines in private key if needed
-        if '\\n' in private_key:
-            private_key = private_key.replace('\\n', '\n')
-
-        # Construct service account credentials
-        credentials_dict = {
-            "type": "service_account",
-            "project_id": project_id,
-            "private_key_id": private_key_id,
-            "private_key": private_key,
-            "client_email": client_email,
-            "client_id": client_id,
-            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-            "token_uri": "https://oauth2.googleapis.com/token",
-            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-            "client_x509_cert_url": client_cert_url
-        }
-
-        # Define the required scopes
-        scopes = [
-            'https://www.googleapis.com/auth/spreadsheets.readonly',
-            'https://www.googleapis.com/auth/drive.readonly'
-        ]
-
-        # Create credentials
-        credentials = Credentials.from_service_account_info(
-            credentials_dict,
-            scopes=scopes
-        )
-
-        # Authorize and return client
-        client = gspread.authorize(credentials)
-        return client
+        return sheets_registry.client
 
     except Exception as e:
         print(f"Error initializing Google Sheets client: {e}")
@@ -130,17 +132,8 @@ def fetch_film_data():
 
         print(f"📊 Fetching data from Google Sheets: {spreadsheet_id}")
 
-        # Get Google Sheets client
-        client = get_google_sheets_client()
-
-        # Open the spreadsheet
-        spreadsheet = client.open_by_key(spreadsheet_id)
-
-        # Get the 'Film data' sheet
-        sheet = spreadsheet.worksheet('Film data')
-
-        # Get all values from the sheet
-        all_values = sheet.get_all_values()
+        # Get all values from the 'Film data' sheet (shared snapshot)
+        all_values = sheet_snapshots.get_values(spreadsheet_id, 'Film data')
 
         if not all_values:
             return []
@@ -184,160 +177,6 @@ def fetch_film_data():
         raise
 
 
-def fetch_call_ai_data():
-    """Fetch data from Google Sheets 'สรุป call_AI' sheet"""
-    try:
-        # Get spreadsheet ID from environment
-        spreadsheet_id = os.getenv('GOOGLE_SPREADSHEET_ID')
-        if not spreadsheet_id:
-            raise ValueError("GOOGLE_SPREADSHEET_ID not set in environment variables")
-
-        print(f"📊 Fetching data from สรุป call_AI sheet: {spreadsheet_id}")
-
-        # Get Google Sheets client
-        client = get_google_sheets_client()
-
-        # Open the spreadsheet
-        spreadsheet = client.open_by_key(spreadsheet_id)
-
-        # Get the 'สรุป call_AI' sheet
-        sheet = spreadsheet.worksheet('สรุป call_AI')
-
-        # Get all values from the sheet
-        all_values = sheet.get_all_values()
-
-        if not all_values:
-            return []
-
-        # First row is header
-        headers = all_values[0]
-        data_rows = all_values[1:]
-
-        # Debug: Print headers and sample data
-        print(f"📋 Headers found in สรุป call_AI sheet: {headers}")
-        if data_rows:
-            print(f"📝 Sample row (first): {data_rows[0]}")
-
-        # Convert to list of dictionaries
-        result = []
-        for idx, row in enumerate(data_rows, start=2):  # Start from row 2 (1-indexed)
-            # Create dictionary with headers as keys
-            row_dict = {}
-            for col_idx, header in enumerate(headers):
-                value = row[col_idx] if col_idx < len(row) else ''
-                row_dict[header] = value
-
-            result.append(row_dict)
-
-        print(f"✅ Successfully fetched {len(result)} records from สรุป call_AI sheet")
-        return result
-
-    except gspread.exceptions.WorksheetNotFound:
-        print("❌ Worksheet 'สรุป call_AI' not found")
-        raise ValueError("Worksheet 'สรุป call_AI' not found in spreadsheet")
-    except gspread.exceptions.SpreadsheetNotFound:
-        print("❌ Spreadsheet not found")
-        raise ValueError("Spreadsheet not found. Check GOOGLE_SPREADSHEET_ID and service account permissions")
-    except Exception as e:
-        print(f"❌ Error fetching data: {e}")
-        traceback.print_exc()
-        raise
-
-
-def parse_duration_to_seconds(duration_str):
-    """Parse duration string (H:MM:SS or MM:SS) to total seconds"""
-    try:
-        if not duration_str or duration_str.strip() == '':
-            return 0
-        
-        parts = duration_str.strip().split(':')
-        
-        if len(parts) == 3:  # H:MM:SS
-            hours, minutes, seconds = map(int, parts)
-            return hours * 3600 + minutes * 60 + seconds
-        elif len(parts) == 2:  # MM:SS
-            minutes, seconds = map(int, parts)
-            return minutes * 60 + seconds
-        else:
-            return 0
-            
-    except (ValueError, AttributeError):
-        return 0
-
-
-def parse_google_sheets_datetime(datetime_str):
-    """
-    Parse Google Sheets datetime format to standard format
-    Input: '7/11/2025, 11:46:51' (DD/MM/YYYY, HH:MM:SS)
-    Output: {'date': '2025-11-07', 'time': '11:46:51', 'hour': 11}
-    """
-    try:
-        if not datetime_str or datetime_str.strip() == '':
-            return None
-        
-        # Split by comma to separate date and time
-        parts = datetime_str.strip().split(',')
-        if len(parts) != 2:
-            return None
-        
-        date_part = parts[0].strip()  # '7/11/2025'
-        time_part = parts[1].strip()  # '11:46:51'
-        
-        # Parse date (DD/MM/YYYY)
-        date_components = date_part.split('/')
-        if len(date_components) != 3:
-            return None
-        
-        day = int(date_components[0])
-        month = int(date_components[1])
-        year = int(date_components[2])
-        
-        # Convert to YYYY-MM-DD format
-        formatted_date = f"{year:04d}-{month:02d}-{day:02d}"
-        
-        # Parse hour from time
-        time_components = time_part.split(':')
-        hour = int(time_components[0]) if time_components else 0
-        
-        return {
-            'date': formatted_date,
-            'time': time_part,
-            'hour': hour,
-            'datetime': datetime_str
-        }
-        
-    except (ValueError, AttributeError, IndexError):
-        return None
-
-
-def cache_data(func):
-    """Decorator to cache data for specified duration"""
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        global cache
-        now = datetime.now()
-
-        # Check if cache is valid
-        if (cache['data'] is not None and 
-            cache['expires_at'] is not None and 
-            now < cache['expires_at']):
-            print(f"✅ Returning cached data (expires in {(cache['expires_at'] - now).seconds}s)")
-            return cache['data']
-
-        # Fetch new data
-        print("📡 Cache expired or empty, fetching fresh data...")
-        data = func(*args, **kwargs)
-
-        # Update cache
-        cache['data'] = data
-        cache['timestamp'] = now
-        cache['expires_at'] = now + timedelta(seconds=CACHE_DURATION)
-
-        return data
-
-    return wrapper
-
-
 @app.route('/')
 def index():
     """Root endpoint"""
@@ -364,8 +203,11 @@ def index():
             '/api/call-matrix/agent/<agent_id>': 'Get call summary for specific agent (GET)',
             '/api/call-matrix/time-slot/<time_slot>': 'Get call summary for specific time slot (GET)',
             '/api/call-matrix/log': 'Log a call for an agent (POST)',
+            '/api/call-matrix/log/bulk': 'Log many calls from an NDJSON body, one call event per line (POST)',
             '/api/call-matrix/update': 'Update call count manually (POST)',
-            '/api/call-matrix/batch-update': 'Batch update call counts (POST)'
+            '/api/call-matrix/batch-update': 'Batch update call counts (POST)',
+            '/api/call-matrix/rebuild': 'Rebuild the call matrix of a day from logged call events; only today replaces the live matrix (POST)',
+            '/api/dashboard': 'Get every dashboard section in one request, fetched concurrently (GET)'
         }
     })
 
@@ -377,21 +219,29 @@ def health():
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'cache_status': {
-            'google_sheets': {
-                'has_data': cache['data'] is not None,
-                'cached_at': cache['timestamp'].isoformat() if cache['timestamp'] else None,
-                'expires_at': cache['expires_at'].isoformat() if cache['expires_at'] else None
-            },
-            'facebook_ads': {
-                'cached_keys': len(fb_ads_cache['data']),
-                'cache_duration': FB_ADS_CACHE_DURATION
-            }
-        }
+            'responses': response_cache.status(),
+            'facebook_ads': facebook_insights.status(),
+            'google_ads': google_ads_reports.status(),
+            'backend': cache_backend.status()
+        },
+        'prefetch': prefetch_scheduler.status(),
+        'maintenance': maintenance_scheduler.status(),
+        'google_sheets_client': sheets_registry.status(),
+        'google_sheets_write_client': sheets_write_registry.status(),
+        'google_ads_client': google_ads_clients.status(),
+        'database': db_pool.status(),
+        'sheet_snapshots': sheet_snapshots.status(),
+        'call_log': call_log_reader.status(),
+        'call_matrix_index': call_matrix_indexer.status(),
+        'sheets_read_model': sheets_read_model.status(),
+        'call_counts': call_matrix_service.store.status(),
+        'call_events': call_matrix_service.events.status(),
+        'call_matrix_layout': sheets_service.layouts.status()
     })
 
 
 @app.route('/api/film-data', methods=['GET'])
-@cache_data
+@response_cache.cached(ttl=CACHE_DURATION)
 def get_film_data():
     """Get surgery schedule data from Google Sheets 'Film data' sheet"""
     try:
@@ -405,10 +255,8 @@ def get_film_data():
             'total': len(data),
             'timestamp': datetime.now().isoformat(),
             'source': 'Google Sheets (Film data)',
-            'cached': cache['data'] is not None,
             'cache_info': {
-                'duration': CACHE_DURATION,
-                'expires_at': cache['expires_at'].isoformat() if cache['expires_at'] else None
+                'duration': CACHE_DURATION
             }
         }
 
@@ -447,17 +295,8 @@ def get_google_sheets_all_data():
 
         print(f"📊 Fetching all raw data from Google Sheets: {spreadsheet_id}")
 
-        # Get Google Sheets client
-        client = get_google_sheets_client()
-
-        # Open the spreadsheet
-        spreadsheet = client.open_by_key(spreadsheet_id)
-
-        # Get the 'Film data' sheet
-        sheet = spreadsheet.worksheet('Film data')
-
-        # Get all values from the sheet (including headers)
-        all_values = sheet.get_all_values()
+        # Get all values from the 'Film data' sheet (including headers) (shared snapshot)
+        all_values = sheet_snapshots.get_values(spreadsheet_id, 'Film data')
 
         if not all_values:
             return jsonify({
@@ -544,7 +383,97 @@ def get_google_sheets_all_data():
         }), 500
 
 
+def scan_film_contacts(all_values, target_date=None):
+    """Scan the projected 'Film data' contact columns row by row (used when the read model is unavailable)
+
+    Returns (rows, consult_date_counts, surgery_date_counts), counts keyed by YYYY-MM-DD.
+    """
+    if not all_values or len(all_values) < 2:
+        return [], {}, {}
+
+    # Skip the header row
+    data_rows = all_values[1:]
+
+    # Projected columns come back in the requested order
+    contact_col, consult_date_col, surgery_date_col = 0, 1, 2
+
+    # Helper function to parse and normalize date
+    def normalize_date(date_str):
+        """แปลงวันที่จาก DD/MM/YYYY หรือ YYYY-MM-DD เป็น YYYY-MM-DD"""
+        if not date_str or not date_str.strip():
+            return None
+        
+        date_str = date_str.strip()
+        
+        try:
+            # ลอง DD/MM/YYYY (รูปแบบจาก Google Sheets)
+            if '/' in date_str:
+                parts = date_str.split('/')
+                if len(parts) == 3:
+                    day, month, year = int(parts[0]), int(parts[1]), int(parts[2])
+                    return f"{year:04d}-{month:02d}-{day:02d}"
+            
+            # ลอง YYYY-MM-DD
+            elif '-' in date_str:
+                datetime.strptime(date_str, '%Y-%m-%d')
+                return date_str
+            
+            return None
+        except (ValueError, IndexError):
+            return None
+    
+    # Extract data
+    result = []
+    consult_date_counts = {}  # นับจำนวน consult แต่ละวัน
+    surgery_date_counts = {}  # นับจำนวนผ่าตัดแต่ละวัน
+    
+    for idx, row in enumerate(data_rows, start=2):  # Start from row 2 (1-indexed)
+        if len(row) <= max(contact_col, consult_date_col, surgery_date_col):
+            continue
+
+        contact_person = row[contact_col].strip() if contact_col < len(row) else ''
+        consult_date_raw = row[consult_date_col].strip() if consult_date_col < len(row) else ''
+        surgery_date_raw = row[surgery_date_col].strip() if surgery_date_col < len(row) else ''
+
+        # แปลงวันที่เป็นรูปแบบมาตรฐาน YYYY-MM-DD
+        consult_date_normalized = normalize_date(consult_date_raw)
+        surgery_date_normalized = normalize_date(surgery_date_raw)
+
+        # Skip empty rows
+        if not contact_person and not consult_date_raw and not surgery_date_raw:
+            continue
+        
+        # กรองตามวันที่ถ้ามีการระบุ
+        if target_date:
+            # ตรวจสอบว่ามีวันที่ตรงกับที่กรองหรือไม่ (เทียบรูปแบบ normalized)
+            if consult_date_normalized != target_date and surgery_date_normalized != target_date:
+                continue
+
+        result.append({
+            'id': f'film-{idx}',
+            'ผู้ติดต่อ': contact_person,
+            'วันที่ได้นัด consult': consult_date_raw,
+            'วันที่ได้นัดผ่าตัด': surgery_date_raw,
+            # English field names for easier access
+            'contact_person': contact_person,
+            'consult_date': consult_date_raw,
+            'consult_date_normalized': consult_date_normalized,
+            'surgery_appointment_date': surgery_date_raw,
+            'surgery_appointment_date_normalized': surgery_date_normalized
+        })
+        
+        # นับจำนวนตามวันที่ (ใช้รูปแบบ normalized)
+        if consult_date_normalized:
+            consult_date_counts[consult_date_normalized] = consult_date_counts.get(consult_date_normalized, 0) + 1
+        
+        if surgery_date_normalized:
+            surgery_date_counts[surgery_date_normalized] = surgery_date_counts.get(surgery_date_normalized, 0) + 1
+
+    return result, consult_date_counts, surgery_date_counts
+
+
 @app.route('/api/film-data-contacts', methods=['GET'])
+@response_cache.cached(ttl=CACHE_DURATION)
 def get_film_data_contacts():
     """
     Get specific columns from Google Sheets 'Film data' sheet
@@ -572,72 +501,6 @@ def get_film_data_contacts():
         if not spreadsheet_id:
             raise ValueError("GOOGLE_SPREADSHEET_ID not set in environment variables")
 
-        print(f"📊 Fetching contact data from Google Sheets 'Film data': {spreadsheet_id}")
-
-        # Get Google Sheets client
-        client = get_google_sheets_client()
-
-        # Open the spreadsheet
-        spreadsheet = client.open_by_key(spreadsheet_id)
-
-        # Get the 'Film data' sheet
-        sheet = spreadsheet.worksheet('Film data')
-
-        # Get all values from the sheet
-        all_values = sheet.get_all_values()
-
-        if not all_values or len(all_values) < 2:
-            return jsonify({
-                'success': True,
-                'data': [],
-                'total': 0,
-                'timestamp': datetime.now().isoformat(),
-                'source': 'Google Sheets (Film data)'
-            })
-
-        # Get headers
-        headers = all_values[0]
-        data_rows = all_values[1:]
-
-        # Find column indexes for required fields
-        try:
-            contact_col = headers.index('ผู้ติดต่อ')
-            consult_date_col = headers.index('วันที่ได้นัด consult')
-            surgery_date_col = headers.index('วันที่ได้นัดผ่าตัด')
-        except ValueError as e:
-            return jsonify({
-                'success': False,
-                'error': f'Required column not found: {str(e)}',
-                'available_columns': headers,
-                'data': [],
-                'timestamp': datetime.now().isoformat()
-            }), 400
-
-        # Helper function to parse and normalize date
-        def normalize_date(date_str):
-            """แปลงวันที่จาก DD/MM/YYYY หรือ YYYY-MM-DD เป็น YYYY-MM-DD"""
-            if not date_str or not date_str.strip():
-                return None
-            
-            date_str = date_str.strip()
-            
-            try:
-                # ลอง DD/MM/YYYY (รูปแบบจาก Google Sheets)
-                if '/' in date_str:
-                    parts = date_str.split('/')
-                    if len(parts) == 3:
-                        day, month, year = int(parts[0]), int(parts[1]), int(parts[2])
-                        return f"{year:04d}-{month:02d}-{day:02d}"
-                
-                # ลอง YYYY-MM-DD
-                elif '-' in date_str:
-                    datetime.strptime(date_str, '%Y-%m-%d')
-                    return date_str
-                
-                return None
-            except (ValueError, IndexError):
-                return None
-        
         # กำหนดวันที่สำหรับกรอง
         target_date = None
         if filter_today:
@@ -655,52 +518,21 @@ def get_film_data_contacts():
                     'timestamp': datetime.now().isoformat()
                 }), 400
         
-        # Extract data
-        result = []
-        consult_date_counts = {}  # นับจำนวน consult แต่ละวัน
-        surgery_date_counts = {}  # นับจำนวนผ่าตัดแต่ละวัน
-        
-        for idx, row in enumerate(data_rows, start=2):  # Start from row 2 (1-indexed)
-            if len(row) <= max(contact_col, consult_date_col, surgery_date_col):
-                continue
-
-            contact_person = row[contact_col].strip() if contact_col < len(row) else ''
-            consult_date_raw = row[consult_date_col].strip() if consult_date_col < len(row) else ''
-            surgery_date_raw = row[surgery_date_col].strip() if surgery_date_col < len(row) else ''
-
-            # แปลงวันที่เป็นรูปแบบมาตรฐาน YYYY-MM-DD
-            consult_date_normalized = normalize_date(consult_date_raw)
-            surgery_date_normalized = normalize_date(surgery_date_raw)
-
-            # Skip empty rows
-            if not contact_person and not consult_date_raw and not surgery_date_raw:
-                continue
-            
-            # กรองตามวันที่ถ้ามีการระบุ
-            if target_date:
-                # ตรวจสอบว่ามีวันที่ตรงกับที่กรองหรือไม่ (เทียบรูปแบบ normalized)
-                if consult_date_normalized != target_date and surgery_date_normalized != target_date:
-                    continue
-
-            result.append({
-                'id': f'film-{idx}',
-                'ผู้ติดต่อ': contact_person,
-                'วันที่ได้นัด consult': consult_date_raw,
-                'วันที่ได้นัดผ่าตัด': surgery_date_raw,
-                # English field names for easier access
-                'contact_person': contact_person,
-                'consult_date': consult_date_raw,
-                'consult_date_normalized': consult_date_normalized,
-                'surgery_appointment_date': surgery_date_raw,
-                'surgery_appointment_date_normalized': surgery_date_normalized
-            })
-            
-            # นับจำนวนตามวันที่ (ใช้รูปแบบ normalized)
-            if consult_date_normalized:
-                consult_date_counts[consult_date_normalized] = consult_date_counts.get(consult_date_normalized, 0) + 1
-            
-            if surgery_date_normalized:
-                surgery_date_counts[surgery_date_normalized] = surgery_date_counts.get(surgery_date_normalized, 0) + 1
+        result = None
+        source = 'Google Sheets (Film data)'
+        if sheets_read_model.enabled:
+            try:
+                # Indexed date filter + GROUP BY counts in PostgreSQL
+                result, consult_date_counts, surgery_date_counts = sheets_read_model.film_contacts(target_date, show_count)
+                source = sheets_read_model.source('film_data')
+            except ReadModelUnavailable as e:
+                print(f"⚠️ Read model unavailable, reading 'Film data' from Google Sheets: {e}")
+
+        if result is None:
+            print(f"📊 Fetching contact data from Google Sheets 'Film data': {spreadsheet_id}")
+            # Only the three contact columns are fetched (projected from the shared snapshot if warm)
+            all_values = sheet_snapshots.get_values(spreadsheet_id, 'Film data', columns=FILM_CONTACT_COLUMNS)
+            result, consult_date_counts, surgery_date_counts = scan_film_contacts(all_values, target_date)
 
         print(f"✅ Successfully fetched {len(result)} records from 'Film data'")
 
@@ -710,8 +542,8 @@ def get_film_data_contacts():
             'data': result,
             'total': len(result),
             'timestamp': datetime.now().isoformat(),
-            'source': 'Google Sheets (Film data)',
-            'columns': ['ผู้ติดต่อ', 'วันที่ได้นัด consult', 'วันที่ได้นัดผ่าตัด']
+            'source': source,
+            'columns': FILM_CONTACT_COLUMNS
         }
         
         # เพิ่มข้อมูลการกรอง
@@ -749,6 +581,15 @@ def get_film_data_contacts():
 
         return jsonify(response)
 
+    except MissingColumnsError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'available_columns': e.available_columns,
+            'data': [],
+            'timestamp': datetime.now().isoformat()
+        }), 400
+
     except gspread.exceptions.WorksheetNotFound:
         print("❌ Worksheet 'Film data' not found")
         return jsonify({
@@ -789,108 +630,56 @@ def get_film_data_contacts():
 
 
 @app.route('/run-time', methods=['GET'])
+@response_cache.cached(ttl=CACHE_DURATION)
 def get_run_time():
     """Get call statistics from 'สรุป call_AI' sheet for callers 101-108 mapped with time slots"""
     try:
         # Get query parameters - ใช้วันที่ปัจจุบันเป็นค่าเริ่มต้น
         date_param = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
         
-        # Fetch data from สรุป call_AI sheet
-        data = fetch_call_ai_data()
-        
+        # GROUP BY on the PostgreSQL read model when available; otherwise the call log is
+        # synced incrementally and pre-aggregated per day, so this is a lookup
+        found = sheets_service.get_call_matrix_bucket(date_param)
+        if found is not None:
+            day, _, counts = found
+        else:
+            call_log, index = sheets_service.get_call_matrix_index()
+            if index.missing_columns:
+                raise ValueError(f"Missing required columns in '{call_log.title}': {', '.join(index.missing_columns)}")
+            day = index.day(date_param)
+            counts = index.counts
+
         # Define target callers (101-108)
-        target_callers = ['101', '102', '103', '104', '105', '106', '107', '108']
+        target_callers = TARGET_AGENTS
         
         # Define time slots mapping (ตรงกับ callTableTimeSlots ใน React)
-        time_slots = [
-            {"label": "9:00-10:00", "start": "9", "hour_start": 9, "hour_end": 10},
-            {"label": "10:00-11:00", "start": "10", "hour_start": 10, "hour_end": 11},
-            {"label": "11:00-12:00", "start": "11", "hour_start": 11, "hour_end": 12},
-            {"label": "12:00-13:00", "start": "12", "hour_start": 12, "hour_end": 13},
-            {"label": "13:00-14:00", "start": "13", "hour_start": 13, "hour_end": 14},
-            {"label": "14:00-15:00", "start": "14", "hour_start": 14, "hour_end": 15},
-            {"label": "15:00-16:00", "start": "15", "hour_start": 15, "hour_end": 16},
-            {"label": "16:00-17:00", "start": "16", "hour_start": 16, "hour_end": 17},
-            {"label": "17:00-18:00", "start": "17", "hour_start": 17, "hour_end": 18},
-            {"label": "18:00-19:00", "start": "18", "hour_start": 18, "hour_end": 19},
-            {"label": "19:00-20:00", "start": "19", "hour_start": 19, "hour_end": 20},
-        ]
+        time_slots = []
+        for slot in TIME_SLOTS:
+            hour_start, hour_end = slot.split('-')
+            time_slots.append({
+                "label": f"{hour_start}:00-{hour_end}:00",
+                "start": hour_start,
+                "slot": slot,
+                "hour_end": int(hour_end)
+            })
         
-        # Initialize result structure: time_slot (start) -> agent -> count
-        slot_counts = {}
-        for slot in time_slots:
-            slot_counts[slot['start']] = {}
-            for caller in target_callers:
-                slot_counts[slot['start']][caller] = 0
-        
-        # Initialize totals per agent
-        agent_totals = {}
-        for caller in target_callers:
-            agent_totals[caller] = 0
-        
-        # Minimum duration threshold: 30 seconds
-        MIN_DURATION_SECONDS = 30
-        
-        # Track total calls counted
-        total_calls_counted = 0
-        
-        # Debug: Print sample data to verify column names
-        if data:
-            print(f"🔍 Sample row keys: {list(data[0].keys())}")
-            print(f"🔍 Sample row data: {data[0]}")
-        
-        # Process each row
-        processed_count = 0
-        skipped_no_datetime = 0
-        skipped_wrong_caller = 0
-        skipped_duration = 0
-        skipped_date = 0
-        
-        for row in data:
-            caller = row.get('ผู้โทร', '').strip()
-            start_datetime = row.get('start', '').strip()
-            duration_str = row.get('สรุปเวลา', '').strip()
-            
-            # Parse Google Sheets datetime format (7/11/2025, 11:46:51)
-            parsed_datetime = parse_google_sheets_datetime(start_datetime)
-            if not parsed_datetime:
-                skipped_no_datetime += 1
-                continue
-            
-            # Check if caller is in target range (101-108 only)
-            if caller not in target_callers:
-                skipped_wrong_caller += 1
-                continue
-            
-            # Parse duration
-            duration_seconds = parse_duration_to_seconds(duration_str)
-            
-            # Only count if duration >= 30 seconds
-            if duration_seconds < MIN_DURATION_SECONDS:
-                skipped_duration += 1
-                continue
-            
-            # Filter by date (compare YYYY-MM-DD format)
-            if parsed_datetime['date'] != date_param:
-                skipped_date += 1
-                continue
-            
-            processed_count += 1
-            
-            # Get hour from parsed datetime
-            hour = parsed_datetime['hour']
-            
-            # Find matching time slot (9:00-20:00)
-            for slot in time_slots:
-                if slot['hour_start'] <= hour < slot['hour_end']:
-                    slot_counts[slot['start']][caller] += 1
-                    agent_totals[caller] += 1
-                    total_calls_counted += 1
-                    break
+        # time_slot (start) -> agent -> count
+        slot_counts = {
+            slot['start']: {caller: day.matrix[caller][slot['slot']] for caller in target_callers}
+            for slot in time_slots
+        }
+        agent_totals = dict(day.totals_by_agent)
+        total_calls_counted = day.counted
+
+        processed_count = day.matched
+        skipped_no_datetime = counts['skipped_no_datetime']
+        skipped_wrong_caller = counts['skipped_wrong_caller']
+        skipped_duration = counts['skipped_duration']
+        skipped_date = counts['valid'] - day.matched
         
         # Debug: Print filtering statistics
         print(f"📊 Filtering stats:")
-        print(f"  - Total rows: {len(data)}")
+        print(f"  - Total rows: {counts['total_rows']}")
         print(f"  - Processed successfully: {processed_count}")
         print(f"  - Skipped (no datetime): {skipped_no_datetime}")
         print(f"  - Skipped (wrong caller): {skipped_wrong_caller}")
@@ -910,7 +699,7 @@ def get_run_time():
             'timestamp': datetime.now().isoformat(),
             'source': 'Google Sheets (สรุป call_AI)',
             'debug': {
-                'total_rows': len(data),
+                'total_rows': counts['total_rows'],
                 'processed': processed_count,
                 'skipped_no_datetime': skipped_no_datetime,
                 'skipped_wrong_caller': skipped_wrong_caller,
@@ -964,18 +753,13 @@ def get_run_time():
 
 @app.route('/api/clear-cache', methods=['POST'])
 def clear_cache():
-    """Clear the data cache"""
-    global cache, fb_ads_cache
-    cache = {
-        'data': None,
-        'timestamp': None,
-        'expires_at': None
-    }
-    fb_ads_cache = {
-        'data': {},
-        'timestamps': {},
-        'expires_at': {}
-    }
+    """Clear the data cache (shared backend, so every worker sees it)"""
+    cache_backend.clear()
+    sheets_registry.invalidate()
+    sheets_write_registry.invalidate()
+    sheet_snapshots.invalidate()
+    call_log_reader.invalidate()
+    call_matrix_indexer.invalidate()
 
     return jsonify({
         'success': True,
@@ -1019,6 +803,7 @@ def get_date_range(date_preset=None, time_range=None):
 
 
 @app.route('/api/facebook-ads-campaigns', methods=['GET'])
+@response_cache.cached(ttl=FB_ADS_CACHE_DURATION)
 def get_facebook_ads_campaigns():
     """
     Get Facebook Ads campaigns data (Optimized with caching)
@@ -1030,15 +815,18 @@ def get_facebook_ads_campaigns():
     - time_increment: "1" for daily breakdown, "monthly" for monthly (optional)
     - action_breakdowns: comma-separated (e.g., "action_type")
     - fields: Comma-separated list of additional fields (optional)
-    - limit: Maximum number of records to return (optional, default: 1000)
+    - limit: Page size used when reading insights from Facebook (optional, default: 1000)
     - no_cache: "true" to bypass cache (optional)
+    
+    Cached responses are served as pre-encoded JSON (gzip/brotli); cache state is
+    in the X-Cache, Age and X-Cache-Expires-In headers.
+    
+    Large requests (e.g. level=ad with time_increment=1 over last_30d) run as a
+    Facebook async report run. If it is not finished within FB_ASYNC_TIMEOUT the
+    endpoint returns 202 and the next request resumes the same run.
     """
     try:
-        # Get environment variables
-        access_token = os.getenv('FACEBOOK_ACCESS_TOKEN')
-        ad_account_id = os.getenv('FACEBOOK_AD_ACCOUNT_ID')
-        
-        if not access_token or not ad_account_id:
+        if not facebook_insights.configured:
             return jsonify({
                 'success': False,
                 'error': 'Missing Facebook credentials. Please set FACEBOOK_ACCESS_TOKEN and FACEBOOK_AD_ACCOUNT_ID',
@@ -1072,172 +860,44 @@ def get_facebook_ads_campaigns():
         # Get date range
         since, until = get_date_range(date_preset, time_range)
         
-        # สร้าง cache key
-        cache_key = f"{level}_{since}_{until}_{time_increment}_{action_breakdowns}_{custom_fields}_{limit}"
-        
-        # ตรวจสอบ cache
-        global fb_ads_cache
-        now = datetime.now()
-        
-        if not no_cache and cache_key in fb_ads_cache['data']:
-            if (cache_key in fb_ads_cache['expires_at'] and 
-                now < fb_ads_cache['expires_at'][cache_key]):
-                cached_response = fb_ads_cache['data'][cache_key]
-                cached_response['cached'] = True
-                cached_response['cache_expires_in'] = (fb_ads_cache['expires_at'][cache_key] - now).seconds
-                print(f"✅ Returning cached Facebook Ads data (expires in {cached_response['cache_expires_in']}s)")
-                return jsonify(cached_response)
+        query = InsightsQuery(level, since, until, time_increment, action_breakdowns, custom_fields, limit)
         
+        # Large requests run as an async report run; both paths stream pages into the aggregation
         print(f"📊 Fetching Facebook Ads data for {level} from {since} to {until}")
+        report, cached_entry = facebook_insights.get_report(query, refresh=no_cache or is_refresh_request())
         
-        # Initialize Facebook API
-        FacebookAdsApi.init(access_token=access_token)
-        
-        # Get ad account
-        account = AdAccount(ad_account_id)
-        
-        # Build params for insights
-        params = {
-            'level': level,
-            'time_range': {'since': since, 'until': until},
-            'limit': limit
-        }
-        
-        # Add time_increment if specified (for daily breakdown)
-        if time_increment:
-            params['time_increment'] = time_increment
-        
-        # Add action_breakdowns if specified
-        if action_breakdowns:
-            params['action_breakdowns'] = [x.strip() for x in action_breakdowns.split(',')]
-        
-        # Fields to fetch - เฉพาะที่จำเป็น (ลดภาระ API)
-        fields = [
-            'campaign_id',
-            'campaign_name',
-            'spend',
-            'impressions',
-            'clicks',
-            'ctr',
-            'cpc',
-            'cpm',
-            'reach',
-            'actions',
-            'cost_per_action_type',
-            'date_start',
-            'date_stop'
-        ]
-        
-        # เพิ่ม fields ตาม level
-        if level in ['adset', 'ad']:
-            fields.extend(['adset_id', 'adset_name'])
-        if level == 'ad':
-            fields.extend(['ad_id', 'ad_name'])
-        
-        # Add custom fields if provided
-        if custom_fields:
-            custom_fields_list = [f.strip() for f in custom_fields.split(',')]
-            fields.extend(custom_fields_list)
-            fields = list(set(fields))  # Remove duplicates
-        
-        # Get insights
-        print(f"🔍 Requesting insights with {len(fields)} fields, limit: {limit}")
-        insights = account.get_insights(
-            fields=fields,
-            params=params
-        )
-        
-        # Process results
-        data = []
-        total_spend = 0
-        total_impressions = 0
-        total_reach = 0
-        total_clicks = 0
-        total_conversions = 0
-        total_leads = 0
-        total_purchase = 0
-        
-        for insight in insights:
-            insight_dict = dict(insight)
-            
-            # Process actions for easier access
-            processed_actions = {}
-            if 'actions' in insight_dict and insight_dict['actions']:
-                for action in insight_dict['actions']:
-                    action_type = action.get('action_type', '')
-                    action_value = int(action.get('value', 0))
-                    processed_actions[action_type] = action_value
-                    
-                    # Count specific action types
-                    if action_type == 'lead':
-                        total_leads += action_value
-                    elif action_type == 'purchase':
-                        total_purchase += action_value
-            
-            # Add processed actions to insight
-            insight_dict['processed_actions'] = processed_actions
-            
-            # Extract key metrics
-            spend = float(insight_dict.get('spend', 0))
-            impressions = int(insight_dict.get('impressions', 0))
-            reach = int(insight_dict.get('reach', 0))
-            clicks = int(insight_dict.get('clicks', 0))
-            
-            # Get conversions (from actions)
-            conversions = processed_actions.get('lead', 0) + processed_actions.get('purchase', 0)
-            insight_dict['total_conversions'] = conversions
-            
-            # Add calculated metrics
-            insight_dict['cost_per_result'] = round(spend / conversions, 2) if conversions > 0 else 0
-            
-            data.append(insight_dict)
-            
-            # Calculate totals
-            total_spend += spend
-            total_impressions += impressions
-            total_reach += reach
-            total_clicks += clicks
-            total_conversions += conversions
-        
-        # Build summary
-        summary = {
-            'total_spend': round(total_spend, 2),
-            'total_impressions': total_impressions,
-            'total_reach': total_reach,
-            'total_clicks': total_clicks,
-            'total_conversions': round(total_conversions, 2),
-            'total_leads': total_leads,
-            'total_purchase': total_purchase,
-            'average_cpc': round(total_spend / total_clicks, 2) if total_clicks > 0 else 0,
-            'average_ctr': round((total_clicks / total_impressions) * 100, 2) if total_impressions > 0 else 0,
-            'cost_per_result': round(total_spend / total_conversions, 2) if total_conversions > 0 else 0,
-            'frequency': round(total_impressions / total_reach, 2) if total_reach > 0 else 0
-        }
-        
-        print(f"✅ Successfully fetched {len(data)} {level}(s) from Facebook Ads")
-        
-        # Build response
         response = {
             'success': True,
-            'level': level,
+            'level': report['level'],
             'date_preset': date_preset if not time_range else None,
-            'time_range': {'since': since, 'until': until},
-            'time_increment': time_increment,
-            'data': data,
-            'summary': summary,
-            'total_records': len(data),
-            'timestamp': datetime.now().isoformat(),
-            'cached': False,
-            'cache_duration': FB_ADS_CACHE_DURATION
+            'time_range': report['time_range'],
+            'time_increment': report['time_increment'],
+            'data': report['data'],
+            'summary': report['summary'],
+            'total_records': report['total_records'],
+            'report_run': report['report_run'],
+            'timestamp': report['timestamp'],
+            'cache_duration': facebook_insights.cache_ttl
         }
         
-        # บันทึกลง cache
-        fb_ads_cache['data'][cache_key] = response.copy()
-        fb_ads_cache['timestamps'][cache_key] = now
-        fb_ads_cache['expires_at'][cache_key] = now + timedelta(seconds=FB_ADS_CACHE_DURATION)
+        if cached_entry is not None:
+            print(f"✅ Using cached Facebook Ads report (expires in {int(cached_entry.expires_in)}s)")
         
         return jsonify(response)
         
+    except ReportRunTimeout as e:
+        # Still running at Facebook; the next request resumes polling the same report run
+        print(f"⏳ {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'report_run_id': e.report_run_id,
+            'percent_complete': e.percent,
+            'retry_after': 5,
+            'data': [],
+            'timestamp': datetime.now().isoformat()
+        }), 202, {'Retry-After': '5'}
+        
     except Exception as e:
         error_message = str(e)
         print(f"❌ Error in /api/facebook-ads-campaigns: {error_message}")
@@ -1266,6 +926,7 @@ def get_facebook_ads_manager():
 # ========================================
 
 @app.route('/api/google-sheets-data', methods=['GET'])
+@response_cache.cached(ttl=CACHE_DURATION)
 def get_google_sheets_data():
     """
     Get data from Google Sheets 'เคสได้ชื่อเบอร์' sheet
@@ -1305,19 +966,43 @@ def get_google_sheets_data():
                 'data': []
             }), 400
         
+        if sheets_read_model.enabled:
+            try:
+                # Indexed date range (GROUP BY day for the daily breakdown) in PostgreSQL
+                cases = sheets_read_model.named_cases(since, until, daily)
+            except ReadModelUnavailable as e:
+                print(f"⚠️ Read model unavailable, reading 'เคสได้ชื่อเบอร์' from Google Sheets: {e}")
+                cases = None
+
+            if cases is not None:
+                if daily:
+                    response = {
+                        'success': True,
+                        'dailyData': [{'date': date, 'count': count}
+                                      for date, count in sorted(cases['daily_counts'].items(), reverse=True)],
+                        'total': cases['total'],
+                        'dateRange': {'start': since, 'end': until},
+                        'timestamp': datetime.now().isoformat()
+                    }
+                else:
+                    response = {
+                        'success': True,
+                        'total': cases['total'],
+                        'dateRange': {'start': since, 'end': until},
+                        'dateColIndex': 0,
+                        'hasDateColumn': True,
+                        'totalRowsBeforeFilter': cases['source_rows'],
+                        'rowsAfterDateFilter': cases['total'],
+                        'data': cases['rows'],
+                        'timestamp': datetime.now().isoformat()
+                    }
+                print(f"✅ Read {cases['total']} records of 'เคสได้ชื่อเบอร์' from {sheets_read_model.source('named_cases')}")
+                return jsonify(response)
+
         print(f"📊 Fetching data from Google Sheets 'เคสได้ชื่อเบอร์': {spreadsheet_id}")
         
-        # Get Google Sheets client
-        client = get_google_sheets_client()
-        
-        # Open the spreadsheet
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        
-        # Get the 'เคสได้ชื่อเบอร์' sheet
-        sheet = spreadsheet.worksheet('เคสได้ชื่อเบอร์')
-        
-        # Get all values from the sheet
-        all_values = sheet.get_all_values()
+        # Only columns A-B (date, name/phone) are fetched (shared snapshot)
+        all_values = sheet_snapshots.get_values(spreadsheet_id, 'เคสได้ชื่อเบอร์', columns=SHEETS_DATA_COLUMNS)
         
         if not all_values or len(all_values) < 2:
             return jsonify({
@@ -1438,7 +1123,84 @@ def get_google_sheets_data():
 # Google Ads API
 # ========================================
 
+def scan_sale_incentive(all_values, month=None, year=None):
+    """Scan 'N_SaleIncentive' rows (used when the read model is unavailable)
+
+    Returns one record per sale with a valid SaleDate, limited to month/year when both are given.
+    """
+    # Convert rows to records keyed by header (like get_all_records)
+    headers = all_values[0] if all_values else []
+    records = [
+        {header: (row[i] if i < len(row) else '') for i, header in enumerate(headers)}
+        for row in all_values[1:]
+    ]
+    
+    print(f"📋 Total records from N_SaleIncentive: {len(records)}")
+    
+    # Process data
+    sale_data = []
+    for record in records:
+        try:
+            # Get fields from record
+            sale_date_str = record.get('SaleDate', '').strip()
+            if not sale_date_str:
+                continue  # Skip records without date
+            
+            # Parse SaleDate (format: "2025-11-09 10:06:11")
+            try:
+                sale_date = datetime.strptime(sale_date_str, '%Y-%m-%d %H:%M:%S').date()
+            except ValueError:
+                # Try alternative format without time
+                try:
+                    sale_date = datetime.strptime(sale_date_str, '%Y-%m-%d').date()
+                except ValueError:
+                    print(f"⚠️ Invalid date format: {sale_date_str}")
+                    continue
+            
+            # Get Sale person and Income
+            sale_person = record.get('Sale', '').strip()
+            income_str = record.get('InCome', '0')
+            
+            # Convert income to float
+            try:
+                income = float(income_str) if income_str else 0
+            except ValueError:
+                income = 0
+            
+            # Filter by month and year if provided
+            if month and year:
+                if sale_date.month != month or sale_date.year != year:
+                    continue  # Skip records that don't match the filter
+            
+            # Add to result
+            sale_data.append({
+                'sale_person': sale_person,
+                'sale_date': sale_date.isoformat(),  # Format: "2025-11-09"
+                'income': income,
+                'day': sale_date.day,
+                'month': sale_date.month,
+                'year': sale_date.year
+            })
+            
+        except Exception as e:
+            print(f"⚠️ Error processing record: {e}")
+            continue
+
+    return sale_data
+
+
+def summarize_sales(sale_data):
+    """Sales count and income per Sale person, highest income first"""
+    totals = {}
+    for sale in sale_data:
+        person = totals.setdefault(sale['sale_person'], {'sale_person': sale['sale_person'], 'sales': 0, 'total_income': 0})
+        person['sales'] += 1
+        person['total_income'] += sale['income']
+    return sorted(totals.values(), key=lambda person: (-person['total_income'], person['sale_person']))
+
+
 @app.route('/N_SaleIncentive_data', methods=['GET'])
+@response_cache.cached(ttl=CACHE_DURATION)
 def get_n_sale_incentive_data():
     """
     Get data from N_SaleIncentive sheet
@@ -1446,6 +1208,7 @@ def get_n_sale_incentive_data():
     Query Parameters:
     - month: เดือน (1-12) - optional
     - year: ปี (เช่น 2025) - optional
+    - summary: "true" to add sales count and income per Sale person (optional)
     
     If month and year are provided, returns filtered data for that month.
     Otherwise, returns all data.
@@ -1454,79 +1217,35 @@ def get_n_sale_incentive_data():
         # Get query parameters
         month_param = request.args.get('month')
         year_param = request.args.get('year')
+        with_summary = request.args.get('summary', '').lower() == 'true'
+
+        month = year = None
+        if month_param and year_param:
+            month = int(month_param)
+            year = int(year_param)
         
         # Get spreadsheet ID from environment
         spreadsheet_id = os.getenv('GOOGLE_SPREADSHEET_ID')
         if not spreadsheet_id:
             raise ValueError("GOOGLE_SPREADSHEET_ID not set in environment variables")
-        
-        print(f"📊 Fetching data from N_SaleIncentive sheet: {spreadsheet_id}")
-        
-        # Get Google Sheets client
-        client = get_google_sheets_client()
-        
-        # Open the spreadsheet
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        
-        # Get the 'N_SaleIncentive' sheet
-        worksheet = spreadsheet.worksheet('N_SaleIncentive')
-        
-        # Get all records
-        records = worksheet.get_all_records()
-        
-        print(f"📋 Total records from N_SaleIncentive: {len(records)}")
-        
-        # Process data
-        sale_data = []
-        for record in records:
+
+        sale_data = None
+        source = 'Google Sheets (N_SaleIncentive)'
+        if sheets_read_model.enabled:
             try:
-                # Get fields from record
-                sale_date_str = record.get('SaleDate', '').strip()
-                if not sale_date_str:
-                    continue  # Skip records without date
-                
-                # Parse SaleDate (format: "2025-11-09 10:06:11")
-                try:
-                    sale_date = datetime.strptime(sale_date_str, '%Y-%m-%d %H:%M:%S').date()
-                except ValueError:
-                    # Try alternative format without time
-                    try:
-                        sale_date = datetime.strptime(sale_date_str, '%Y-%m-%d').date()
-                    except ValueError:
-                        print(f"⚠️ Invalid date format: {sale_date_str}")
-                        continue
-                
-                # Get Sale person and Income
-                sale_person = record.get('Sale', '').strip()
-                income_str = record.get('InCome', '0')
-                
-                # Convert income to float
-                try:
-                    income = float(income_str) if income_str else 0
-                except ValueError:
-                    income = 0
-                
-                # Filter by month and year if provided
-                if month_param and year_param:
-                    month = int(month_param)
-                    year = int(year_param)
-                    
-                    if sale_date.month != month or sale_date.year != year:
-                        continue  # Skip records that don't match the filter
-                
-                # Add to result
-                sale_data.append({
-                    'sale_person': sale_person,
-                    'sale_date': sale_date.isoformat(),  # Format: "2025-11-09"
-                    'income': income,
-                    'day': sale_date.day,
-                    'month': sale_date.month,
-                    'year': sale_date.year
-                })
-                
-            except Exception as e:
-                print(f"⚠️ Error processing record: {e}")
-                continue
+                # Indexed sale_date range + GROUP BY Sale in PostgreSQL
+                sale_data, summary = sheets_read_model.sales(month, year, with_summary)
+                source = sheets_read_model.source('sale_incentive')
+            except ReadModelUnavailable as e:
+                print(f"⚠️ Read model unavailable, reading 'N_SaleIncentive' from Google Sheets: {e}")
+
+        if sale_data is None:
+            print(f"📊 Fetching data from N_SaleIncentive sheet: {spreadsheet_id}")
+
+            # Get all values from the 'N_SaleIncentive' sheet (shared snapshot)
+            all_values = sheet_snapshots.get_values(spreadsheet_id, 'N_SaleIncentive')
+            sale_data = scan_sale_incentive(all_values, month, year)
+            summary = summarize_sales(sale_data) if with_summary else None
         
         # Build response
         response = {
@@ -1534,15 +1253,18 @@ def get_n_sale_incentive_data():
             'data': sale_data,
             'total_records': len(sale_data),
             'timestamp': datetime.now().isoformat(),
-            'source': 'Google Sheets (N_SaleIncentive)'
+            'source': source
         }
         
         # Add filter info if filtering was applied
-        if month_param and year_param:
+        if month and year:
             response['filter'] = {
-                'month': int(month_param),
-                'year': int(year_param)
+                'month': month,
+                'year': year
             }
+
+        if with_summary:
+            response['summary'] = summary
         
         print(f"✅ Successfully processed {len(sale_data)} records from N_SaleIncentive")
         
@@ -1579,6 +1301,7 @@ def get_n_sale_incentive_data():
 
 
 @app.route('/api/google-ads', methods=['GET'])
+@response_cache.cached(ttl=GOOGLE_ADS_CACHE_DURATION)
 def get_google_ads():
     """
     Get Google Ads data
@@ -1587,168 +1310,60 @@ def get_google_ads():
     - startDate: Start date (YYYY-MM-DD) default: today
     - endDate: End date (YYYY-MM-DD) default: today
     - daily: "true" to get daily breakdown
+    - no_cache: "true" to re-fetch today/yesterday (closed days come from the day cache)
+    
+    Rows are streamed with search_stream and kept per (customer, campaign, day),
+    so overlapping date ranges only query the days that are not cached yet.
     """
     try:
         # Get query parameters
         start_date = request.args.get('startDate', datetime.now().strftime('%Y-%m-%d'))
         end_date = request.args.get('endDate', datetime.now().strftime('%Y-%m-%d'))
         daily = request.args.get('daily', '').lower() == 'true'
+        refresh = request.args.get('no_cache', '').lower() == 'true' or is_refresh_request()
         
-        # Get environment variables
-        client_id = os.getenv('GOOGLE_ADS_CLIENT_ID')
-        client_secret = os.getenv('GOOGLE_ADS_CLIENT_SECRET')
-        developer_token = os.getenv('GOOGLE_ADS_DEVELOPER_TOKEN')
-        refresh_token = os.getenv('GOOGLE_ADS_REFRESH_TOKEN')
-        customer_id = os.getenv('GOOGLE_ADS_CUSTOMER_ID')
-        
-        if not all([client_id, client_secret, developer_token, refresh_token, customer_id]):
+        if not google_ads_clients.configured:
             return jsonify({
                 'success': False,
                 'error': 'Missing Google Ads credentials. Please check environment variables.',
                 'campaigns': []
             }), 400
         
-        # Remove hyphens from customer_id if present
-        customer_id = customer_id.replace('-', '')
-        
-        # Create Google Ads client configuration
-        credentials = {
-            'developer_token': developer_token,
-            'client_id': client_id,
-            'client_secret': client_secret,
-            'refresh_token': refresh_token,
-            'use_proto_plus': True,
-            'use_cloud_org_for_api_access': False
-        }
-        
-        # Initialize Google Ads client with v17 (compatible with google-ads 22.1.0)
-        client = GoogleAdsClient.load_from_dict(credentials)
-        ga_service = client.get_service('GoogleAdsService')
-        
-        # Convert dates to YYYYMMDD format (required by Google Ads API)
-        start_date_formatted = start_date.replace('-', '')
-        end_date_formatted = end_date.replace('-', '')
+        try:
+            if datetime.strptime(end_date, '%Y-%m-%d') < datetime.strptime(start_date, '%Y-%m-%d'):
+                raise ValueError('endDate must not be before startDate')
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid date range: {e}. Use YYYY-MM-DD',
+                'campaigns': [],
+                'timestamp': datetime.now().isoformat()
+            }), 400
         
-        # Build query - simplified for v13
-        if daily:
-            # Daily breakdown query
-            query = f"""
-                SELECT
-                    campaign.id,
-                    campaign.name,
-                    segments.date,
-                    metrics.clicks,
-                    metrics.impressions,
-                    metrics.cost_micros
-                FROM campaign
-                WHERE segments.date >= '{start_date_formatted}'
-                  AND segments.date <= '{end_date_formatted}'
-                ORDER BY segments.date DESC
-            """
-        else:
-            # Campaign-level query
-            query = f"""
-                SELECT
-                    campaign.id,
-                    campaign.name,
-                    campaign.status,
-                    metrics.clicks,
-                    metrics.impressions,
-                    metrics.cost_micros
-                FROM campaign
-                WHERE segments.date >= '{start_date_formatted}'
-                  AND segments.date <= '{end_date_formatted}'
-            """
-        
-        # Execute query
-        response = ga_service.search(customer_id=customer_id, query=query)
-        
-        # Process results
         if daily:
-            # Daily breakdown
-            daily_data = {}
-            
-            for row in response:
-                date = row.segments.date
-                
-                if date not in daily_data:
-                    daily_data[date] = {
-                        'date': date,
-                        'clicks': 0,
-                        'impressions': 0,
-                        'cost': 0,
-                        'conversions': 0
-                    }
-                
-                daily_data[date]['clicks'] += row.metrics.clicks
-                daily_data[date]['impressions'] += row.metrics.impressions
-                daily_data[date]['cost'] += row.metrics.cost_micros / 1000000
-                daily_data[date]['conversions'] += row.metrics.conversions
-            
-            daily_list = sorted(daily_data.values(), key=lambda x: x['date'], reverse=True)
-            
+            report = google_ads_reports.daily_report(start_date, end_date, refresh=refresh)
             result = {
                 'success': True,
-                'dailyData': daily_list,
-                'dateRange': {
-                    'startDate': start_date,
-                    'endDate': end_date
-                },
-                'timestamp': datetime.now().isoformat()
+                'dailyData': report['dailyData']
             }
         else:
-            # Campaign-level
-            campaigns = []
-            total_clicks = 0
-            total_impressions = 0
-            total_cost = 0
-            
-            for row in response:
-                campaign = row.campaign
-                metrics = row.metrics
-                
-                clicks = metrics.clicks
-                impressions = metrics.impressions
-                cost = metrics.cost_micros / 1000000
-                average_cpc = metrics.average_cpc / 1000000 if metrics.average_cpc else 0
-                ctr = metrics.ctr * 100 if metrics.ctr else 0
-                conversions = metrics.conversions
-                
-                campaigns.append({
-                    'id': str(campaign.id),
-                    'name': campaign.name,
-                    'status': campaign.status.name,
-                    'clicks': clicks,
-                    'impressions': impressions,
-                    'averageCpc': round(average_cpc, 2),
-                    'cost': round(cost, 2),
-                    'ctr': round(ctr, 2),
-                    'conversions': conversions
-                })
-                
-                total_clicks += clicks
-                total_impressions += impressions
-                total_cost += cost
-            
-            avg_cpc = (total_cost / total_clicks) if total_clicks > 0 else 0
-            avg_ctr = (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
-            
+            report = google_ads_reports.campaign_report(start_date, end_date, refresh=refresh)
             result = {
-                'campaigns': campaigns,
-                'summary': {
-                    'totalClicks': total_clicks,
-                    'totalImpressions': total_impressions,
-                    'averageCpc': round(avg_cpc, 2),
-                    'totalCost': round(total_cost, 2),
-                    'averageCtr': round(avg_ctr, 2)
-                },
-                'dateRange': {
-                    'startDate': start_date,
-                    'endDate': end_date
-                },
-                'timestamp': datetime.now().isoformat()
+                'campaigns': report['campaigns'],
+                'summary': report['summary']
             }
         
+        result.update({
+            'dateRange': {
+                'startDate': start_date,
+                'endDate': end_date
+            },
+            'report_run': report['report_run'],
+            'timestamp': datetime.now().isoformat()
+        })
+        print(f"✅ Google Ads {start_date} to {end_date}: {report['report_run']['days_fetched']} day(s) fetched, "
+              f"{report['report_run']['days_from_store']} from cache")
+        
         return jsonify(result)
         
     except GoogleAdsException as ex:
@@ -1776,7 +1391,35 @@ def get_google_ads():
         }), 500
 
 
+def stream_bjh_leads(column_names, batches, stream_format, filters):
+    """Encode leads batches as NDJSON lines or one JSON object, as they are fetched"""
+    dumps = app.json.dumps
+    total = 0
+    if stream_format != 'ndjson':
+        yield f'{{"columns": {dumps(column_names)}, "data": ['
+    try:
+        for batch in batches:
+            if stream_format == 'ndjson':
+                yield ''.join(f'{dumps(row)}\n' for row in batch)
+            else:
+                yield (',' if total else '') + ','.join(dumps(row) for row in batch)
+            total += len(batch)
+    except Exception as e:
+        # Headers are already sent, so report the failure inside the body
+        print(f"❌ Error while streaming /data_bjh after {total} rows: {e}")
+        if stream_format == 'ndjson':
+            yield f'{dumps({"success": False, "error": str(e), "total": total})}\n'
+        else:
+            yield f'], "total": {total}, "success": false, "error": {dumps(str(e))}}}\n'
+        return
+    print(f"✅ Streamed {total} records from bjh_all_leads")
+    if stream_format != 'ndjson':
+        yield (f'], "total": {total}, "filters": {dumps(filters)}, "source": {dumps(LEADS_SOURCE)}, '
+               f'"timestamp": {dumps(datetime.now().isoformat())}, "success": true}}\n')
+
+
 @app.route('/data_bjh', methods=['GET'])
+@response_cache.cached(ttl=DATA_BJH_CACHE_DURATION)
 def get_data_bjh():
     """
     Get all leads data from BJH PostgreSQL database
@@ -1786,6 +1429,13 @@ def get_data_bjh():
     - status: Filter by status (optional)
     - source: Filter by source (optional)
     - doctor: Filter by doctor (optional)
+    - stream: "ndjson" (one lead per line) or "json" (chunked JSON object) to stream
+      rows while they are read from a server-side cursor; streamed responses are not cached
+    - columns: Comma-separated column names to return (checked against the table)
+    - page_size: Return one page ordered by the primary key (or DATA_BJH_ORDER_COLUMN)
+      together with an opaque next_cursor (max DATA_BJH_MAX_PAGE_SIZE)
+    - cursor: next_cursor of the previous page (same filters)
+    - count: "estimate" (pg_class.reltuples, whole table) or "exact" (COUNT(*) with filters)
     """
     try:
         # Get query parameters
@@ -1793,67 +1443,89 @@ def get_data_bjh():
         status_filter = request.args.get('status')
         source_filter = request.args.get('source')
         doctor_filter = request.args.get('doctor')
-        
-        # Get database connection
-        connection = get_db_connection()
-        
-        if not connection:
+        stream_format = request.args.get('stream', '').lower()
+        columns_param = request.args.get('columns')
+        page_size = request.args.get('page_size', type=int)
+        cursor_token = request.args.get('cursor')
+        count_mode = request.args.get('count', '').lower()
+        paginate = page_size is not None or bool(cursor_token)
+        
+        invalid = None
+        if stream_format not in ('', 'json', 'ndjson'):
+            invalid = 'Invalid stream format. Use "json" or "ndjson"'
+        elif count_mode not in ('', 'estimate', 'exact'):
+            invalid = 'Invalid count. Use "estimate" or "exact"'
+        elif paginate and stream_format:
+            invalid = 'stream cannot be combined with page_size/cursor'
+        elif paginate and page_size is not None and not 1 <= page_size <= DATA_BJH_MAX_PAGE_SIZE:
+            invalid = f'page_size must be between 1 and {DATA_BJH_MAX_PAGE_SIZE}'
+        if invalid:
             return jsonify({
                 'success': False,
-                'error': 'Failed to connect to database',
+                'error': invalid,
                 'data': [],
                 'timestamp': datetime.now().isoformat()
-            }), 500
+            }), 400
+        
+        filters = {
+            'status': status_filter,
+            'source': source_filter,
+            'doctor': doctor_filter,
+            'limit': limit
+        }
         
         try:
-            cursor = connection.cursor()
-            
-            # Build query with filters
-            query = 'SELECT * FROM "BJH-Server"."bjh_all_leads"'
-            conditions = []
-            params = []
-            
-            if status_filter:
-                conditions.append('status = %s')
-                params.append(status_filter)
-            
-            if source_filter:
-                conditions.append('source = %s')
-                params.append(source_filter)
-            
-            if doctor_filter:
-                conditions.append('doctor = %s')
-                params.append(doctor_filter)
+            # Column names and the pagination key come from the catalog (cached per worker)
+            columns = None
+            order_columns = None
+            after = None
+            if columns_param or paginate:
+                table_info = get_table_info(db_pool)
+                if columns_param:
+                    columns = table_info.resolve_columns(
+                        [name.strip() for name in columns_param.split(',') if name.strip()]
+                    )
+                if paginate:
+                    if not table_info.key_columns:
+                        raise InvalidLeadsQuery('Pagination needs a primary key or DATA_BJH_ORDER_COLUMN')
+                    order_columns = table_info.key_columns
+                    page_size = page_size or DATA_BJH_MAX_PAGE_SIZE
+                    if cursor_token:
+                        after = decode_cursor(cursor_token, filters, order_columns)
             
-            if conditions:
-                query += ' WHERE ' + ' AND '.join(conditions)
+            select_columns = columns
+            if columns and order_columns:
+                # The page key is needed for next_cursor even when it is not requested
+                select_columns = columns + [name for name in order_columns if name not in columns]
+            query, params = build_leads_query(
+                filters, page_size + 1 if paginate else limit, select_columns, order_columns, after
+            )
             
-            if limit:
-                query += f' LIMIT {limit}'
+            # Rows arrive in DATA_BJH_STREAM_ITERSIZE batches from a server-side cursor;
+            # the first item is the column list (connect/query errors surface here)
+            batches = iter_leads(db_pool, query, params)
+            column_names = next(batches)
             
-            # Execute query
-            cursor.execute(query, params)
+            if stream_format:
+                mimetype = 'application/x-ndjson' if stream_format == 'ndjson' else 'application/json'
+                return Response(
+                    stream_with_context(stream_bjh_leads(column_names, batches, stream_format, filters)),
+                    mimetype=mimetype
+                )
             
-            # Get column names
-            column_names = [desc[0] for desc in cursor.description]
+            data = [row for batch in batches for row in batch]
             
-            # Fetch all results
-            rows = cursor.fetchall()
-            
-            # Convert to list of dictionaries
-            import datetime as dt
-            data = []
-            for row in rows:
-                row_dict = {}
-                for i, col_name in enumerate(column_names):
-                    value = row[i]
-                    # Convert date/datetime objects to string
-                    if isinstance(value, (dt.datetime, dt.date)):
-                        value = value.isoformat()
-                    row_dict[col_name] = value
-                data.append(row_dict)
-            
-            cursor.close()
+            next_cursor = None
+            if paginate:
+                # One extra row tells whether another page exists
+                if len(data) > page_size:
+                    data = data[:page_size]
+                    next_cursor = encode_cursor(
+                        [data[-1][name] for name in order_columns], filters, order_columns
+                    )
+                if select_columns != columns:
+                    data = [{name: row[name] for name in columns} for row in data]
+                    column_names = columns
             
             # Build response
             response = {
@@ -1861,20 +1533,49 @@ def get_data_bjh():
                 'data': data,
                 'total': len(data),
                 'columns': column_names,
-                'filters': {
-                    'status': status_filter,
-                    'source': source_filter,
-                    'doctor': doctor_filter,
-                    'limit': limit
-                },
+                'filters': filters,
                 'timestamp': datetime.now().isoformat(),
-                'source': 'PostgreSQL (BJH-Server.bjh_all_leads)'
+                'source': LEADS_SOURCE
             }
             
+            if paginate:
+                response.update({
+                    'page_size': page_size,
+                    'order_by': order_columns,
+                    'next_cursor': next_cursor
+                })
+            
+            if count_mode == 'estimate':
+                # Planner statistics for the whole table (ignores filters), no table scan
+                response['estimated_total'] = estimate_row_count(db_pool)
+            elif count_mode == 'exact':
+                response['total_count'] = exact_row_count(db_pool, filters)
+            
             print(f"✅ Successfully fetched {len(data)} records from bjh_all_leads")
             
             return jsonify(response)
             
+        except InvalidLeadsQuery as e:
+            error_response = {
+                'success': False,
+                'error': str(e),
+                'data': [],
+                'timestamp': datetime.now().isoformat()
+            }
+            if e.available_columns is not None:
+                error_response['available_columns'] = e.available_columns
+            return jsonify(error_response), 400
+            
+        except PoolError as e:
+            # Every pooled connection is busy
+            print(f"⏳ {e}")
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'data': [],
+                'timestamp': datetime.now().isoformat()
+            }), 503, {'Retry-After': '1'}
+            
         except Error as e:
             error_message = f"Database error: {str(e)}"
             print(f"❌ {error_message}")
@@ -1886,10 +1587,6 @@ def get_data_bjh():
                 'data': [],
                 'timestamp': datetime.now().isoformat()
             }), 500
-            
-        finally:
-            if connection:
-                connection.close()
     
     except Exception as e:
         error_message = str(e)
@@ -1909,21 +1606,36 @@ def get_data_bjh():
 # ========================================
 
 @app.route('/api/call-matrix', methods=['GET'])
+@response_cache.cached(ttl=CACHE_DURATION)
 def get_call_matrix():
     """ดึงข้อมูล Call Matrix ทั้งหมด
 
     Query Parameters:
         date (optional): วันที่ในรูปแบบ YYYY-MM-DD (ถ้าไม่ระบุจะใช้วันที่ล่าสุด)
         use_latest (optional): "true" หรือ "false" - ใช้วันที่ล่าสุดหรือไม่ (default: true เฉพาะตอนไม่ระบุ date)
+        start_date, end_date (optional): รวมหลายวัน (YYYY-MM-DD, รวมทั้งสองวัน)
 
     Example:
         GET /api/call-matrix
         GET /api/call-matrix?date=2025-11-18
         GET /api/call-matrix?use_latest=true
+        GET /api/call-matrix?start_date=2025-11-01&end_date=2025-11-18
     """
     try:
-        date = request.args.get('date')
+        date = request.args.get('date') or request.args.get('start_date')
+        end_date = request.args.get('end_date')
         use_latest_param = request.args.get('use_latest')
+
+        for name, value in (('date', date), ('end_date', end_date)):
+            if value:
+                try:
+                    datetime.strptime(value, '%Y-%m-%d')
+                except ValueError:
+                    return jsonify({
+                        'success': False,
+                        'error': f'Invalid {name} format. Use YYYY-MM-DD',
+                        'timestamp': datetime.now().isoformat()
+                    }), 400
         
         # ถ้าระบุ date แล้ว ให้ use_latest = false (ยกเว้นถ้ามีการระบุ use_latest ไว้)
         if date and use_latest_param is None:
@@ -1931,7 +1643,7 @@ def get_call_matrix():
         else:
             use_latest = use_latest_param is None or use_latest_param.lower() == 'true'
         
-        result = call_matrix_service.get_call_matrix(date, use_latest)
+        result = call_matrix_service.get_call_matrix(date, use_latest, end_date)
 
         status_code = 200 if result.get('success') else 500
         return jsonify(result), status_code
@@ -2047,6 +1759,15 @@ def log_call():
         status_code = 200 if result.get('success') else 400
         return jsonify(result), status_code
 
+    except TimeoutError as e:
+        # The call was cancelled before it was committed, so the client can retry without double counting
+        print(f"⚠️ /api/call-matrix/log timed out: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 503
+
     except Exception as e:
         error_message = str(e)
         print(f"❌ Error in /api/call-matrix/log: {error_message}")
@@ -2059,6 +1780,45 @@ def log_call():
         }), 500
 
 
+@app.route('/api/call-matrix/log/bulk', methods=['POST'])
+def log_calls_bulk():
+    """บันทึกการโทรจำนวนมาก (NDJSON: 1 call event ต่อบรรทัด)
+
+    body ถูกอ่านทีละบรรทัดจาก stream และ commit ทีละ CALL_EVENTS_MAX_BATCH สาย
+    บรรทัดที่ผิดถูกข้ามและรายงานใน errors พร้อมหมายเลขบรรทัด
+    ถ้าการบันทึกล้มเหลว (500) บรรทัดถึง committed_through_line ถูกบันทึกแล้ว ส่งต่อจากบรรทัดถัดไป
+
+    Request Body (Content-Type: application/x-ndjson):
+        {"agent_id": "101", "call_type": "incoming", "timestamp": "2025-11-18T09:15:00+07:00"}
+        {"agent_id": "102", "time_slot": "10-11"}
+
+    Example:
+        curl -X POST --data-binary @calls.ndjson -H 'Content-Type: application/x-ndjson' \
+            /api/call-matrix/log/bulk
+    """
+    try:
+        result = call_matrix_service.log_call_stream(request.stream)
+
+        print(f"📥 Bulk call log: {result['accepted']} accepted in {result['commits']} commit(s), "
+              f"{result['rejected']} rejected")
+        if result.get('success'):
+            status_code = 200
+        else:
+            status_code = 500 if 'error' in result else 400
+        return jsonify(result), status_code
+
+    except Exception as e:
+        error_message = str(e)
+        print(f"❌ Error in /api/call-matrix/log/bulk: {error_message}")
+        traceback.print_exc()
+
+        return jsonify({
+            'success': False,
+            'error': error_message,
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
 @app.route('/api/call-matrix/update', methods=['POST'])
 def update_call_count():
     """อัพเดทจำนวนการโทรด้วยตนเอง
@@ -2099,8 +1859,7 @@ def update_call_count():
         time_slot = data.get('time_slot')
         value = data.get('value')
 
-        # ใช้ set_call_count แทน update_call_count เพื่อตั้งค่าโดยตรง
-        result = sheets_service.set_call_count(agent_id, time_slot, value)
+        result = call_matrix_service.set_call_count(agent_id, time_slot, value)
 
         status_code = 200 if result.get('success') else 400
         return jsonify(result), status_code
@@ -2139,7 +1898,7 @@ def batch_update_call_counts():
             }), 400
 
         updates = data.get('updates', [])
-        result = sheets_service.batch_update_call_counts(updates)
+        result = call_matrix_service.batch_update_call_counts(updates)
 
         status_code = 200 if result.get('success') else 400
         return jsonify(result), status_code
@@ -2156,6 +1915,246 @@ def batch_update_call_counts():
         }), 500
 
 
+@app.route('/api/call-matrix/rebuild', methods=['POST'])
+def rebuild_call_matrix():
+    """สร้างตารางจำนวนสายของวันหนึ่งใหม่จาก call event ที่บันทึกไว้
+
+    วันนี้: แทนที่ตารางปัจจุบันแล้วเขียนลง Google Sheets
+    วันอื่น: คืนตารางของวันนั้นอย่างเดียว (live: false)
+
+    Request Body:
+        {
+            "date": "2025-11-18"  # optional, default: วันนี้
+        }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        date = data.get('date')
+
+        if date is not None:
+            try:
+                datetime.strptime(date, '%Y-%m-%d')
+            except (TypeError, ValueError):
+                return jsonify({
+                    "success": False,
+                    "error": "date must be in YYYY-MM-DD format"
+                }), 400
+
+        result = call_matrix_service.rebuild_day(date)
+        return jsonify(result), 200
+
+    except Exception as e:
+        error_message = str(e)
+        print(f"❌ Error in /api/call-matrix/rebuild: {error_message}")
+        traceback.print_exc()
+
+        return jsonify({
+            'success': False,
+            'error': error_message,
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
+# ========================================
+# Dashboard API (fan-out)
+# ========================================
+
+# The sections the dashboard page used to request one after another
+DASHBOARD_SECTIONS = {
+    'run_time': ('/run-time', {}),
+    'film_data_contacts': ('/api/film-data-contacts', {'count': 'true'}),
+    'google_sheets_data': ('/api/google-sheets-data', {'daily': 'true'}),
+    'facebook_ads': ('/api/facebook-ads-campaigns', {}),
+    'google_ads': ('/api/google-ads', {}),
+    'sale_incentive': ('/N_SaleIncentive_data', {})
+}
+DASHBOARD_MAX_WORKERS = int(os.getenv('DASHBOARD_MAX_WORKERS', len(DASHBOARD_SECTIONS)))
+DASHBOARD_SECTION_TIMEOUT = int(os.getenv('DASHBOARD_SECTION_TIMEOUT', 60))  # seconds
+dashboard_executor = ThreadPoolExecutor(max_workers=DASHBOARD_MAX_WORKERS, thread_name_prefix='dashboard')
+
+
+def run_dashboard_section(path, query):
+    """Run one dashboard section and report its payload, status and timing"""
+    started = time.perf_counter()
+    try:
+        response = run_view(path, query)
+        payload = response.get_json(silent=True)
+        ok = response.status_code < 400 and not (isinstance(payload, dict) and payload.get('success') is False)
+        section = {
+            'success': ok,
+            'status_code': response.status_code,
+            'cache': response.headers.get('X-Cache'),
+            'data': payload
+        }
+        if not ok:
+            section['error'] = payload.get('error') if isinstance(payload, dict) else f'HTTP {response.status_code}'
+    except Exception as e:
+        print(f"❌ Dashboard section {path} failed: {e}")
+        section = {'success': False, 'status_code': 500, 'error': str(e), 'data': None}
+
+    section['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return section
+
+
+@app.route('/api/dashboard', methods=['GET'])
+def get_dashboard():
+    """Build every dashboard section in one request, fetching them concurrently
+
+    Each section is the response of its own endpoint (served from the same caches),
+    so page latency is the slowest section instead of the sum of all of them.
+
+    Query Parameters:
+        sections (optional): comma-separated subset of sections (default: all)
+        <section>.<param> (optional): query parameter passed to one section,
+            e.g. facebook_ads.date_preset=last_7d or run_time.date=2025-11-18
+
+    Example:
+        GET /api/dashboard
+        GET /api/dashboard?sections=run_time,facebook_ads&facebook_ads.date_preset=yesterday
+    """
+    started = time.perf_counter()
+
+    requested = request.args.get('sections')
+    names = [name.strip() for name in requested.split(',') if name.strip()] if requested else list(DASHBOARD_SECTIONS)
+    unknown = [name for name in names if name not in DASHBOARD_SECTIONS]
+    if unknown:
+        return jsonify({
+            'success': False,
+            'error': f"Unknown sections: {', '.join(unknown)}",
+            'available_sections': list(DASHBOARD_SECTIONS),
+            'timestamp': datetime.now().isoformat()
+        }), 400
+
+    futures = {}
+    for name in names:
+        path, defaults = DASHBOARD_SECTIONS[name]
+        query = dict(defaults)
+        prefix = name + '.'
+        for key, value in request.args.items():
+            if key.startswith(prefix):
+                query[key[len(prefix):]] = value
+        if request.args.get('no_cache', '').lower() == 'true':
+            query['no_cache'] = 'true'
+        futures[name] = dashboard_executor.submit(run_dashboard_section, path, query)
+
+    # Sections share one deadline, so the whole page waits at most DASHBOARD_SECTION_TIMEOUT
+    deadline = time.monotonic() + DASHBOARD_SECTION_TIMEOUT
+    sections = {}
+    for name, future in futures.items():
+        try:
+            sections[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FuturesTimeoutError:
+            # The section keeps running in the background and still fills its cache
+            sections[name] = {
+                'success': False,
+                'status_code': 504,
+                'error': f'Timed out after {DASHBOARD_SECTION_TIMEOUT}s',
+                'data': None,
+                'duration_ms': DASHBOARD_SECTION_TIMEOUT * 1000
+            }
+
+    failed = [name for name, section in sections.items() if not section['success']]
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    print(f"📊 Dashboard built in {total_ms}ms ({len(sections) - len(failed)}/{len(sections)} sections ok)")
+
+    return jsonify({
+        'success': not failed,
+        'partial': bool(failed) and len(failed) < len(sections),
+        'failed_sections': failed,
+        'sections': sections,
+        'timing': {
+            'total_ms': total_ms,
+            'sum_of_sections_ms': round(sum(section['duration_ms'] for section in sections.values()), 1),
+            'sections_ms': {name: section['duration_ms'] for name, section in sections.items()}
+        },
+        'timestamp': datetime.now().isoformat()
+    }), 200 if len(failed) < len(sections) else 502
+
+
+# ========================================
+# Background Prefetch
+# ========================================
+
+def run_view(path, query=None, refresh=False):
+    """Run the view for path in its own request context and return the Response
+
+    refresh=True makes cached views recompute and overwrite their cache entry.
+    """
+    with app.test_request_context(path, query_string=query or {}):
+        g.cache_refresh = refresh
+        view = app.view_functions[request.url_rule.endpoint]
+        return app.make_response(view(**request.view_args))
+
+
+def prefetch_view(path, query=None):
+    """Prefetch job that refreshes the cached response of a view"""
+    def job():
+        response = run_view(path, query, refresh=True)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{path} returned HTTP {response.status_code}")
+    return job
+
+
+def prefetch_snapshot(sheet_name, columns=None):
+    """Prefetch job that revalidates a worksheet snapshot before its TTL runs out"""
+    def job():
+        sheet_snapshots.get_snapshot(
+            os.getenv('GOOGLE_SPREADSHEET_ID'), sheet_name, revalidate=True, columns=columns
+        )
+    return job
+
+
+prefetch_scheduler = PrefetchScheduler(cache_backend)
+
+# Refresh at ~80% of each TTL so user requests always find a warm cache
+if os.getenv('GOOGLE_SPREADSHEET_ID'):
+    for _sheet_name, _columns in [('Film data', None),
+                                  ('เคสได้ชื่อเบอร์', SHEETS_DATA_COLUMNS),
+                                  ('N_SaleIncentive', None)]:
+        prefetch_scheduler.register(
+            f'sheet:{_sheet_name}', prefetch_snapshot(_sheet_name, _columns), sheet_snapshots.ttl * 0.8
+        )
+    prefetch_scheduler.register(
+        'call-log:สรุป call_AI',
+        lambda: sheets_service.get_call_matrix_index(force=True),
+        call_log_reader.sync_interval * 0.8
+    )
+    prefetch_scheduler.register('view:/run-time', prefetch_view('/run-time'), CACHE_DURATION * 0.8)
+
+if os.getenv('FACEBOOK_ACCESS_TOKEN') and os.getenv('FACEBOOK_AD_ACCOUNT_ID'):
+    prefetch_scheduler.register(
+        'facebook-ads:today',
+        prefetch_view('/api/facebook-ads-campaigns', {'date_preset': 'today'}),
+        FB_ADS_CACHE_DURATION * 0.8
+    )
+
+if os.getenv('GOOGLE_ADS_REFRESH_TOKEN'):
+    prefetch_scheduler.register('google-ads:today', prefetch_view('/api/google-ads'), GOOGLE_ADS_CACHE_DURATION * 0.8)
+
+if os.getenv('GOOGLE_SPREADSHEET_ID') and sheets_read_model.enabled:
+    prefetch_scheduler.register('read-model:sheets', sheets_read_model.sync_all, sheets_read_model.sync_interval)
+
+if PREFETCH_ENABLED:
+    prefetch_scheduler.start()
+
+# Maintenance jobs keep stored data correct, so they run even when PREFETCH_ENABLED=false
+maintenance_scheduler = PrefetchScheduler(cache_backend, name='maintenance')
+
+if os.getenv('GOOGLE_SPREADSHEET_ID'):
+    # Project changed call counts onto the call matrix sheet in one values_batch_update
+    maintenance_scheduler.register('call-matrix:flush', call_matrix_service.flush_pending, CALL_MATRIX_FLUSH_INTERVAL)
+else:
+    print("⚠️ GOOGLE_SPREADSHEET_ID is not set: logged calls are stored but never written to the call matrix sheet")
+
+# Fold call events past their retention into daily totals
+maintenance_scheduler.register('call-events:compact', call_matrix_service.compact_call_events, CALL_EVENTS_COMPACT_INTERVAL)
+
+# Drop expired cache entries ahead of time so long-running workers stay flat in memory
+maintenance_scheduler.register('cache:sweep', cache_backend.purge_expired, CACHE_SWEEP_INTERVAL)
+
+maintenance_scheduler.start()
+
+
 # ========================================
 # Error Handlers
 # ========================================
@@ -2184,8 +2183,11 @@ def not_found(error):
             '/api/call-matrix/agent/<agent_id>',
             '/api/call-matrix/time-slot/<time_slot>',
             '/api/call-matrix/log',
+            '/api/call-matrix/log/bulk',
             '/api/call-matrix/update',
-            '/api/call-matrix/batch-update'
+            '/api/call-matrix/batch-update',
+            '/api/call-matrix/rebuild',
+            '/api/dashboard'
         ]
     }), 404
 
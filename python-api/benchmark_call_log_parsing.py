@@ -0,0 +1,137 @@
+"""
+Benchmark การ parse Call Log ('สรุป call_AI')
+เทียบ parser เดิม (split string + dict ต่อแถว) กับ services/call_log_columns (batch ทีละคอลัมน์)
+
+ใช้ข้อมูลสุ่ม ไม่ต้องเชื่อมต่อ Google Sheets:
+    python benchmark_call_log_parsing.py [จำนวนแถว]
+"""
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from services.call_log_columns import HAS_NUMPY, aggregate_calls, parse_call_columns
+from services.call_matrix_index import MIN_DURATION_SECONDS, SLOT_HOURS, TARGET_AGENTS, TIME_SLOTS
+
+
+def legacy_parse_datetime(datetime_str):
+    """parser เดิมของ read_call_matrix (YYYY-MM-DD H:MM:SS)"""
+    try:
+        if not datetime_str or datetime_str.strip() == '':
+            return None
+        parts = datetime_str.strip().split()
+        if len(parts) != 2:
+            return None
+        date_part = parts[0].strip()
+        time_part = parts[1].strip()
+        date_components = date_part.split('-')
+        if len(date_components) != 3:
+            return None
+        year = int(date_components[0])
+        month = int(date_components[1])
+        day = int(date_components[2])
+        formatted_date = f"{year:04d}-{month:02d}-{day:02d}"
+        time_components = time_part.split(':')
+        hour = int(time_components[0]) if time_components else 0
+        return {
+            'date': formatted_date,
+            'time': time_part,
+            'hour': hour,
+            'datetime': datetime_str
+        }
+    except Exception:
+        return None
+
+
+def legacy_parse_duration(duration_str):
+    """parser เดิมของ duration (H:MM:SS หรือ MM:SS)"""
+    try:
+        if not duration_str or duration_str.strip() == '':
+            return 0
+        parts = duration_str.strip().split(':')
+        if len(parts) == 3:
+            hours, minutes, seconds = map(int, parts)
+            return hours * 3600 + minutes * 60 + seconds
+        elif len(parts) == 2:
+            minutes, seconds = map(int, parts)
+            return minutes * 60 + seconds
+        else:
+            return 0
+    except Exception:
+        return 0
+
+
+def legacy_count(rows):
+    """นับสายทุกวันแบบเดิม: parse ทีละแถว + วน slot หา time slot"""
+    days = {}
+    for row in rows:
+        caller = row[1].strip()
+        if caller not in TARGET_AGENTS:
+            continue
+        parsed = legacy_parse_datetime(row[0].strip())
+        if not parsed:
+            continue
+        if legacy_parse_duration(row[2].strip()) < MIN_DURATION_SECONDS:
+            continue
+        hour = parsed['hour']
+        for slot in TIME_SLOTS:
+            start_hour = int(slot.split('-')[0])
+            end_hour = int(slot.split('-')[1])
+            if start_hour <= hour < end_hour:
+                key = (parsed['date'], caller, slot)
+                days[key] = days.get(key, 0) + 1
+                break
+    return days
+
+
+def columnar_count(rows, use_numpy):
+    columns = parse_call_columns(rows, (0, 1, 2), TARGET_AGENTS, use_numpy=use_numpy)
+    return aggregate_calls(columns, SLOT_HOURS, MIN_DURATION_SECONDS)
+
+
+def make_rows(count):
+    rng = random.Random(42)
+    first_day = date(2025, 1, 1)
+    callers = TARGET_AGENTS + ['100', '109', '']
+    rows = []
+    for _ in range(count):
+        day = first_day + timedelta(days=rng.randrange(300))
+        start = f"{day.isoformat()} {rng.randrange(7, 22)}:{rng.randrange(60):02d}:{rng.randrange(60):02d}"
+        duration = f"{rng.randrange(3)}:{rng.randrange(60):02d}:{rng.randrange(60):02d}"
+        rows.append([start, rng.choice(callers), duration])
+    return rows
+
+
+def measure(name, func, rows, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(rows)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    rate = len(rows) / best
+    print(f"  {name:<24} {best * 1000:9.1f} ms  {rate:12,.0f} rows/sec")
+    return rate
+
+
+if __name__ == '__main__':
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rows = make_rows(row_count)
+
+    print("=" * 60)
+    print(f"⏱️  Call Log parsing benchmark ({row_count:,} rows)")
+    print("=" * 60)
+
+    legacy_rate = measure('legacy (per row)', legacy_count, rows)
+    python_rate = measure('columnar (pure Python)', lambda r: columnar_count(r, False), rows)
+    print(f"  -> {python_rate / legacy_rate:.1f}x")
+    if HAS_NUMPY:
+        numpy_rate = measure('columnar (NumPy)', lambda r: columnar_count(r, True), rows)
+        print(f"  -> {numpy_rate / legacy_rate:.1f}x")
+    else:
+        print("  (numpy not installed, skipping NumPy path)")
+
+    # ตรวจว่าผลรวมตรงกับ parser เดิม
+    legacy = legacy_count(rows)
+    total = sum(columnar_count(rows, False).cells.values())
+    print(f"✅ Totals match: {sum(legacy.values()) == total} ({total:,} calls)")
@@ -1,53 +1,273 @@
 import psycopg2
-from psycopg2 import Error
+from psycopg2 import Error, InterfaceError, OperationalError
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# host สำรองเมื่อเชื่อมต่อ DB_HOST ไม่ได้ (Local IP)
+DB_FALLBACK_HOST = os.getenv("DB_FALLBACK_HOST", "192.168.1.19")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 5))
+# รอ connection ว่างใน pool นานสุดกี่วินาที
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+# ตัดการเชื่อมต่อที่ host ไม่ตอบภายในกี่วินาที (เดิมรอ timeout ของ OS ก่อนลอง host สำรอง)
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+# connection ที่ว่างนานกว่านี้ (วินาที) จะถูกตรวจด้วย SELECT 1 ก่อนส่งให้ request
+DB_HEALTH_CHECK_IDLE = float(os.getenv("DB_HEALTH_CHECK_IDLE", 30))
+
+
+def get_db_hosts():
+    """รายการ (host, port) ที่จะลองเชื่อมต่อตามลำดับ"""
+    hosts = [(os.getenv("DB_HOST", "n8n.bjhbangkok.com"), os.getenv("DB_PORT", "5432"))]
+    if DB_FALLBACK_HOST and DB_FALLBACK_HOST != hosts[0][0]:
+        hosts.append((DB_FALLBACK_HOST, "5432"))
+    return hosts
+
+
+def get_connect_params(host, port):
+    """parameter ของ psycopg2.connect สำหรับ host หนึ่ง"""
+    return {
+        'host': host,
+        'port': port,
+        'user': os.getenv("DB_USER", "postgres"),
+        'password': os.getenv("DB_PASSWORD", "Bjh12345!!"),
+        'database': os.getenv("DB_NAME", "postgres"),
+        'connect_timeout': DB_CONNECT_TIMEOUT,
+        'options': f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+        'application_name': 'python-api'
+    }
+
+
+class PostgresPool:
+    """Connection pool ของ PostgreSQL หนึ่งชุดต่อ worker (ThreadedConnectionPool)
+
+    - เปิด pool กับ host ที่ใช้ได้ล่าสุดก่อน แล้วค่อยลอง host ถัดไป
+      request จึงไม่ต้องรอ connect timeout ของ host ที่ล่มทุกครั้ง
+    - ถ้า connection ใหม่ไปยัง host ปัจจุบันไม่ได้ จะเปิด pool ใหม่กับ host ถัดไป (failover)
+    - connection ที่ว่างนานเกิน DB_HEALTH_CHECK_IDLE ถูกตรวจด้วย SELECT 1 ตอน checkout
+    - ถ้า connection เต็ม request จะรอได้ไม่เกิน timeout วินาที แล้วได้ PoolError
+    - ทุก connection ตั้ง connect_timeout และ statement_timeout
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 health_check_idle=DB_HEALTH_CHECK_IDLE):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_idle = health_check_idle
+        self._lock = threading.Lock()
+        self._last_good_host = None
+        self._reset()
+
+    def _reset(self):
+        # pool ถูกเปิดตอนใช้ครั้งแรก จึงไม่มี connection ที่เปิดไว้ก่อน fork
+        self._pid = os.getpid()
+        self._pool = None
+        self._host = None
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._in_use = 0
+        self._last_used = {}  # id(connection) -> time.monotonic() ที่คืนเข้า pool
+        self.stats = {
+            'checkouts': 0, 'pool_timeouts': 0, 'health_check_failures': 0,
+            'broken_connections': 0, 'failovers': 0
+        }
+        self._last_error = None
+        self._opened_at = None
+
+    def ordered_hosts(self):
+        """host ทั้งหมดโดยเอา host ที่ใช้ได้ล่าสุดขึ้นก่อน"""
+        hosts = get_db_hosts()
+        if self._last_good_host in hosts:
+            hosts.remove(self._last_good_host)
+            hosts.insert(0, self._last_good_host)
+        return hosts
+
+    def remember_host(self, host):
+        self._last_good_host = host
+
+    def _open_pool(self, skip_host=None):
+        errors = []
+        for host in self.ordered_hosts():
+            if host == skip_host:
+                continue
+            try:
+                pool = ThreadedConnectionPool(self.minconn, self.maxconn, **get_connect_params(*host))
+                if self.minconn == 0:
+                    # ตรวจว่าเชื่อมต่อได้จริงก่อนใช้ host นี้
+                    pool.putconn(pool.getconn())
+            except Error as e:
+                print(f"เกิดข้อผิดพลาดในการเชื่อมต่อ PostgreSQL (Host: {host[0]}): {e}")
+                errors.append(f"{host[0]}: {e}")
+                continue
+            print(f"เชื่อมต่อ PostgreSQL สำเร็จ (Host: {host[0]}, pool {self.minconn}-{self.maxconn})")
+            self._pool = pool
+            self._host = host
+            self._opened_at = datetime.now()
+            self._last_error = None
+            self.remember_host(host)
+            return pool
+
+        self._last_error = '; '.join(errors)
+        raise OperationalError(f"Could not connect to any PostgreSQL host ({self._last_error})")
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            return self._pool or self._open_pool()
+
+    def _failover(self, pool, error):
+        """host ของ pool นี้เปิด connection ใหม่ไม่ได้ -> เปิด pool ใหม่กับ host ถัดไป"""
+        with self._lock:
+            if self._pool is not pool:
+                return  # thread อื่น failover ไปแล้ว
+            failed_host = self._host
+            print(f"⚠️ PostgreSQL host {failed_host[0]} failed ({error}), switching host")
+            self.stats['failovers'] += 1
+            self._pool = None
+            self._open_pool(skip_host=failed_host)
+
+    def _is_healthy(self, connection):
+        if connection.closed:
+            return False
+        last_used = self._last_used.get(id(connection))
+        if last_used is None or time.monotonic() - last_used < self.health_check_idle:
+            return True  # connection ใหม่ หรือเพิ่งใช้ไป
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+            return True
+        except Error:
+            return False
+
+    def _checkout(self):
+        # ลองได้หลายครั้งเผื่อ connection ที่ว่างอยู่ตายหมดทั้ง pool
+        for _ in range(self.maxconn + 1):
+            pool = self._get_pool()
+            try:
+                connection = pool.getconn()
+            except OperationalError as e:
+                self._failover(pool, e)
+                continue
+            if self._is_healthy(connection):
+                return connection, pool
+            self.stats['health_check_failures'] += 1
+            self._last_used.pop(id(connection), None)
+            pool.putconn(connection, close=True)
+        raise OperationalError("Could not get a healthy PostgreSQL connection")
+
+    def _release(self, connection, pool, broken):
+        with self._lock:
+            current = pool is self._pool
+        broken = broken or bool(connection.closed)
+        if broken:
+            self.stats['broken_connections'] += 1
+        if broken or not current:
+            # connection เสีย หรือมาจาก pool เดิมก่อน failover
+            self._last_used.pop(id(connection), None)
+            if current:
+                pool.putconn(connection, close=True)
+            else:
+                connection.close()
+            return
+        self._last_used[id(connection)] = time.monotonic()
+        pool.putconn(connection)
+
+    @contextmanager
+    def connection(self):
+        """ยืม connection จาก pool (คืนอัตโนมัติ, transaction ที่ค้างถูก rollback)
+
+        Raises:
+            PoolError: ถ้ารอ connection ว่างเกิน timeout
+            OperationalError: ถ้าเชื่อมต่อไม่ได้ทุก host
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            self.stats['pool_timeouts'] += 1
+            raise PoolError(f"No free PostgreSQL connection within {self.timeout}s (pool max {self.maxconn})")
+
+        connection = None
+        broken = False
+        try:
+            connection, pool = self._checkout()
+            self.stats['checkouts'] += 1
+            self._in_use += 1
+            yield connection
+        except (OperationalError, InterfaceError):
+            broken = True
+            raise
+        finally:
+            if connection is not None:
+                self._in_use -= 1
+                self._release(connection, pool, broken)
+            self._slots.release()
+
+    def status(self):
+        """สถานะสำหรับ /health (ไม่เปิด connection ใหม่)"""
+        return {
+            'host': self._host[0] if self._host else None,
+            'last_good_host': self._last_good_host[0] if self._last_good_host else None,
+            'open': self._pool is not None,
+            'opened_at': self._opened_at.isoformat() if self._opened_at else None,
+            'min': self.minconn,
+            'max': self.maxconn,
+            'in_use': self._in_use,
+            'connect_timeout': DB_CONNECT_TIMEOUT,
+            'statement_timeout_ms': DB_STATEMENT_TIMEOUT_MS,
+            'last_error': self._last_error,
+            'stats': dict(self.stats)
+        }
+
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool():
+    """คืน PostgresPool ตัวเดียวของ process"""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None:
+            _db_pool = PostgresPool()
+        return _db_pool
+
+
+def db_connection():
+    """ยืม connection จาก pool ของ worker นี้: with db_connection() as connection: ..."""
+    return get_db_pool().connection()
+
+
 def get_db_connection():
     """
-    สร้างการเชื่อมต่อกับ PostgreSQL database
+    สร้างการเชื่อมต่อกับ PostgreSQL database (connection เดี่ยว ไม่ผ่าน pool)
     รองรับการเชื่อมต่อทั้ง domain name และ local IP
+    ลอง host ที่ใช้ได้ล่าสุดก่อน ส่วน request ของ API ให้ใช้ db_connection()
     """
-    try:
-        # ลองเชื่อมต่อด้วย domain name ก่อน
-        db_host = os.getenv("DB_HOST", "n8n.bjhbangkok.com")
-        
-        connection = psycopg2.connect(
-            host=db_host,
-            port=os.getenv("DB_PORT", "5432"),
-            user=os.getenv("DB_USER", "postgres"),
-            password=os.getenv("DB_PASSWORD", "Bjh12345!!"),
-            database=os.getenv("DB_NAME", "postgres")
-        )
-        print(f"เชื่อมต่อ PostgreSQL สำเร็จ (Host: {db_host})")
-        return connection
-    except Error as e:
-        print(f"เกิดข้อผิดพลาดในการเชื่อมต่อ PostgreSQL: {e}")
-        # ลองเชื่อมต่อด้วย Local IP
+    pool = get_db_pool()
+    for host in pool.ordered_hosts():
         try:
-            print("กำลังลองเชื่อมต่อด้วย Local IP...")
-            connection = psycopg2.connect(
-                host="192.168.1.19",
-                port="5432",
-                user="postgres",
-                password="Bjh12345!!",
-                database="postgres"
-            )
-            print("เชื่อมต่อ PostgreSQL สำเร็จ (Host: 192.168.1.19)")
+            connection = psycopg2.connect(**get_connect_params(*host))
+            print(f"เชื่อมต่อ PostgreSQL สำเร็จ (Host: {host[0]})")
+            pool.remember_host(host)
             return connection
-        except Error as e2:
-            print(f"เกิดข้อผิดพลาดในการเชื่อมต่อ PostgreSQL (Local IP): {e2}")
-            return None
+        except Error as e:
+            print(f"เกิดข้อผิดพลาดในการเชื่อมต่อ PostgreSQL (Host: {host[0]}): {e}")
+    return None
 
 def test_connection():
     """
     ทดสอบการเชื่อมต่อและดึงข้อมูลเวอร์ชัน PostgreSQL
     """
     connection = get_db_connection()
-    
+
     if connection:
         try:
             cursor = connection.cursor()
@@ -55,7 +275,7 @@ def test_connection():
             cursor.execute("SELECT version();")
             db_version = cursor.fetchone()
             print(f"PostgreSQL version: {db_version[0]}")
-            
+
             cursor.close()
         except Error as e:
             print(f"เกิดข้อผิดพลาด: {e}")
@@ -0,0 +1,233 @@
+import base64
+import datetime as dt
+import hashlib
+import json
+import os
+import threading
+import time
+
+from psycopg2 import sql
+
+
+LEADS_SCHEMA = 'BJH-Server'
+LEADS_TABLE_NAME = 'bjh_all_leads'
+LEADS_TABLE = sql.Identifier(LEADS_SCHEMA, LEADS_TABLE_NAME)
+LEADS_SOURCE = 'PostgreSQL (BJH-Server.bjh_all_leads)'
+
+# จำนวนแถวที่ดึงจาก server-side cursor ต่อรอบ (FETCH ครั้งละกี่แถว)
+DATA_BJH_STREAM_ITERSIZE = int(os.getenv('DATA_BJH_STREAM_ITERSIZE', 2000))
+# คอลัมน์ที่ใช้เรียงสำหรับ pagination (ควรมี index) ไม่ตั้ง = ใช้ primary key
+DATA_BJH_ORDER_COLUMN = os.getenv('DATA_BJH_ORDER_COLUMN')
+DATA_BJH_MAX_PAGE_SIZE = int(os.getenv('DATA_BJH_MAX_PAGE_SIZE', 1000))
+# อายุของรายชื่อคอลัมน์/primary key ที่อ่านจาก catalog (วินาที)
+TABLE_INFO_TTL = 600
+
+# query parameter -> คอลัมน์ที่ใช้กรอง (เทียบเท่ากัน)
+FILTER_COLUMNS = {'status': 'status', 'source': 'source', 'doctor': 'doctor'}
+
+
+class InvalidLeadsQuery(ValueError):
+    """parameter ของ /data_bjh ไม่ถูกต้อง (คอลัมน์ไม่มีจริง, cursor เสีย ฯลฯ)"""
+
+    def __init__(self, message, available_columns=None):
+        super().__init__(message)
+        self.available_columns = available_columns
+
+
+class LeadsTableInfo:
+    """คอลัมน์จริงของตาราง และคอลัมน์ที่ใช้เรียงสำหรับ keyset pagination"""
+
+    __slots__ = ('columns', 'key_columns', 'fetched_at')
+
+    def __init__(self, columns, key_columns):
+        self.columns = columns
+        self.key_columns = key_columns
+        self.fetched_at = time.monotonic()
+
+    def resolve_columns(self, names):
+        """ตรวจชื่อคอลัมน์ของ columns= กับคอลัมน์จริงของตาราง
+
+        Raises:
+            InvalidLeadsQuery: ถ้ามีชื่อที่ไม่อยู่ในตาราง
+        """
+        missing = [name for name in names if name not in self.columns]
+        if missing:
+            raise InvalidLeadsQuery(f"Unknown column: {', '.join(missing)}", self.columns)
+        return names
+
+
+_table_info = None
+_table_info_lock = threading.Lock()
+
+
+def get_table_info(pool, force=False):
+    """อ่านคอลัมน์และ primary key ของ bjh_all_leads จาก catalog (cache ไว้ TABLE_INFO_TTL วินาที)"""
+    global _table_info
+    with _table_info_lock:
+        if (not force and _table_info is not None
+                and time.monotonic() - _table_info.fetched_at < TABLE_INFO_TTL):
+            return _table_info
+
+    with pool.connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT column_name FROM information_schema.columns '
+                'WHERE table_schema = %s AND table_name = %s ORDER BY ordinal_position',
+                (LEADS_SCHEMA, LEADS_TABLE_NAME)
+            )
+            columns = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                'SELECT a.attname FROM pg_index i '
+                'JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) '
+                'WHERE i.indrelid = %s::regclass AND i.indisprimary '
+                'ORDER BY array_position(i.indkey::int2[], a.attnum)',
+                (LEADS_TABLE.as_string(connection),)
+            )
+            key_columns = [row[0] for row in cursor.fetchall()]
+
+    if DATA_BJH_ORDER_COLUMN:
+        # ต่อท้ายด้วย primary key กันแถวที่ค่าซ้ำกันหล่นหายระหว่างหน้า
+        key_columns = ([DATA_BJH_ORDER_COLUMN] + [name for name in key_columns if name != DATA_BJH_ORDER_COLUMN]
+                       if DATA_BJH_ORDER_COLUMN in columns else [])
+
+    info = LeadsTableInfo(columns, key_columns)
+    with _table_info_lock:
+        _table_info = info
+    return info
+
+
+def estimate_row_count(pool):
+    """จำนวนแถวโดยประมาณจาก pg_class.reltuples (อัปเดตโดย ANALYZE/autovacuum, -1 = ยังไม่เคย analyze)"""
+    with pool.connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                (LEADS_TABLE.as_string(connection),)
+            )
+            return cursor.fetchone()[0]
+
+
+def exact_row_count(pool, filters):
+    """จำนวนแถวที่ตรงกับ filters ด้วย COUNT(*)"""
+    where, params = _filter_conditions(filters)
+    query = sql.SQL('SELECT COUNT(*) FROM {}').format(LEADS_TABLE)
+    if where:
+        query += sql.SQL(' WHERE ') + sql.SQL(' AND ').join(where)
+    with pool.connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchone()[0]
+
+
+def _filter_conditions(filters):
+    conditions = []
+    params = []
+    for name, column in FILTER_COLUMNS.items():
+        if filters.get(name):
+            conditions.append(sql.SQL('{} = %s').format(sql.Identifier(column)))
+            params.append(filters[name])
+    return conditions, params
+
+
+def build_leads_query(filters, limit=None, columns=None, order_columns=None, after=None):
+    """สร้าง SELECT ของ bjh_all_leads พร้อมเงื่อนไขกรอง
+
+    Args:
+        filters: dict ชื่อ filter -> ค่า (ข้ามค่าที่ว่าง)
+        limit: จำนวนแถวสูงสุด (None = ไม่จำกัด)
+        columns: list ชื่อคอลัมน์ที่ต้องการ (None = ทุกคอลัมน์) ต้องตรวจกับตารางมาก่อน
+        order_columns: คอลัมน์ที่ใช้เรียง (keyset pagination)
+        after: ค่าของ order_columns ในแถวสุดท้ายของหน้าก่อน
+
+    Returns:
+        tuple: (query, params)
+    """
+    if columns:
+        select = sql.SQL(', ').join(sql.Identifier(name) for name in columns)
+    else:
+        select = sql.SQL('*')
+    query = sql.SQL('SELECT {} FROM {}').format(select, LEADS_TABLE)
+
+    conditions, params = _filter_conditions(filters)
+    if after is not None:
+        # (k1, k2) > (v1, v2) ใช้ index ของ key ได้โดยตรง ไม่ต้องข้ามแถวแบบ OFFSET
+        keys = sql.SQL(', ').join(sql.Identifier(name) for name in order_columns)
+        values = sql.SQL(', ').join(sql.Placeholder() for _ in order_columns)
+        conditions.append(sql.SQL('({}) > ({})').format(keys, values))
+        params.extend(after)
+
+    if conditions:
+        query += sql.SQL(' WHERE ') + sql.SQL(' AND ').join(conditions)
+
+    if order_columns:
+        query += sql.SQL(' ORDER BY ') + sql.SQL(', ').join(sql.Identifier(name) for name in order_columns)
+
+    if limit:
+        query += sql.SQL(' LIMIT %s')
+        params.append(int(limit))
+
+    return query, params
+
+
+def _cursor_fingerprint(filters, order_columns):
+    # cursor ใช้ได้กับ filter และการเรียงชุดเดิมเท่านั้น
+    source = json.dumps([{name: filters.get(name) for name in FILTER_COLUMNS}, order_columns])
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+
+
+def encode_cursor(key_values, filters, order_columns):
+    """ค่า key ของแถวสุดท้าย -> next_cursor (opaque string)"""
+    payload = json.dumps({'k': key_values, 'f': _cursor_fingerprint(filters, order_columns)}, default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, filters, order_columns):
+    """next_cursor -> ค่า key ของแถวสุดท้ายของหน้าก่อน
+
+    Raises:
+        InvalidLeadsQuery: ถ้า cursor เสีย หรือถูกสร้างจาก filter ชุดอื่น
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        key_values = payload['k']
+        fingerprint = payload['f']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidLeadsQuery('Invalid cursor')
+    if not isinstance(key_values, list):
+        raise InvalidLeadsQuery('Invalid cursor')
+    if fingerprint != _cursor_fingerprint(filters, order_columns) or len(key_values) != len(order_columns):
+        raise InvalidLeadsQuery('Cursor does not match the current filters')
+    return key_values
+
+
+def row_to_dict(column_names, row):
+    """แปลงแถวเป็น dict (date/datetime เป็น ISO string)"""
+    row_dict = {}
+    for col_name, value in zip(column_names, row):
+        if isinstance(value, (dt.datetime, dt.date)):
+            value = value.isoformat()
+        row_dict[col_name] = value
+    return row_dict
+
+
+def iter_leads(pool, query, params, itersize=DATA_BJH_STREAM_ITERSIZE):
+    """อ่านผลของ query ทีละ batch ผ่าน named (server-side) cursor
+
+    ข้อมูลไม่ถูกโหลดทั้งตารางเข้าหน่วยความจำ: PostgreSQL ส่งมาครั้งละ itersize แถว
+    connection ถูกยืมจาก pool ตลอดอายุของ generator และคืนเมื่อ generator จบหรือถูกปิด
+
+    Yields:
+        ค่าแรกคือ list ชื่อคอลัมน์ จากนั้นเป็น list ของแถว (dict) ครั้งละไม่เกิน itersize แถว
+    """
+    with pool.connection() as connection:
+        with connection.cursor(name='data_bjh_stream') as cursor:
+            cursor.execute(query, params)
+
+            # named cursor มี description หลังจาก fetch ครั้งแรก
+            batch = cursor.fetchmany(itersize)
+            column_names = [desc[0] for desc in cursor.description]
+            yield column_names
+
+            while batch:
+                yield [row_to_dict(column_names, row) for row in batch]
+                batch = cursor.fetchmany(itersize)
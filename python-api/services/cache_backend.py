@@ -0,0 +1,446 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite')  # 'sqlite' | 'memory'
+CACHE_SQLITE_PATH = os.getenv('CACHE_SQLITE_PATH', '/tmp/python-api-cache.sqlite3')
+# ลบ entry ที่หมดอายุล่วงหน้าทุกกี่วินาที (ผ่าน prefetch scheduler)
+CACHE_SWEEP_INTERVAL = int(os.getenv('CACHE_SWEEP_INTERVAL', 60))
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+class CacheEntry:
+    """ค่าที่เก็บใน cache พร้อมเวลาที่สร้างและหมดอายุ (epoch seconds)"""
+
+    __slots__ = ('value', 'created_at', 'expires_at', 'size')
+
+    def __init__(self, value, created_at, expires_at, size):
+        self.value = value
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.size = size
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+    @property
+    def expires_in(self):
+        return self.expires_at - time.time()
+
+
+class CacheBackend:
+    """Interface ของ cache backend
+
+    ข้อมูลแบ่งตาม namespace (เช่น 'responses', 'facebook_ads') แต่ละ namespace
+    จำกัดจำนวน entry และขนาดรวมได้ด้วย set_limits() และถูกตัดแบบ LRU
+
+    generation() เพิ่มขึ้นทุกครั้งที่ clear() ใช้ให้ cache ในหน่วยความจำของแต่ละ
+    worker รู้ว่าต้องล้างตัวเอง
+
+    status() รายงานจำนวน entry, ขนาดรวม และจำนวนที่ถูกตัด (evictions = LRU/เกินขนาด,
+    expirations = หมดอายุ) ของแต่ละ namespace ส่วน purge_expired() ใช้ลบ entry
+    ที่หมดอายุล่วงหน้า (เช่นจาก prefetch scheduler) แทนการรอให้ถูกอ่าน
+    """
+
+    name = 'base'
+
+    def __init__(self):
+        self._limits = {}
+
+    def set_limits(self, namespace, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self._limits[namespace] = (max_entries, max_bytes)
+
+    def limits(self, namespace):
+        return self._limits.get(namespace, (DEFAULT_MAX_ENTRIES, DEFAULT_MAX_BYTES))
+
+    def get(self, namespace, key):
+        """คืน CacheEntry หรือ None ถ้าไม่มี/หมดอายุ"""
+        raise NotImplementedError
+
+    def set(self, namespace, key, value, ttl):
+        """เก็บค่า คืนขนาด (bytes โดยประมาณ) ของ entry"""
+        raise NotImplementedError
+
+    def add(self, namespace, key, value, ttl):
+        """เก็บค่าเฉพาะเมื่อยังไม่มี key (หรือหมดอายุแล้ว) คืน True ถ้าเก็บสำเร็จ
+
+        ใช้เป็น lease ให้งานทำเพียง worker เดียว
+        """
+        raise NotImplementedError
+
+    def delete(self, namespace, key):
+        raise NotImplementedError
+
+    def clear(self, namespace=None):
+        """ลบทุก entry (หรือเฉพาะ namespace) และเพิ่ม generation"""
+        raise NotImplementedError
+
+    def purge_expired(self, namespace=None):
+        """ลบ entry ที่หมดอายุแล้ว (ทุก namespace หรือเฉพาะ namespace) คืนจำนวนที่ลบ"""
+        raise NotImplementedError
+
+    def generation(self):
+        raise NotImplementedError
+
+    def status(self):
+        raise NotImplementedError
+
+
+class InProcessCacheBackend(CacheBackend):
+    """เก็บใน dict ของ process (แต่ละ gunicorn worker มีชุดของตัวเอง)"""
+
+    name = 'memory'
+
+    def __init__(self):
+        super().__init__()
+        self._namespaces = {}  # namespace -> OrderedDict(key -> CacheEntry)
+        self._bytes = {}
+        self._counters = {}  # namespace -> {'evictions': n, 'expirations': n}
+        self._generation = 0
+        self._lock = threading.RLock()
+
+    def _namespace(self, namespace):
+        if namespace not in self._namespaces:
+            self._namespaces[namespace] = OrderedDict()
+            self._bytes[namespace] = 0
+            self._counters[namespace] = {'evictions': 0, 'expirations': 0}
+        return self._namespaces[namespace]
+
+    def _remove(self, namespace, key, reason=None):
+        entry = self._namespaces[namespace].pop(key)
+        self._bytes[namespace] -= entry.size
+        if reason is not None:
+            self._counters[namespace][reason] += 1
+
+    def get(self, namespace, key):
+        with self._lock:
+            entries = self._namespace(namespace)
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry.expires_at:
+                self._remove(namespace, key, 'expirations')
+                return None
+            entries.move_to_end(key)
+            return entry
+
+    def set(self, namespace, key, value, ttl):
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        now = time.time()
+        max_entries, max_bytes = self.limits(namespace)
+        with self._lock:
+            entries = self._namespace(namespace)
+            if key in entries:
+                self._remove(namespace, key)
+            entries[key] = CacheEntry(value, now, now + ttl, size)
+            self._bytes[namespace] += size
+            while entries and (len(entries) > max_entries or self._bytes[namespace] > max_bytes):
+                self._remove(namespace, next(iter(entries)), 'evictions')
+        return size
+
+    def add(self, namespace, key, value, ttl):
+        with self._lock:
+            if self.get(namespace, key) is not None:
+                return False
+            self.set(namespace, key, value, ttl)
+            return True
+
+    def delete(self, namespace, key):
+        with self._lock:
+            if key in self._namespace(namespace):
+                self._remove(namespace, key)
+
+    def clear(self, namespace=None):
+        with self._lock:
+            for name in list(self._namespaces):
+                if namespace is None or name == namespace:
+                    self._namespaces[name].clear()
+                    self._bytes[name] = 0
+            self._generation += 1
+
+    def purge_expired(self, namespace=None):
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for name, entries in self._namespaces.items():
+                if namespace is not None and name != namespace:
+                    continue
+                for key in [key for key, entry in entries.items() if now >= entry.expires_at]:
+                    self._remove(name, key, 'expirations')
+                    removed += 1
+        return removed
+
+    def generation(self):
+        return self._generation
+
+    def status(self):
+        with self._lock:
+            return {
+                'backend': self.name,
+                'generation': self._generation,
+                'namespaces': {
+                    name: {'entries': len(entries), 'bytes': self._bytes[name], **self._counters[name]}
+                    for name, entries in self._namespaces.items()
+                }
+            }
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """เก็บในไฟล์ SQLite (WAL) ที่ทุก worker บนเครื่องเดียวกันใช้ร่วมกัน
+
+    ทำให้ gunicorn 4 workers ดึงข้อมูลจาก upstream ครั้งเดียวแทน 4 ครั้ง
+    และ clear() จากทุก worker มีผลกับทุก worker
+    """
+
+    name = 'sqlite'
+
+    # อัปเดต accessed_at (สำหรับ LRU) ไม่บ่อยกว่านี้ เพื่อลด write ตอน hit
+    TOUCH_INTERVAL = 5
+
+    def __init__(self, path=CACHE_SQLITE_PATH):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _init_schema(self):
+        connection = self._connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, accessed_at)'
+        )
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS cache_meta (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        connection.execute("INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('generation', 0)")
+
+    def get(self, namespace, key):
+        connection = self._connection()
+        row = connection.execute(
+            'SELECT value, size, created_at, expires_at, accessed_at FROM cache_entries '
+            'WHERE namespace = ? AND key = ?',
+            (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, size, created_at, expires_at, accessed_at = row
+        now = time.time()
+        if now >= expires_at:
+            cursor = connection.execute(
+                'DELETE FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at <= ?',
+                (namespace, key, now)
+            )
+            self._count(connection, namespace, 'expirations', cursor.rowcount)
+            return None
+        if now - accessed_at > self.TOUCH_INTERVAL:
+            connection.execute(
+                'UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?',
+                (now, namespace, key)
+            )
+        return CacheEntry(pickle.loads(value), created_at, expires_at, size)
+
+    def set(self, namespace, key, value, ttl):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        max_entries, max_bytes = self.limits(namespace)
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'INSERT OR REPLACE INTO cache_entries '
+                '(namespace, key, value, size, created_at, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (namespace, key, blob, len(blob), now, now + ttl, now)
+            )
+            self._evict(connection, namespace, max_entries, max_bytes)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return len(blob)
+
+    @staticmethod
+    def _count(connection, namespace, counter, amount):
+        """เพิ่มตัวนับ evictions/expirations ของ namespace (ใช้ร่วมกันทุก worker)"""
+        if amount > 0:
+            connection.execute(
+                'INSERT INTO cache_meta (name, value) VALUES (?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+                (f"{counter}:{namespace}", amount)
+            )
+
+    def _evict(self, connection, namespace, max_entries, max_bytes):
+        cursor = connection.execute(
+            'DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?',
+            (namespace, time.time())
+        )
+        self._count(connection, namespace, 'expirations', cursor.rowcount)
+        count, total_bytes = connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?',
+            (namespace,)
+        ).fetchone()
+        if count <= max_entries and total_bytes <= max_bytes:
+            return
+
+        rows = connection.execute(
+            'SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY accessed_at',
+            (namespace,)
+        ).fetchall()
+        victims = []
+        for key, size in rows:
+            if count <= max_entries and total_bytes <= max_bytes:
+                break
+            victims.append((namespace, key))
+            count -= 1
+            total_bytes -= size
+        connection.executemany('DELETE FROM cache_entries WHERE namespace = ? AND key = ?', victims)
+        self._count(connection, namespace, 'evictions', len(victims))
+
+    def add(self, namespace, key, value, ttl):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'DELETE FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at <= ?',
+                (namespace, key, now)
+            )
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO cache_entries '
+                '(namespace, key, value, size, created_at, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (namespace, key, blob, len(blob), now, now + ttl, now)
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return cursor.rowcount == 1
+
+    def delete(self, namespace, key):
+        self._connection().execute(
+            'DELETE FROM cache_entries WHERE namespace = ? AND key = ?',
+            (namespace, key)
+        )
+
+    def clear(self, namespace=None):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if namespace is None:
+                connection.execute('DELETE FROM cache_entries')
+            else:
+                connection.execute('DELETE FROM cache_entries WHERE namespace = ?', (namespace,))
+            connection.execute("UPDATE cache_meta SET value = value + 1 WHERE name = 'generation'")
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def purge_expired(self, namespace=None):
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if namespace is None:
+                rows = connection.execute(
+                    'SELECT namespace, COUNT(*) FROM cache_entries WHERE expires_at <= ? GROUP BY namespace',
+                    (now,)
+                ).fetchall()
+                connection.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (now,))
+            else:
+                count = connection.execute(
+                    'DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?', (namespace, now)
+                ).rowcount
+                rows = [(namespace, count)]
+            for name, count in rows:
+                self._count(connection, name, 'expirations', count)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return sum(count for _, count in rows)
+
+    def generation(self):
+        row = self._connection().execute(
+            "SELECT value FROM cache_meta WHERE name = 'generation'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def status(self):
+        connection = self._connection()
+        rows = connection.execute(
+            'SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries GROUP BY namespace'
+        ).fetchall()
+        namespaces = {
+            namespace: {'entries': count, 'bytes': total_bytes, 'evictions': 0, 'expirations': 0}
+            for namespace, count, total_bytes in rows
+        }
+        counters = connection.execute(
+            "SELECT name, value FROM cache_meta WHERE name LIKE 'evictions:%' OR name LIKE 'expirations:%'"
+        ).fetchall()
+        for name, value in counters:
+            counter, namespace = name.split(':', 1)
+            usage = namespaces.setdefault(
+                namespace, {'entries': 0, 'bytes': 0, 'evictions': 0, 'expirations': 0}
+            )
+            usage[counter] = value
+        return {
+            'backend': self.name,
+            'path': self.path,
+            'generation': self.generation(),
+            'namespaces': namespaces
+        }
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_cache_backend():
+    """คืน cache backend ตาม CACHE_BACKEND (ใช้ memory ถ้าเปิดไฟล์ SQLite ไม่ได้)"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if CACHE_BACKEND == 'sqlite':
+                try:
+                    _backend = SQLiteCacheBackend()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Could not open SQLite cache at {CACHE_SQLITE_PATH}, using in-process cache: {e}")
+                    _backend = InProcessCacheBackend()
+            else:
+                _backend = InProcessCacheBackend()
+        return _backend
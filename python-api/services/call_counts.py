@@ -0,0 +1,486 @@
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pytz
+
+
+# ตารางจำนวนสายของ call matrix (ทุก worker บนเครื่องเดียวกันใช้ไฟล์เดียวกัน)
+CALL_MATRIX_STORE_PATH = os.getenv('CALL_MATRIX_STORE_PATH', '/tmp/python-api-call-matrix.sqlite3')
+# เขียนช่องที่เปลี่ยนลง sheet ทุกกี่วินาที
+CALL_MATRIX_FLUSH_INTERVAL = int(os.getenv('CALL_MATRIX_FLUSH_INTERVAL', 5))
+# เก็บ call event รายสายกี่วัน ก่อนสรุปเป็นยอดรายวัน (call_event_daily) แล้วลบทิ้ง
+CALL_EVENTS_RETENTION_DAYS = int(os.getenv('CALL_EVENTS_RETENTION_DAYS', 30))
+# ตรวจหา call event ที่ต้องสรุปทุกกี่วินาที
+CALL_EVENTS_COMPACT_INTERVAL = int(os.getenv('CALL_EVENTS_COMPACT_INTERVAL', 3600))
+
+
+def bangkok_today():
+    """วันที่ปัจจุบันของกรุงเทพฯ (YYYY-MM-DD) คือวันที่ตาราง call_counts นับอยู่"""
+    return datetime.now(pytz.timezone('Asia/Bangkok')).strftime('%Y-%m-%d')
+
+
+class CallCountStore:
+    """ตารางจำนวนสายต่อ (agent, ช่วงเวลา) ที่เป็นค่าหลัก โดย Google Sheets เป็นเพียงภาพที่ sync ตามมา
+
+    - record_calls() บวกยอดด้วย UPDATE value = value + ? ใน transaction เดียวกับการเก็บ call event
+      SQLite ให้เขียนได้ทีละ connection (BEGIN IMMEDIATE) การบวกพร้อมกันจากหลาย worker/thread
+      จึงต่อคิวกันเองและไม่มียอดหาย ไม่ต้องอ่านค่าจาก sheet ก่อนเขียน
+    - ช่องที่ยังไม่รู้ค่าใน sheet (seeded = 0) เก็บยอดเป็นส่วนต่าง project() อ่าน sheet
+      ครั้งแรกครั้งเดียวแล้วบวกค่าเดิมเข้าไป หลังจากนั้นไม่ต้องอ่าน sheet อีก
+    - ทุกการเปลี่ยนแปลงเพิ่ม version ของช่อง project() เขียนค่าจริงของช่องที่
+      version != synced_version ลง sheet ใน request เดียว
+    - project ได้ทีละ process (file lock)
+
+    ทุกสายถูกเก็บเป็น call event (agent, ประเภท, ช่วงเวลา, เวลา, วันที่) ใน transaction
+    เดียวกับการบวกยอด ประวัติจึงไม่หายแม้ sheet ถูกแก้ และสร้างตารางของวันใดก็ได้ใหม่
+    จาก event (rebuild) event ที่เก่ากว่า retention ถูกสรุปเป็นยอดรายวันแล้วลบ (compact_events)
+    call_counts คือตารางรายวัน: เก็บยอดของวัน counts_date (วันนี้ของกรุงเทพฯ, today()) เท่านั้น
+    สายของวันอื่น (เช่น backfill) เก็บเป็น event อย่างเดียว การเขียนครั้งแรกของวันใหม่
+    (หรือ project รอบแรกหลังเที่ยงคืน) ตั้งทุกช่องเป็น 0 แล้ว project เขียน 0 ลง sheet (roll over)
+    """
+
+    def __init__(self, path=CALL_MATRIX_STORE_PATH, today=bangkok_today):
+        self.path = path
+        self.today = today
+        self._local = threading.local()
+        self._project_lock = threading.Lock()
+        self.stats = {'events': 0, 'sets': 0, 'projections': 0, 'cells_written': 0, 'dropped': 0,
+                      'projection_errors': 0}
+        self.last_projection = None
+        self.last_error = None
+        self._init_schema()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # fsync ทุก commit (call event ต้องไม่หายเมื่อเครื่องดับ) CallEventWriter รวมหลายสายต่อ commit
+            connection.execute('PRAGMA synchronous=FULL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _init_schema(self):
+        connection = self._connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS call_counts (
+                agent_id TEXT NOT NULL,
+                time_slot TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                seeded INTEGER NOT NULL DEFAULT 0,
+                version INTEGER NOT NULL DEFAULT 1,
+                synced_version INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (agent_id, time_slot)
+            )
+        """)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS call_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                agent_id TEXT NOT NULL,
+                call_type TEXT NOT NULL,
+                time_slot TEXT NOT NULL,
+                called_at REAL NOT NULL,
+                call_date TEXT NOT NULL
+            )
+        """)
+        connection.execute('CREATE INDEX IF NOT EXISTS call_events_date ON call_events (call_date)')
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS call_event_daily (
+                call_date TEXT NOT NULL,
+                agent_id TEXT NOT NULL,
+                time_slot TEXT NOT NULL,
+                call_type TEXT NOT NULL,
+                calls INTEGER NOT NULL,
+                PRIMARY KEY (call_date, agent_id, time_slot, call_type)
+            )
+        """)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS store_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+
+    @staticmethod
+    def _get_meta(connection, key):
+        row = connection.execute('SELECT value FROM store_meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _set_meta(connection, key, value):
+        connection.execute(
+            'INSERT INTO store_meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+            (key, value)
+        )
+
+    def _roll_over(self, connection, today, now):
+        """เริ่มตารางของวันใหม่ (เรียกภายใน transaction ก่อนเขียน call_counts)
+
+        ทุกช่องเป็น 0 และรู้ค่าแล้ว (seeded = 1) ช่องที่เปลี่ยนถูกเขียนลง sheet ในรอบ project ถัดไป
+        ครั้งแรกที่ยังไม่มี counts_date ถือว่าตารางเป็นของวันนี้ (ค่าใน sheet ได้จาก seed)
+
+        Returns:
+            bool: True ถ้าเพิ่งเริ่มวันใหม่
+        """
+        counts_date = self._get_meta(connection, 'counts_date')
+        if counts_date == today:
+            return False
+        if counts_date is not None:
+            connection.execute(
+                'UPDATE call_counts SET value = 0, seeded = 1, version = version + 1, updated_at = ? '
+                'WHERE value != 0 OR seeded = 0',
+                (now,)
+            )
+            # ค่าใน sheet ตอนนี้เป็นของวันก่อน seed วันนี้จึงใช้แค่ว่ามีช่องไหนบ้าง
+            self._set_meta(connection, 'reset_date', today)
+            print(f"📅 Call counts rolled over from {counts_date} to {today}")
+        self._set_meta(connection, 'counts_date', today)
+        return counts_date is not None
+
+    def roll_over(self):
+        """เริ่มตารางของวันใหม่ถ้าข้ามเที่ยงคืนแล้ว (ไม่ต้องรอสายแรกของวัน)
+
+        Returns:
+            bool: True ถ้าเพิ่งเริ่มวันใหม่
+        """
+        connection = self._connection()
+        if self._get_meta(connection, 'counts_date') == self.today():
+            return False
+        return self._transaction(connection, lambda: self._roll_over(connection, self.today(), time.time()))
+
+    @staticmethod
+    def _transaction(connection, work):
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = work()
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return result
+
+    def record_calls(self, events):
+        """บันทึก call event และบวกยอดของช่องที่เกี่ยวข้องใน transaction เดียว
+
+        เฉพาะสายที่ call_date เป็นวันนี้ที่ถูกบวกเข้า call_counts (ยอดรายวัน) สายของวันอื่นเก็บเป็น event
+        อย่างเดียว (ดูยอดได้จาก day_counts / rebuild_day) ถ้าเป็นการเขียนครั้งแรกของวันใหม่
+        ตารางถูก roll over ก่อนบวก
+
+        Args:
+            events: list ของ tuple (agent_id, call_type, time_slot, called_at เป็น epoch, call_date 'YYYY-MM-DD')
+
+        Returns:
+            list: ค่าของช่องหลังบวกสายนั้น (ตามลำดับ events) หรือ None ถ้ายังไม่รู้ค่าใน sheet
+                หรือเป็นสายของวันอื่น
+        """
+        connection = self._connection()
+        now = time.time()
+
+        def work():
+            # วันที่ตัดสินภายใน transaction (หลังได้ write lock) สายที่ commit ข้ามเที่ยงคืนจึงนับถูกวัน
+            today = self.today()
+            self._roll_over(connection, today, now)
+            cells = {}
+            for agent_id, _, time_slot, _, call_date in events:
+                if call_date == today:
+                    cells[(agent_id, time_slot)] = cells.get((agent_id, time_slot), 0) + 1
+
+            connection.executemany(
+                'INSERT INTO call_events (agent_id, call_type, time_slot, called_at, call_date) VALUES (?, ?, ?, ?, ?)',
+                events
+            )
+            totals = {}
+            for (agent_id, time_slot), calls in cells.items():
+                totals[(agent_id, time_slot)] = connection.execute(
+                    'INSERT INTO call_counts (agent_id, time_slot, value, updated_at) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (agent_id, time_slot) DO UPDATE SET value = value + excluded.value, '
+                    'version = version + 1, updated_at = excluded.updated_at '
+                    'RETURNING value, seeded',
+                    (agent_id, time_slot, calls, now)
+                ).fetchone()
+            return today, cells, totals
+
+        today, cells, totals = self._transaction(connection, work)
+        self.stats['events'] += len(events)
+
+        # ไล่ค่าของแต่ละสายในช่องเดียวกันตามลำดับ (ค่าสุดท้าย = ยอดหลัง commit)
+        results = []
+        seen = {}
+        for agent_id, _, time_slot, _, call_date in events:
+            if call_date != today:
+                results.append(None)
+                continue
+            value, seeded = totals[(agent_id, time_slot)]
+            seen[(agent_id, time_slot)] = seen.get((agent_id, time_slot), 0) + 1
+            results.append(value - cells[(agent_id, time_slot)] + seen[(agent_id, time_slot)] if seeded else None)
+        return results
+
+    def day_counts(self, call_date):
+        """ยอดสายของวันหนึ่งจาก call event (รวมยอดที่ถูกสรุปแล้ว)
+
+        Returns:
+            dict: (agent_id, time_slot) -> จำนวนสาย
+        """
+        return self._day_counts(self._connection(), call_date)
+
+    @staticmethod
+    def _day_counts(connection, call_date):
+        rows = connection.execute(
+            'SELECT agent_id, time_slot, SUM(calls) FROM ('
+            '  SELECT agent_id, time_slot, COUNT(*) AS calls FROM call_events WHERE call_date = ? '
+            '  GROUP BY agent_id, time_slot'
+            '  UNION ALL'
+            '  SELECT agent_id, time_slot, calls FROM call_event_daily WHERE call_date = ?'
+            ') GROUP BY agent_id, time_slot',
+            (call_date, call_date)
+        ).fetchall()
+        return {(agent_id, time_slot): calls for agent_id, time_slot, calls in rows}
+
+    def rebuild_day(self, call_date, cells):
+        """สร้างตารางของวัน call_date ใหม่จาก call event
+
+        ถ้า call_date เป็นวันนี้ ยอดรายวันใน call_counts ถูกแทนที่ด้วยยอดจาก event ใน transaction
+        เดียวกับที่อ่าน (BEGIN IMMEDIATE) สายที่เข้ามาระหว่างนั้นต้องรอ write lock จึงไม่ถูกเขียนทับ
+        ค่าที่ตั้งเองผ่าน set_values วันนี้จึงถูกแทนที่ด้วย วันอื่นคืนยอดอย่างเดียว ไม่แตะ call_counts
+
+        Args:
+            call_date: วันที่ 'YYYY-MM-DD'
+            cells: ช่องทั้งหมดของตาราง (agent_id, time_slot) ช่องที่ไม่มีสายได้ 0
+
+        Returns:
+            tuple: (dict (agent_id, time_slot) -> จำนวนสาย, True ถ้าแทนที่ call_counts แล้ว)
+        """
+        connection = self._connection()
+        now = time.time()
+
+        def work():
+            values = dict.fromkeys(cells, 0)
+            values.update(self._day_counts(connection, call_date))
+            today = self.today()
+            live = call_date == today
+            if live:
+                self._roll_over(connection, today, now)
+                connection.executemany(
+                    'INSERT INTO call_counts (agent_id, time_slot, value, seeded, updated_at) VALUES (?, ?, ?, 1, ?) '
+                    'ON CONFLICT (agent_id, time_slot) DO UPDATE SET value = excluded.value, seeded = 1, '
+                    'version = version + 1, updated_at = excluded.updated_at',
+                    [(agent_id, time_slot, value, now) for (agent_id, time_slot), value in values.items()]
+                )
+            return values, live
+
+        values, live = self._transaction(connection, work)
+        if live:
+            self.stats['sets'] += len(values)
+        return values, live
+
+    def compact_events(self, before_date):
+        """สรุป call event ก่อน before_date เป็นยอดรายวันต่อ agent/ช่วงเวลา/ประเภท แล้วลบ event รายสาย
+
+        Returns:
+            int: จำนวน event ที่ถูกสรุป
+        """
+        connection = self._connection()
+
+        def work():
+            connection.execute(
+                'INSERT INTO call_event_daily (call_date, agent_id, time_slot, call_type, calls) '
+                'SELECT call_date, agent_id, time_slot, call_type, COUNT(*) FROM call_events WHERE call_date < ? '
+                'GROUP BY call_date, agent_id, time_slot, call_type '
+                'ON CONFLICT (call_date, agent_id, time_slot, call_type) DO UPDATE SET calls = calls + excluded.calls',
+                (before_date,)
+            )
+            return connection.execute('DELETE FROM call_events WHERE call_date < ?', (before_date,)).rowcount
+
+        compacted = self._transaction(connection, work)
+        if compacted:
+            print(f"🗜️ Compacted {compacted} call events before {before_date}")
+        return compacted
+
+    def set_values(self, values):
+        """ตั้งค่าหลายช่องของวันนี้ (แทนที่ยอดรายวันเดิมทั้งหมด)
+
+        Args:
+            values: dict (agent_id, time_slot) -> value
+
+        Returns:
+            dict: (agent_id, time_slot) -> ค่าเดิม (None ถ้าไม่รู้)
+        """
+        connection = self._connection()
+        now = time.time()
+
+        def work():
+            self._roll_over(connection, self.today(), now)
+            old_values = {}
+            for (agent_id, time_slot), value in values.items():
+                row = connection.execute(
+                    'SELECT value, seeded FROM call_counts WHERE agent_id = ? AND time_slot = ?', (agent_id, time_slot)
+                ).fetchone()
+                old_values[(agent_id, time_slot)] = row[0] if row and row[1] else None
+                connection.execute(
+                    'INSERT INTO call_counts (agent_id, time_slot, value, seeded, updated_at) VALUES (?, ?, ?, 1, ?) '
+                    'ON CONFLICT (agent_id, time_slot) DO UPDATE SET value = excluded.value, seeded = 1, '
+                    'version = version + 1, updated_at = excluded.updated_at',
+                    (agent_id, time_slot, value, now)
+                )
+            return old_values
+
+        old_values = self._transaction(connection, work)
+        self.stats['sets'] += len(values)
+        return old_values
+
+    def get(self, agent_id, time_slot):
+        """ค่าปัจจุบันของช่อง (None ถ้ายังไม่รู้ค่าใน sheet)"""
+        row = self._connection().execute(
+            'SELECT value, seeded FROM call_counts WHERE agent_id = ? AND time_slot = ?', (agent_id, time_slot)
+        ).fetchone()
+        return row[0] if row and row[1] else None
+
+    def needs_seed(self):
+        """มีช่องที่ยังไม่รู้ค่าใน sheet หรือยังไม่เคยอ่าน sheet เลย"""
+        connection = self._connection()
+        if self._get_meta(connection, 'seeded_at') is None:
+            return True
+        return connection.execute('SELECT 1 FROM call_counts WHERE seeded = 0 LIMIT 1').fetchone() is not None
+
+    def seed(self, sheet_values):
+        """รวมค่าที่อ่านจาก sheet เข้าตาราง
+
+        ช่องที่ยังไม่รู้ค่า: ค่า = ค่าใน sheet + ยอดที่บวกไว้ระหว่างรอ
+        ถ้าวันนี้ roll over แล้ว ค่าใน sheet เป็นยอดของวันก่อน จึงใช้ 0 แทน (ช่องใหม่ถูกเขียน 0 ลง sheet)
+        ช่องที่ไม่มีใน sheet ถูกทิ้ง (ไม่มีที่ให้เขียน)
+
+        Args:
+            sheet_values: dict (agent_id, time_slot) -> ค่าใน sheet
+        """
+        connection = self._connection()
+        now = time.time()
+
+        def work():
+            today = self.today()
+            self._roll_over(connection, today, now)
+            stale = self._get_meta(connection, 'reset_date') == today
+            for (agent_id, time_slot), value in sheet_values.items():
+                # ช่องใหม่ตรงกับ sheet แล้ว (version 0) ยกเว้นยอดเก่าของวันก่อนที่ต้องเขียน 0 ทับ
+                version = 0
+                if stale:
+                    version, value = int(value != 0), 0
+                connection.execute(
+                    'INSERT INTO call_counts (agent_id, time_slot, value, seeded, version, synced_version, updated_at) '
+                    'VALUES (?, ?, ?, 1, ?, 0, ?) '
+                    'ON CONFLICT (agent_id, time_slot) DO UPDATE SET value = value + excluded.value, seeded = 1, '
+                    'version = version + 1, updated_at = excluded.updated_at WHERE seeded = 0',
+                    (agent_id, time_slot, value, version, now)
+                )
+            dropped = connection.execute(
+                'DELETE FROM call_counts WHERE seeded = 0 RETURNING agent_id, time_slot, value'
+            ).fetchall()
+            self._set_meta(connection, 'seeded_at', datetime.now().isoformat())
+            return dropped
+
+        for agent_id, time_slot, value in self._transaction(connection, work):
+            print(f"⚠️ Dropping {value} call(s) for {agent_id} {time_slot}: cell not found in the call matrix sheet")
+            self.stats['dropped'] += 1
+
+    def project(self, read, write):
+        """เขียนช่องที่เปลี่ยนลง sheet
+
+        Args:
+            read: ฟังก์ชันที่คืนค่าทุกช่องใน sheet dict (agent_id, time_slot) -> value
+                (เรียกเฉพาะตอนที่ยังมีช่องที่ไม่รู้ค่าใน sheet)
+            write: ฟังก์ชันที่รับ dict (agent_id, time_slot) -> value แล้วเขียนลง sheet
+                คืน dict (agent_id, time_slot) -> error ของช่องที่ไม่มีใน sheet
+
+        Returns:
+            int: จำนวนช่องที่เขียน (None ถ้า process อื่นกำลัง project อยู่)
+        """
+        with self._project_lock:
+            with open(self.path + '.lock', 'w') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None
+                try:
+                    return self._project(read, write)
+                except Exception as e:
+                    self.stats['projection_errors'] += 1
+                    self.last_error = str(e)
+                    raise
+
+    def _project(self, read, write):
+        # หลังเที่ยงคืน sheet ถูกตั้งเป็น 0 แม้ยังไม่มีสายแรกของวัน
+        self.roll_over()
+        if self.needs_seed():
+            self.seed(read())
+
+        connection = self._connection()
+        dirty = connection.execute(
+            'SELECT agent_id, time_slot, value, version FROM call_counts WHERE seeded = 1 AND version != synced_version'
+        ).fetchall()
+        if dirty:
+            rejected = write({(agent_id, time_slot): value for agent_id, time_slot, value, _ in dirty})
+
+            def work():
+                # ช่องที่เปลี่ยนอีกระหว่างเขียน (version ไม่ตรง) จะถูกเขียนในรอบถัดไป
+                connection.executemany(
+                    'UPDATE call_counts SET synced_version = ? WHERE agent_id = ? AND time_slot = ?',
+                    [(version, agent_id, time_slot) for agent_id, time_slot, _, version in dirty]
+                )
+                connection.executemany(
+                    'DELETE FROM call_counts WHERE agent_id = ? AND time_slot = ?', list(rejected)
+                )
+
+            self._transaction(connection, work)
+            if rejected:
+                errors = sorted(set(rejected.values()))
+                print(f"⚠️ Dropping {len(rejected)} call count cell(s) not found in the sheet: {', '.join(errors)}")
+            self.stats['dropped'] += len(rejected)
+            self.stats['cells_written'] += len(dirty) - len(rejected)
+
+        self.stats['projections'] += 1
+        self.last_projection = datetime.now()
+        self.last_error = None
+        return len(dirty) - len(rejected) if dirty else 0
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        connection = self._connection()
+        cells, unsynced, unseeded = connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(version != synced_version), 0), COALESCE(SUM(seeded = 0), 0) '
+            'FROM call_counts'
+        ).fetchone()
+        seeded_at = self._get_meta(connection, 'seeded_at')
+        events, oldest = connection.execute('SELECT COUNT(*), MIN(call_date) FROM call_events').fetchone()
+        return {
+            'path': self.path,
+            'flush_interval': CALL_MATRIX_FLUSH_INTERVAL,
+            'cells': cells,
+            'unsynced_cells': unsynced,
+            'unseeded_cells': unseeded,
+            'counts_date': self._get_meta(connection, 'counts_date'),
+            'seeded_at': seeded_at,
+            'events': events,
+            'oldest_event_date': oldest,
+            'retention_days': CALL_EVENTS_RETENTION_DAYS,
+            'last_projection': self.last_projection.isoformat() if self.last_projection else None,
+            'last_error': self.last_error,
+            'stats': dict(self.stats)
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_call_count_store():
+    """คืน CallCountStore ตัวเดียวของ process"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CallCountStore()
+        return _store
@@ -0,0 +1,145 @@
+import os
+import queue
+import threading
+import time
+
+from services.call_counts import get_call_count_store
+
+
+# รอ call event อื่นมารวม commit เดียวกันนานสุดกี่มิลลิวินาที
+CALL_EVENTS_GROUP_COMMIT_MS = float(os.getenv('CALL_EVENTS_GROUP_COMMIT_MS', 5))
+# จำนวน call event สูงสุดต่อ commit
+CALL_EVENTS_MAX_BATCH = int(os.getenv('CALL_EVENTS_MAX_BATCH', 500))
+
+
+class _PendingEvent:
+    __slots__ = ('event', 'done', 'result', 'error', 'claimed', 'cancelled')
+
+    def __init__(self, event):
+        self.event = event
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # claimed: writer หยิบไป commit แล้ว / cancelled: ผู้เรียกเลิกรอแล้ว (ห้าม commit)
+        self.claimed = False
+        self.cancelled = False
+
+
+class CallEventWriter:
+    """Group commit ของ call event: thread เดียวต่อ process รวมสายที่เข้ามาพร้อมกันเป็น transaction เดียว
+
+    append() รอจนสายของตัวเองถูก commit (fsync) แล้วจึงคืนค่า สายที่เข้ามาภายใน
+    group_commit_ms หลังสายแรกของรอบจะ commit พร้อมกัน จำนวน fsync จึงไม่โตตามจำนวน request
+
+    ถ้ารอเกิน timeout สายที่ยังไม่ถูกหยิบไป commit จะถูกยกเลิก (ไม่ถูกบันทึก) ผู้เรียกจึง retry
+    ได้โดยไม่นับซ้ำ ส่วนสายที่อยู่ใน commit แล้วจะรอจน commit นั้นเสร็จ
+    """
+
+    def __init__(self, store=None, group_commit_ms=CALL_EVENTS_GROUP_COMMIT_MS, max_batch=CALL_EVENTS_MAX_BATCH):
+        self.store = store or get_call_count_store()
+        self.group_commit_ms = group_commit_ms
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._claim_lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self.stats = {'events': 0, 'commits': 0, 'largest_batch': 0, 'errors': 0, 'cancelled': 0}
+
+    def _ensure_thread(self):
+        with self._lock:
+            # หลัง fork thread เดิมไม่มีใน process ใหม่
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name='call-event-writer', daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def append(self, event, timeout=10):
+        """บันทึก call event หนึ่งสาย (รอจน commit)
+
+        Args:
+            event: tuple (agent_id, call_type, time_slot, called_at เป็น epoch, call_date 'YYYY-MM-DD')
+
+        Returns:
+            ค่าของช่องหลังบวกสายนี้ หรือ None ถ้ายังไม่รู้ค่าใน sheet
+
+        Raises:
+            TimeoutError: ถ้า writer ไม่หยิบสายนี้ไป commit ภายใน timeout วินาที (สายนี้ไม่ถูกบันทึก)
+        """
+        pending = _PendingEvent(event)
+        self._ensure_thread().put(pending)
+        if not pending.done.wait(timeout):
+            with self._claim_lock:
+                if not pending.claimed:
+                    pending.cancelled = True
+                    self.stats['cancelled'] += 1
+                    raise TimeoutError(f"Call event was not recorded within {timeout}s (safe to retry)")
+            # อยู่ใน commit ที่กำลังทำอยู่แล้ว รอผลของ commit นั้น
+            pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(self):
+        events = self._queue
+        while True:
+            batch = [events.get()]
+            deadline = time.monotonic() + self.group_commit_ms / 1000
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(events.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        with self._claim_lock:
+            batch = [pending for pending in batch if not pending.cancelled]
+            for pending in batch:
+                pending.claimed = True
+        if not batch:
+            return
+
+        try:
+            results = self.store.record_calls([pending.event for pending in batch])
+        except Exception as e:
+            print(f"❌ Could not record {len(batch)} call event(s): {e}")
+            self.stats['errors'] += 1
+            for pending in batch:
+                pending.error = e
+                pending.done.set()
+            return
+
+        self.stats['events'] += len(batch)
+        self.stats['commits'] += 1
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+        for pending, result in zip(batch, results):
+            pending.result = result
+            pending.done.set()
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        return {
+            'group_commit_ms': self.group_commit_ms,
+            'max_batch': self.max_batch,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'stats': dict(self.stats)
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_call_event_writer():
+    """คืน CallEventWriter ตัวเดียวของ process"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = CallEventWriter()
+        return _writer
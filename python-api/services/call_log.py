@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+
+from services.cache_backend import get_cache_backend
+from services.sheets_client import (
+    column_letter, columns_to_rows, get_sheets_registry, quote_sheet_title, trim_row
+)
+
+
+# ดึงแถวใหม่ของ call log ไม่บ่อยกว่านี้ (วินาที)
+CALL_LOG_SYNC_INTERVAL = int(os.getenv('CALL_LOG_SYNC_INTERVAL', os.getenv('SHEETS_SNAPSHOT_TTL', 30)))
+
+CALL_LOG_SHEET_NAMES = [
+    'สรุป call_AI',
+    'สรุป call_AI_summary',
+    'call_AI_summary'
+]
+
+
+class AppendOnlySheetLog:
+    """แถวของ worksheet ที่โตขึ้นด้านล่างอย่างเดียว เก็บไว้ในหน่วยความจำ
+
+    rows[i] คือแถวที่ i + 2 ใน sheet (แถว 1 คือ header)
+    version เพิ่มทุกครั้งที่ resync ทั้ง sheet ผู้ใช้ที่เก็บ state ต่อจาก rows
+    (เช่น index) ต้องสร้างใหม่เมื่อ version เปลี่ยน
+
+    ถ้ากำหนด columns จะเก็บเฉพาะคอลัมน์เหล่านั้นตามลำดับที่ขอ (header คือชื่อของคอลัมน์ที่พบ)
+    ส่วน sheet_header คือ header เต็มของ sheet
+    """
+
+    def __init__(self, title, columns=None):
+        self.title = title
+        self.columns = columns
+        self.header = []
+        self.sheet_header = []
+        self.rows = []
+        self.version = 0
+        self.synced_at = None
+        self.checked_at = None
+
+    @property
+    def last_row_number(self):
+        """เลขแถวสุดท้ายที่ ingest แล้ว (1 = มีแค่ header)"""
+        return len(self.rows) + 1
+
+    def replace(self, values, sheet_header=None):
+        self.header = values[0] if values else []
+        self.sheet_header = self.header if sheet_header is None else sheet_header
+        width = len(self.header)
+        self.rows = [row + [''] * (width - len(row)) for row in values[1:]]
+        self.version += 1
+        self.synced_at = time.time()
+
+    def append(self, rows):
+        width = len(self.header)
+        self.rows.extend(row + [''] * (width - len(row)) for row in rows)
+        self.synced_at = time.time()
+
+
+class IncrementalCallLogReader:
+    """อ่าน call log แบบ incremental
+
+    ครั้งแรกดาวน์โหลดทั้ง sheet หลังจากนั้นแต่ละรอบเรียก values_batch_get ครั้งเดียว
+    เพื่อดึง header, แถวสุดท้ายที่เคย ingest และแถวใหม่ (last_row + 1 ถึงท้าย sheet)
+    จะดาวน์โหลดทั้ง sheet ใหม่เฉพาะเมื่อ header เปลี่ยน หรือแถวสุดท้ายเดิมถูกแก้/ลบ
+    (เช่นจำนวนแถวลดลง)
+
+    ถ้าระบุ columns จะดึงเฉพาะคอลัมน์เหล่านั้น (ดู SheetsClientRegistry.fetch_columns)
+    log ถูกล้างเมื่อ generation ของ cache backend เปลี่ยน (/api/clear-cache จาก worker ใดก็ได้)
+    """
+
+    def __init__(self, registry=None, sync_interval=CALL_LOG_SYNC_INTERVAL, backend=None):
+        self.registry = registry or get_sheets_registry(readonly=True)
+        self.sync_interval = sync_interval
+        self.backend = backend or get_cache_backend()
+        self._generation = self.backend.generation()
+        self._logs = {}  # (spreadsheet_id, title) -> AppendOnlySheetLog
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'full_syncs': 0, 'incremental_syncs': 0, 'rows_appended': 0}
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _is_fresh(self, log):
+        return log is not None and log.checked_at is not None and \
+            time.monotonic() - log.checked_at < self.sync_interval
+
+    def _check_generation(self):
+        generation = self.backend.generation()
+        if generation != self._generation:
+            self.invalidate()
+            self._generation = generation
+
+    def get_log(self, spreadsheet_id, sheet_names=CALL_LOG_SHEET_NAMES, force=False, columns=None):
+        """คืน AppendOnlySheetLog ที่ sync แล้ว
+
+        Args:
+            spreadsheet_id: ID ของ spreadsheet
+            sheet_names: ชื่อ sheet หรือ list ของชื่อที่เป็นไปได้ (fallback)
+            force: True เพื่อ sync ทันทีโดยไม่สน sync_interval
+            columns: ชื่อคอลัมน์ที่ต้องการ (None = ทุกคอลัมน์) คอลัมน์ที่ไม่มีใน sheet
+                จะไม่อยู่ใน log.header
+
+        Raises:
+            gspread.exceptions.WorksheetNotFound: ถ้าระบุชื่อเดียวแล้วไม่พบ
+            ValueError: ถ้าระบุหลายชื่อแล้วไม่พบเลย
+        """
+        self._check_generation()
+        if isinstance(sheet_names, str):
+            worksheet = self.registry.get_worksheet(spreadsheet_id, sheet_names)
+        else:
+            worksheet = self.registry.get_worksheet_with_fallback(spreadsheet_id, list(sheet_names))
+        columns = tuple(columns) if columns else None
+        key = (spreadsheet_id, worksheet.title, columns)
+
+        log = self._logs.get(key)
+        if not force and self._is_fresh(log):
+            self.stats['hits'] += 1
+            return log
+
+        with self._key_lock(key):
+            log = self._logs.get(key)
+            if not force and self._is_fresh(log):
+                self.stats['hits'] += 1
+                return log
+
+            if log is None:
+                log = AppendOnlySheetLog(worksheet.title, columns)
+                self._full_sync(worksheet, log)
+                self._logs[key] = log
+            else:
+                self._sync(worksheet, log)
+
+            log.checked_at = time.monotonic()
+            return log
+
+    def _full_sync(self, worksheet, log):
+        if log.columns is None:
+            log.replace(worksheet.get_all_values())
+        else:
+            sheet_header, names, values = self._fetch_projection(worksheet, log, first_row=2)
+            log.replace([names] + columns_to_rows(values), sheet_header)
+        self.stats['full_syncs'] += 1
+        print(f"📥 Full sync of '{log.title}' ({len(log.rows)} rows)")
+
+    def _fetch_projection(self, worksheet, log, first_row):
+        """ดึงเฉพาะคอลัมน์ของ log.columns ที่มีอยู่ใน sheet"""
+        sheet_header = self.registry.get_header(worksheet)
+        available = [column for column in log.columns if column in sheet_header]
+        return self.registry.fetch_columns(worksheet, available, first_row)
+
+    def _sync(self, worksheet, log):
+        if not log.header:
+            self._full_sync(worksheet, log)
+            return
+
+        last_row = log.last_row_number
+        if log.columns is None:
+            title = quote_sheet_title(worksheet.title)
+            last_col = column_letter(len(log.header) - 1)
+            ranges = [
+                f"{title}!A1:{last_col}1",
+                f"{title}!A{last_row}:{last_col}{last_row}",
+                f"{title}!A{last_row + 1}:{last_col}"
+            ]
+            value_ranges = worksheet.spreadsheet.values_batch_get(ranges).get('valueRanges', [])
+            header_values, last_values, new_values = [
+                value_range.get('values', []) for value_range in value_ranges
+            ]
+            header = header_values[0] if header_values else []
+            current_last = last_values[0] if last_values else []
+        else:
+            # ดึงแต่ละคอลัมน์ตั้งแต่แถวสุดท้ายที่เคย ingest (header มาใน batch เดียวกัน)
+            header, names, values = self._fetch_projection(worksheet, log, first_row=last_row)
+            if names != log.header:
+                header = None
+            rows = columns_to_rows(values)
+            current_last = rows[0] if rows else []
+            new_values = rows[1:]
+
+        if header is None or trim_row(header) != trim_row(log.sheet_header):
+            print(f"🔄 Header of '{log.title}' changed, resyncing")
+            self._full_sync(worksheet, log)
+            return
+
+        # แถวสุดท้ายที่เคย ingest ต้องยังเหมือนเดิม ไม่งั้นแปลว่ามีการลบ/แก้แถว
+        if log.rows and trim_row(current_last) != trim_row(log.rows[-1]):
+            print(f"🔄 Rows of '{log.title}' were edited or removed, resyncing")
+            self._full_sync(worksheet, log)
+            return
+
+        # API ไม่ส่งแถวว่างท้ายช่วงมา ส่วนแถวว่างระหว่างกลางมาเป็น []
+        if new_values:
+            log.append(new_values)
+            self.stats['rows_appended'] += len(new_values)
+        self.stats['incremental_syncs'] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._logs.clear()
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        return {
+            'sync_interval': self.sync_interval,
+            'stats': dict(self.stats),
+            'logs': {
+                log.title: {
+                    'rows': len(log.rows),
+                    'columns': list(log.header) if log.columns else 'all',
+                    'version': log.version,
+                    'synced_at': log.synced_at
+                }
+                for log in list(self._logs.values())
+            }
+        }
+
+
+_call_log_reader = None
+_call_log_reader_lock = threading.Lock()
+
+
+def get_call_log_reader():
+    """คืน IncrementalCallLogReader ตัวเดียวของ process"""
+    global _call_log_reader
+    with _call_log_reader_lock:
+        if _call_log_reader is None:
+            _call_log_reader = IncrementalCallLogReader()
+        return _call_log_reader
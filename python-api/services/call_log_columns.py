@@ -0,0 +1,256 @@
+import re
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # numpy เป็น optional ถ้าไม่มีจะใช้ pure Python
+    np = None
+
+
+HAS_NUMPY = np is not None
+
+# 'YYYY-MM-DD H:MM:SS' หรือ 'D/M/YYYY, HH:MM:SS' (ใช้แค่วันที่กับชั่วโมง)
+_DATETIME_RE = re.compile(
+    r'\s*(?:(\d{4})-(\d{1,2})-(\d{1,2})\s+|(\d{1,2})/(\d{1,2})/(\d{4})\s*,\s*)(\d{1,2})(?::|\s*$)'
+)
+# 'H:MM:SS' หรือ 'MM:SS'
+_DURATION_RE = re.compile(r'\s*(\d+):(\d+)(?::(\d+))?\s*$')
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def epoch_day_to_date(epoch_day):
+    """จำนวนวันนับจาก 1970-01-01 -> 'YYYY-MM-DD'"""
+    return date.fromordinal(int(epoch_day) + _EPOCH_ORDINAL).isoformat()
+
+
+def date_to_epoch_day(date_str):
+    """'YYYY-MM-DD' -> จำนวนวันนับจาก 1970-01-01"""
+    return date.fromisoformat(date_str).toordinal() - _EPOCH_ORDINAL
+
+
+def parse_datetime_column(values):
+    """Parse คอลัมน์เวลาเริ่มสายทั้งคอลัมน์ในรอบเดียว
+
+    วันที่ในหนึ่ง sheet ซ้ำกันเยอะ จึงแปลงวันที่แต่ละแบบเป็น epoch day ครั้งเดียวแล้ว cache ไว้
+
+    Returns:
+        tuple: (epoch_days, hours) เป็น list ยาวเท่า values (-1 ถ้า parse ไม่ได้)
+    """
+    match = _DATETIME_RE.match
+    day_cache = {}
+    epoch_days = []
+    hours = []
+
+    for value in values:
+        found = match(value)
+        if found is None:
+            epoch_days.append(-1)
+            hours.append(-1)
+            continue
+
+        year, month, day, day2, month2, year2, hour = found.groups()
+        key = (year, month, day) if year else (year2, month2, day2)
+        epoch_day = day_cache.get(key)
+        if epoch_day is None:
+            try:
+                epoch_day = date(int(key[0]), int(key[1]), int(key[2])).toordinal() - _EPOCH_ORDINAL
+            except ValueError:
+                epoch_day = -1
+            day_cache[key] = epoch_day
+
+        epoch_days.append(epoch_day)
+        hours.append(int(hour) if epoch_day >= 0 else -1)
+
+    return epoch_days, hours
+
+
+def parse_duration_column(values):
+    """Parse คอลัมน์ duration (H:MM:SS หรือ MM:SS) เป็นวินาที (0 ถ้า parse ไม่ได้)"""
+    match = _DURATION_RE.match
+    cache = {}
+    seconds = []
+
+    for value in values:
+        parsed = cache.get(value)
+        if parsed is None:
+            found = match(value)
+            if found is None:
+                parsed = 0
+            elif found.group(3) is None:
+                parsed = int(found.group(1)) * 60 + int(found.group(2))
+            else:
+                parsed = int(found.group(1)) * 3600 + int(found.group(2)) * 60 + int(found.group(3))
+            cache[value] = parsed
+        seconds.append(parsed)
+
+    return seconds
+
+
+def encode_column(values, codes):
+    """แปลงค่าในคอลัมน์เป็นรหัสตัวเลขตาม codes (value -> code), -1 ถ้าไม่อยู่ใน codes"""
+    get = codes.get
+    return [get(value.strip(), -1) for value in values]
+
+
+class CallColumns:
+    """คอลัมน์ของ Call Log ที่แปลงเป็น typed array แล้ว (numpy array หรือ list)
+
+    Attributes:
+        epoch_day: วันที่เริ่มสาย (วันนับจาก 1970-01-01, -1 = parse ไม่ได้)
+        hour: ชั่วโมงที่เริ่มสาย (-1 = parse ไม่ได้)
+        seconds: ความยาวสาย (วินาที)
+        agent: index ของผู้โทรใน agents (-1 = ไม่ใช่ agent เป้าหมาย)
+    """
+
+    __slots__ = ('epoch_day', 'hour', 'seconds', 'agent', 'uses_numpy')
+
+    def __init__(self, epoch_day, hour, seconds, agent, uses_numpy):
+        self.epoch_day = epoch_day
+        self.hour = hour
+        self.seconds = seconds
+        self.agent = agent
+        self.uses_numpy = uses_numpy
+
+    def __len__(self):
+        return len(self.epoch_day)
+
+
+def parse_call_columns(rows, columns, agents, use_numpy=None):
+    """แปลงคอลัมน์ start, ผู้โทร, สรุปเวลา ของแถว Call Log เป็น CallColumns
+
+    Args:
+        rows: list ของแถว (แต่ละแถวยาวพอสำหรับทุก column)
+        columns: (start_col, caller_col, duration_col)
+        agents: list ของรหัส agent เป้าหมาย (ลำดับใน list คือรหัสใน CallColumns.agent)
+        use_numpy: None = ใช้ numpy ถ้ามี
+    """
+    if use_numpy is None:
+        use_numpy = HAS_NUMPY
+    start_col, caller_col, duration_col = columns
+
+    epoch_days, hours = parse_datetime_column([row[start_col] for row in rows])
+    seconds = parse_duration_column([row[duration_col] for row in rows])
+    agent_codes = encode_column(
+        [row[caller_col] for row in rows],
+        {agent: code for code, agent in enumerate(agents)}
+    )
+
+    if use_numpy:
+        count = len(rows)
+        return CallColumns(
+            np.fromiter(epoch_days, dtype=np.int32, count=count),
+            np.fromiter(hours, dtype=np.int16, count=count),
+            np.fromiter(seconds, dtype=np.int64, count=count),
+            np.fromiter(agent_codes, dtype=np.int16, count=count),
+            True
+        )
+    return CallColumns(epoch_days, hours, seconds, agent_codes, False)
+
+
+class CallAggregate:
+    """ผลรวมสายจาก CallColumns
+
+    Attributes:
+        counts: total_rows, valid, skipped_no_datetime, skipped_wrong_caller, skipped_duration
+        matched: epoch_day -> จำนวนสายที่ผ่านทุกเงื่อนไข (รวมสายนอกช่วงเวลา)
+        cells: (epoch_day, agent_code, slot_index) -> จำนวนสาย
+    """
+
+    __slots__ = ('counts', 'matched', 'cells')
+
+    def __init__(self, counts, matched, cells):
+        self.counts = counts
+        self.matched = matched
+        self.cells = cells
+
+
+def _slot_lookup(slot_hours):
+    """ตาราง ชั่วโมง (0-23) -> index ของช่วงเวลา (-1 = นอกช่วง)"""
+    lookup = [-1] * 24
+    for index, hour in enumerate(slot_hours):
+        lookup[hour] = index
+    return lookup
+
+
+def aggregate_calls(columns, slot_hours, min_duration):
+    """นับสายต่อ (วัน, agent, ช่วงเวลา) จาก CallColumns
+
+    ลำดับการกรองเหมือนเดิม: parse เวลาไม่ได้ -> ไม่ใช่ agent เป้าหมาย -> สายสั้นกว่า min_duration
+
+    Args:
+        columns: CallColumns จาก parse_call_columns
+        slot_hours: ชั่วโมงเริ่มของแต่ละช่วงเวลา เช่น [9, 10, ..., 19]
+        min_duration: ความยาวสายขั้นต่ำ (วินาที)
+    """
+    if columns.uses_numpy:
+        return _aggregate_numpy(columns, slot_hours, min_duration)
+
+    lookup = _slot_lookup(slot_hours)
+    counts = {
+        'total_rows': len(columns),
+        'valid': 0,
+        'skipped_no_datetime': 0,
+        'skipped_wrong_caller': 0,
+        'skipped_duration': 0
+    }
+    matched = {}
+    cells = {}
+
+    for epoch_day, hour, seconds, agent in zip(columns.epoch_day, columns.hour, columns.seconds, columns.agent):
+        if epoch_day < 0:
+            counts['skipped_no_datetime'] += 1
+            continue
+        if agent < 0:
+            counts['skipped_wrong_caller'] += 1
+            continue
+        if seconds < min_duration:
+            counts['skipped_duration'] += 1
+            continue
+
+        counts['valid'] += 1
+        matched[epoch_day] = matched.get(epoch_day, 0) + 1
+        slot = lookup[hour] if hour < 24 else -1
+        if slot >= 0:
+            key = (epoch_day, agent, slot)
+            cells[key] = cells.get(key, 0) + 1
+
+    return CallAggregate(counts, matched, cells)
+
+
+def _aggregate_numpy(columns, slot_hours, min_duration):
+    epoch_day, hour, seconds, agent = columns.epoch_day, columns.hour, columns.seconds, columns.agent
+
+    has_datetime = epoch_day >= 0
+    has_agent = has_datetime & (agent >= 0)
+    valid = has_agent & (seconds >= min_duration)
+    counts = {
+        'total_rows': len(columns),
+        'valid': int(valid.sum()),
+        'skipped_no_datetime': int((~has_datetime).sum()),
+        'skipped_wrong_caller': int((has_datetime & ~has_agent).sum()),
+        'skipped_duration': int((has_agent & ~valid).sum())
+    }
+
+    days, day_counts = np.unique(epoch_day[valid], return_counts=True)
+    matched = dict(zip(days.tolist(), day_counts.tolist()))
+
+    lookup = np.array(_slot_lookup(slot_hours), dtype=np.int16)
+    slot = np.full(len(columns), -1, dtype=np.int16)
+    in_day = valid & (hour < 24)
+    slot[in_day] = lookup[hour[in_day]]
+    counted = slot >= 0
+
+    # รวม (วัน, agent, ช่วงเวลา) เป็น key เดียวแล้วนับด้วย np.unique
+    slot_count = len(slot_hours)
+    agent_span = int(agent.max()) + 1 if len(agent) else 1
+    keys = (epoch_day[counted].astype(np.int64) * agent_span + agent[counted]) * slot_count + slot[counted]
+    unique_keys, key_counts = np.unique(keys, return_counts=True)
+
+    cells = {}
+    for key, count in zip(unique_keys.tolist(), key_counts.tolist()):
+        day_agent, slot_index = divmod(key, slot_count)
+        day, agent_code = divmod(day_agent, agent_span)
+        cells[(day, agent_code, slot_index)] = count
+
+    return CallAggregate(counts, matched, cells)
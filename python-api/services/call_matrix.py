@@ -1,18 +1,37 @@
-from datetime import datetime
+import json
+import os
+from datetime import datetime, timedelta
 import pytz
 
+from services.call_counts import CALL_EVENTS_RETENTION_DAYS, get_call_count_store
+from services.call_events import CALL_EVENTS_MAX_BATCH, get_call_event_writer
+from services.call_matrix_index import TARGET_AGENTS, TIME_SLOTS
+
+# ประเภทการโทรที่รับบันทึก
+CALL_TYPES = ('outgoing', 'incoming', 'missed')
+# จำนวน error รายบรรทัดสูงสุดที่ตอบกลับจาก /api/call-matrix/log/bulk
+CALL_EVENTS_BULK_MAX_ERRORS = int(os.getenv('CALL_EVENTS_BULK_MAX_ERRORS', 1000))
+
 class CallMatrixService:
-    def __init__(self, sheets_service):
+    def __init__(self, sheets_service, store=None, events=None):
         self.sheets = sheets_service
+        # จำนวนสายเก็บใน store (ค่าหลัก) แล้ว sync ลง sheet เป็นรอบ (flush_pending)
+        self.store = store or get_call_count_store()
+        # ทุกสายถูกเก็บเป็น call event ผ่าน group commit
+        self.events = events or get_call_event_writer()
 
-    def get_current_time_slot(self):
+    def get_current_time_slot(self, now=None):
         """คำนวณช่วงเวลาปัจจุบัน
 
+        Args:
+            now: เวลาที่ใช้คำนวณ (ถ้าไม่ระบุจะใช้เวลาปัจจุบันของกรุงเทพฯ)
+
         Returns:
             str: ช่วงเวลา เช่น '9-10', '10-11'
         """
-        bangkok_tz = pytz.timezone('Asia/Bangkok')
-        now = datetime.now(bangkok_tz)
+        if now is None:
+            bangkok_tz = pytz.timezone('Asia/Bangkok')
+            now = datetime.now(bangkok_tz)
         hour = now.hour
 
         # ถ้าไม่ใช่เวลาทำงาน (9-20) return None
@@ -32,31 +51,309 @@ class CallMatrixService:
         Returns:
             dict: ผลลัพธ์การบันทึก
         """
+        bangkok_tz = pytz.timezone('Asia/Bangkok')
+        event, error = self._build_event(agent_id, call_type, time_slot, datetime.now(bangkok_tz))
+        if error:
+            return error
+
+        # เก็บ call event และบวกยอดใน store แล้วตอบทันที (เขียนลง Google Sheets ในรอบ flush ถัดไป)
+        new_value = self.events.append(event)
+
+        return {
+            "success": True,
+            "agent_id": agent_id,
+            "call_type": call_type,
+            "time_slot": event[2],
+            "old_value": new_value - 1 if new_value is not None else None,
+            "new_value": new_value,
+            "increment": 1
+        }
+
+    def log_call_stream(self, lines, max_errors=CALL_EVENTS_BULK_MAX_ERRORS, chunk_size=CALL_EVENTS_MAX_BATCH):
+        """บันทึกการโทรจำนวนมากจาก NDJSON (1 JSON object ต่อบรรทัด)
+
+        อ่านทีละบรรทัดโดยไม่โหลดทั้ง body และ commit ทุก chunk_size สายที่ถูกต้อง
+        หน่วยความจำจึงไม่โตตามขนาด body บรรทัดที่ผิดถูกข้ามและรายงานพร้อมหมายเลขบรรทัด
+        ถ้า commit ล้มเหลวจะหยุดอ่าน chunk ก่อนหน้าถูกบันทึกแล้ว (ดู committed_through_line)
+
+        แต่ละบรรทัด: {"agent_id": "101", "call_type": "incoming", "time_slot": "9-10", "timestamp": "..."}
+            call_type ไม่ระบุ = outgoing
+            timestamp (ISO 8601 หรือ epoch วินาที, ไม่มี timezone = เวลากรุงเทพฯ) ไม่ระบุ = ตอนนี้
+            time_slot ไม่ระบุ = ช่วงเวลาของ timestamp (ถ้าระบุทั้งคู่ต้องตรงกัน)
+            สายที่ timestamp ไม่ใช่วันนี้ (backfill) ถูกเก็บเป็น event เท่านั้น ไม่บวกเข้าตารางปัจจุบัน
+
+        Args:
+            lines: iterable ของบรรทัด (bytes หรือ str) เช่น request.stream
+            max_errors: จำนวน error สูงสุดที่ใส่ในผลลัพธ์ (นับครบทุกบรรทัดใน rejected)
+            chunk_size: จำนวนสายต่อ commit
+
+        Returns:
+            dict: จำนวนที่รับ/ไม่รับ, จำนวน commit, บรรทัดสุดท้ายที่บันทึกแล้ว และ error รายบรรทัด
+        """
+        bangkok_tz = pytz.timezone('Asia/Bangkok')
+        received_at = datetime.now(bangkok_tz)
+        chunk = []
+        accepted = 0
+        commits = 0
+        committed_through_line = 0
+        errors = []
+        rejected = 0
+        line_number = 0
+
+        def commit():
+            nonlocal accepted, commits, committed_through_line
+            self.store.record_calls(chunk)
+            accepted += len(chunk)
+            commits += 1
+            committed_through_line = line_number
+            chunk.clear()
+
+        try:
+            for line_number, line in enumerate(lines, start=1):
+                if isinstance(line, bytes):
+                    line = line.decode('utf-8', errors='replace')
+                if not line.strip():
+                    continue
+
+                event, error = self._parse_event_line(line, received_at, bangkok_tz)
+                if error:
+                    rejected += 1
+                    if len(errors) < max_errors:
+                        errors.append({"line": line_number, "error": error["error"]})
+                    continue
+                chunk.append(event)
+                if len(chunk) >= chunk_size:
+                    commit()
+
+            if chunk:
+                commit()
+        except Exception as e:
+            print(f"❌ Bulk call log stopped after line {committed_through_line}: {e}")
+            return {
+                "success": False,
+                "error": f"Could not record call events: {e}",
+                "accepted": accepted,
+                "commits": commits,
+                "committed_through_line": committed_through_line,
+                "rejected": rejected,
+                "errors": errors,
+                "errors_truncated": rejected > len(errors)
+            }
+
+        return {
+            "success": bool(accepted) or not rejected,
+            "accepted": accepted,
+            "commits": commits,
+            "committed_through_line": committed_through_line,
+            "rejected": rejected,
+            "errors": errors,
+            "errors_truncated": rejected > len(errors)
+        }
+
+    def _parse_event_line(self, line, received_at, bangkok_tz):
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            return None, {"success": False, "error": f"Invalid JSON: {e}"}
+        if not isinstance(record, dict):
+            return None, {"success": False, "error": "Each line must be a JSON object"}
+        if 'agent_id' not in record:
+            return None, {"success": False, "error": "agent_id is required"}
+
+        now = received_at
+        time_slot = record.get('time_slot')
+        timestamp = record.get('timestamp')
+        if timestamp is not None:
+            try:
+                if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+                    now = datetime.fromtimestamp(timestamp, bangkok_tz)
+                else:
+                    now = datetime.fromisoformat(timestamp)
+                    now = bangkok_tz.localize(now) if now.tzinfo is None else now.astimezone(bangkok_tz)
+            except (TypeError, ValueError, OverflowError, OSError):
+                return None, {"success": False, "error": f"Invalid timestamp: {timestamp!r}"}
+
+            # time_slot ต้องตรงกับชั่วโมงของ timestamp ไม่อย่างนั้นสายจะไปอยู่ผิดช่อง
+            timestamp_slot = self.get_current_time_slot(now)
+            if time_slot is not None and time_slot != timestamp_slot:
+                return None, {
+                    "success": False,
+                    "error": f"time_slot '{time_slot}' does not match timestamp "
+                             f"({timestamp_slot or 'outside working hours'})"
+                }
+
+        return self._build_event(record['agent_id'], record.get('call_type', 'outgoing'), time_slot, now)
+
+    def rebuild_day(self, date=None):
+        """สร้างตารางจำนวนสายของวัน date ใหม่จาก call event
+
+        ถ้า date เป็นวันนี้ ค่าในตารางปัจจุบันทุกช่องถูกแทนที่ด้วยยอดจาก event (ช่องที่ไม่มีสายเป็น 0)
+        แล้วเขียนลง Google Sheets ทันที วันอื่นคืนตารางอย่างเดียว ไม่แตะตารางปัจจุบันและ sheet
+
+        Args:
+            date: วันที่ในรูปแบบ YYYY-MM-DD (ถ้าไม่ระบุจะใช้วันนี้)
+
+        Returns:
+            dict: ตารางที่สร้างใหม่
+        """
+        if date is None:
+            bangkok_tz = pytz.timezone('Asia/Bangkok')
+            date = datetime.now(bangkok_tz).strftime('%Y-%m-%d')
+
+        cells = [(agent_id, time_slot) for agent_id in TARGET_AGENTS for time_slot in TIME_SLOTS]
+        values, live = self.store.rebuild_day(date, cells)
+        cells_written = self.flush_pending() if live else None
+
+        return {
+            "success": True,
+            "date": date,
+            "live": live,
+            "matrix": {
+                agent_id: {time_slot: values[(agent_id, time_slot)] for time_slot in TIME_SLOTS}
+                for agent_id in TARGET_AGENTS
+            },
+            "total_calls": sum(values[cell] for cell in cells),
+            "cells_written": cells_written
+        }
+
+    def compact_call_events(self):
+        """สรุป call event ที่เก่ากว่า CALL_EVENTS_RETENTION_DAYS เป็นยอดรายวัน (job ของ prefetch scheduler)
+
+        Returns:
+            int: จำนวน event ที่ถูกสรุป
+        """
+        bangkok_tz = pytz.timezone('Asia/Bangkok')
+        before = datetime.now(bangkok_tz).date() - timedelta(days=CALL_EVENTS_RETENTION_DAYS)
+        return self.store.compact_events(before.strftime('%Y-%m-%d'))
+
+    def flush_pending(self):
+        """เขียนช่องที่เปลี่ยนใน store ลง Google Sheets (job ของ prefetch scheduler)
+
+        Returns:
+            int: จำนวนช่องที่เขียน
+        """
+        return self.store.project(self.sheets.read_call_counts, self.sheets.write_call_counts)
+
+    def set_call_count(self, agent_id, time_slot, value):
+        """ตั้งค่าจำนวนการโทรโดยตรง (ไม่ใช่การเพิ่ม)
+
+        Args:
+            agent_id: รหัส agent (เช่น '101', '102')
+            time_slot: ช่วงเวลา (เช่น '9-10', '10-11')
+            value: ค่าใหม่ที่ต้องการตั้ง
+
+        Returns:
+            dict: ผลลัพธ์การอัพเดท
+        """
+        error = self._validate_cell(agent_id, time_slot)
+        if error:
+            return error
+
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return {
+                "success": False,
+                "error": "value must be an integer"
+            }
+
+        old_values = self.store.set_values({(agent_id, time_slot): value})
+
+        return {
+            "success": True,
+            "agent_id": agent_id,
+            "time_slot": time_slot,
+            "old_value": old_values[(agent_id, time_slot)],
+            "new_value": value
+        }
+
+    def batch_update_call_counts(self, updates):
+        """อัพเดทหลายช่องพร้อมกัน (ช่องที่ไม่มี agent/ช่วงเวลา หรือค่าไม่ใช่ตัวเลขถูกข้าม)
+
+        Args:
+            updates: list of dict [{"agent_id": "101", "time_slot": "9-10", "value": 5}, ...]
+
+        Returns:
+            dict: ผลลัพธ์การอัพเดท
+        """
+        values = {}
+        for update in updates:
+            agent_id = update.get('agent_id')
+            time_slot = update.get('time_slot')
+            if self._validate_cell(agent_id, time_slot):
+                continue
+            try:
+                values[(agent_id, time_slot)] = int(update.get('value', 0))
+            except (TypeError, ValueError):
+                continue
+
+        if values:
+            self.store.set_values(values)
+
+        return {
+            "success": True,
+            "updated_count": len(values)
+        }
+
+    @staticmethod
+    def _validate_cell(agent_id, time_slot):
+        if time_slot not in TIME_SLOTS:
+            return {
+                "success": False,
+                "error": f"Time slot '{time_slot}' not found"
+            }
+
+        if agent_id not in TARGET_AGENTS:
+            return {
+                "success": False,
+                "error": f"Agent '{agent_id}' not found"
+            }
+
+        return None
+
+    @staticmethod
+    def _validate_call_type(call_type):
+        if call_type not in CALL_TYPES:
+            return {
+                "success": False,
+                "error": f"call_type must be one of: {', '.join(CALL_TYPES)}"
+            }
+
+        return None
+
+    def _build_event(self, agent_id, call_type, time_slot, now):
+        """ตรวจแล้วสร้าง call event ของสายที่โทรเวลา now
+
+        Returns:
+            tuple: (event, None) หรือ (None, error dict)
+        """
         if time_slot is None:
-            time_slot = self.get_current_time_slot()
+            time_slot = self.get_current_time_slot(now)
 
         if time_slot is None:
-            return {
+            return None, {
                 "success": False,
                 "error": "Not in working hours (9:00-20:00)"
             }
 
-        # บันทึกลง Google Sheets
-        result = self.sheets.update_call_count(agent_id, time_slot, increment=1)
+        error = self._validate_cell(agent_id, time_slot) or self._validate_call_type(call_type)
+        if error:
+            return None, error
 
-        return result
+        return (agent_id, call_type, time_slot, now.timestamp(), now.strftime('%Y-%m-%d')), None
 
-    def get_call_matrix(self, date=None, use_latest=True):
+    def get_call_matrix(self, date=None, use_latest=True, end_date=None):
         """ดึงข้อมูล Call Matrix
 
         Args:
             date: วันที่ (YYYY-MM-DD) - ถ้าไม่ระบุจะใช้วันที่ล่าสุด
             use_latest: ใช้วันที่ล่าสุดหรือไม่ (default: True)
+            end_date: วันสุดท้าย (YYYY-MM-DD) สำหรับรวมหลายวัน
 
         Returns:
             dict: ข้อมูล call matrix
         """
-        return self.sheets.read_call_matrix(date, use_latest)
+        return self.sheets.read_call_matrix(date, use_latest, end_date)
 
     def get_agent_summary(self, agent_id, date=None):
         """ดึงสรุปการโทรของ agent คนหนึ่ง
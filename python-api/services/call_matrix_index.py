@@ -0,0 +1,202 @@
+import threading
+from datetime import datetime, timedelta
+
+from services.cache_backend import get_cache_backend
+from services.call_log_columns import aggregate_calls, epoch_day_to_date, parse_call_columns
+
+
+# ช่วงเวลา 9:00-20:00
+TIME_SLOTS = ['9-10', '10-11', '11-12', '12-13', '13-14', '14-15',
+              '15-16', '16-17', '17-18', '18-19', '19-20']
+
+# เป้าหมาย: Agent 101-108
+TARGET_AGENTS = ['101', '102', '103', '104', '105', '106', '107', '108']
+
+# นับเฉพาะสายที่คุยอย่างน้อย 30 วินาที
+MIN_DURATION_SECONDS = 30
+
+REQUIRED_COLUMNS = ['start', 'ผู้โทร', 'สรุปเวลา']
+
+# ชั่วโมงเริ่มของแต่ละช่วงเวลา
+SLOT_HOURS = [int(slot.split('-')[0]) for slot in TIME_SLOTS]
+
+
+class DayBucket:
+    """ยอดสายของวันหนึ่ง: agent -> slot -> count พร้อมยอดรวมแต่ละแถว/คอลัมน์"""
+
+    __slots__ = ('matrix', 'totals_by_agent', 'totals_by_slot', 'matched', 'counted')
+
+    def __init__(self):
+        self.matrix = {agent: {slot: 0 for slot in TIME_SLOTS} for agent in TARGET_AGENTS}
+        self.totals_by_agent = {agent: 0 for agent in TARGET_AGENTS}
+        self.totals_by_slot = {slot: 0 for slot in TIME_SLOTS}
+        self.matched = 0  # ผ่านทุกเงื่อนไข (รวมสายนอกช่วง 9-20)
+        self.counted = 0  # อยู่ในช่วงเวลา 9-20
+
+
+class CallMatrixIndex:
+    """Index ของ Call Log: วันที่ -> agent -> ช่วงเวลา -> จำนวนสาย
+
+    สร้างครั้งเดียวต่อ version ของ AppendOnlySheetLog แล้วเพิ่มเฉพาะแถวใหม่
+    ทำให้ /api/call-matrix, /agent, /time-slot และ /run-time เป็นแค่การ lookup dict
+    และรวมหลายวันได้โดยไม่ต้อง scan แถวใหม่
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.log_version = None
+        self._clear()
+
+    def _clear(self):
+        self.days = {}  # 'YYYY-MM-DD' -> DayBucket
+        self.consumed = 0
+        self.missing_columns = []
+        self.available_columns = []
+        self.counts = {
+            'total_rows': 0,
+            'valid': 0,
+            'skipped_no_datetime': 0,
+            'skipped_wrong_caller': 0,
+            'skipped_duration': 0
+        }
+        self._columns = None
+
+    def _reset(self, log):
+        self._clear()
+        self.log_version = log.version
+        self.available_columns = list(log.sheet_header)
+        self.missing_columns = [name for name in REQUIRED_COLUMNS if name not in log.header]
+        if not self.missing_columns:
+            self._columns = tuple(log.header.index(name) for name in REQUIRED_COLUMNS)
+
+    def sync(self, log):
+        """อัปเดต index ให้ตรงกับ log (rebuild เมื่อ log ถูก resync ทั้ง sheet)"""
+        with self._lock:
+            if self.log_version != log.version:
+                self._reset(log)
+            if self._columns is None:
+                return self
+
+            rows = log.rows
+            if self.consumed < len(rows):
+                self._ingest(rows[self.consumed:])
+                self.consumed = len(rows)
+        return self
+
+    def _ingest(self, rows):
+        # parse ทั้ง batch เป็นคอลัมน์แล้วรวมยอด ก่อน merge เข้า bucket รายวัน
+        columns = parse_call_columns(rows, self._columns, TARGET_AGENTS)
+        batch = aggregate_calls(columns, SLOT_HOURS, MIN_DURATION_SECONDS)
+
+        for name, count in batch.counts.items():
+            self.counts[name] += count
+
+        buckets = {}
+        for epoch_day, matched in batch.matched.items():
+            date = epoch_day_to_date(epoch_day)
+            bucket = self.days.get(date)
+            if bucket is None:
+                bucket = self.days[date] = DayBucket()
+            bucket.matched += matched
+            buckets[epoch_day] = bucket
+
+        for (epoch_day, agent_code, slot_index), count in batch.cells.items():
+            bucket = buckets[epoch_day]
+            agent = TARGET_AGENTS[agent_code]
+            slot = TIME_SLOTS[slot_index]
+            bucket.matrix[agent][slot] += count
+            bucket.totals_by_agent[agent] += count
+            bucket.totals_by_slot[slot] += count
+            bucket.counted += count
+
+    def day(self, date):
+        """คืน DayBucket ของวัน (bucket ว่างถ้าไม่มีสาย)"""
+        return self.days.get(date) or DayBucket()
+
+    def range(self, start_date, end_date):
+        """รวม DayBucket ตั้งแต่ start_date ถึง end_date (YYYY-MM-DD, รวมทั้งสองวัน)"""
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        combined = DayBucket()
+
+        current = start
+        while current <= end:
+            bucket = self.days.get(current.strftime('%Y-%m-%d'))
+            current += timedelta(days=1)
+            if bucket is None:
+                continue
+            for agent, slots in bucket.matrix.items():
+                for slot, count in slots.items():
+                    combined.matrix[agent][slot] += count
+            for agent, count in bucket.totals_by_agent.items():
+                combined.totals_by_agent[agent] += count
+            for slot, count in bucket.totals_by_slot.items():
+                combined.totals_by_slot[slot] += count
+            combined.matched += bucket.matched
+            combined.counted += bucket.counted
+
+        return combined
+
+    def latest_date(self):
+        """วันที่ล่าสุดที่มีสาย (None ถ้ายังไม่มี)"""
+        return max(self.days) if self.days else None
+
+
+class CallMatrixIndexer:
+    """เก็บ CallMatrixIndex แยกตาม worksheet
+
+    index ถูกล้างเมื่อ generation ของ cache backend เปลี่ยน (/api/clear-cache จาก worker ใดก็ได้)
+    """
+
+    def __init__(self, backend=None):
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self.backend = backend or get_cache_backend()
+        self._generation = self.backend.generation()
+
+    def _check_generation(self):
+        generation = self.backend.generation()
+        if generation != self._generation:
+            self.invalidate()
+            self._generation = generation
+
+    def get_index(self, log):
+        """คืน CallMatrixIndex ของ log ที่อัปเดตแล้ว"""
+        self._check_generation()
+        with self._lock:
+            index = self._indexes.get(log.title)
+            if index is None:
+                index = self._indexes[log.title] = CallMatrixIndex()
+        return index.sync(log)
+
+    def invalidate(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        with self._lock:
+            indexes = dict(self._indexes)
+        return {
+            title: {
+                'days': len(index.days),
+                'rows_indexed': index.consumed,
+                'log_version': index.log_version,
+                'latest_date': index.latest_date(),
+                'counts': dict(index.counts)
+            }
+            for title, index in indexes.items()
+        }
+
+
+_indexer = None
+_indexer_lock = threading.Lock()
+
+
+def get_call_matrix_indexer():
+    """คืน CallMatrixIndexer ตัวเดียวของ process"""
+    global _indexer
+    with _indexer_lock:
+        if _indexer is None:
+            _indexer = CallMatrixIndexer()
+        return _indexer
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+
+from gspread.utils import rowcol_to_a1
+
+from services.call_matrix_index import TARGET_AGENTS, TIME_SLOTS
+from services.sheets_client import quote_sheet_title
+
+
+# อายุของตำแหน่งแถว/คอลัมน์ที่ cache ไว้ ก่อนอ่าน header และคอลัมน์ A ใหม่ (วินาที)
+CALL_MATRIX_LAYOUT_TTL = int(os.getenv('CALL_MATRIX_LAYOUT_TTL', 60))
+
+
+class CallMatrixLayout:
+    """ตำแหน่งของตาราง call matrix ใน worksheet: agent_id -> แถว, time_slot -> คอลัมน์
+
+    ใช้ตำแหน่งแรกที่พบ เหมือน headers.index() / การ scan หาแถวแรกของ agent
+    """
+
+    __slots__ = ('title', 'slot_columns', 'agent_rows', 'built_at')
+
+    def __init__(self, title, header, first_column):
+        self.title = title
+        self.slot_columns = {}  # time_slot -> คอลัมน์ (เริ่ม 1)
+        for col_index, name in enumerate(header, start=1):
+            if name in TIME_SLOTS:
+                self.slot_columns.setdefault(name, col_index)
+        self.agent_rows = {}  # agent_id -> แถว (เริ่ม 1)
+        for row_index, name in enumerate(first_column[1:], start=2):
+            if name in TARGET_AGENTS:
+                self.agent_rows.setdefault(name, row_index)
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_values(cls, title, all_values):
+        """สร้างจากค่าทั้ง sheet (get_all_values) ที่อ่านมาแล้ว"""
+        header = all_values[0] if all_values else []
+        return cls(title, header, [row[0] if row else '' for row in all_values])
+
+    def locate(self, agent_id, time_slot):
+        """A1 range ของช่อง (รวมชื่อ sheet)
+
+        Raises:
+            KeyError: ถ้าไม่มี time_slot หรือ agent_id ใน sheet (ข้อความเป็น error ที่ตอบ client)
+        """
+        if time_slot not in self.slot_columns:
+            raise KeyError(f"Time slot '{time_slot}' not found")
+        if agent_id not in self.agent_rows:
+            raise KeyError(f"Agent '{agent_id}' not found")
+        return quote_sheet_title(self.title) + '!' + rowcol_to_a1(
+            self.agent_rows[agent_id], self.slot_columns[time_slot]
+        )
+
+    def same_as(self, other):
+        return (other is not None and self.slot_columns == other.slot_columns
+                and self.agent_rows == other.agent_rows)
+
+
+class CallMatrixLayoutCache:
+    """Cache ของ CallMatrixLayout ต่อ worksheet ให้การเขียนทุกแบบหา A1 ได้โดยไม่ต้องอ่านข้อมูลทั้ง sheet
+
+    - สร้างจาก values_batch_get ครั้งเดียว (แถว 1 + คอลัมน์ A)
+    - หมดอายุทุก ttl วินาที (จับการแทรก/ลบแถวหรือคอลัมน์ที่ทำใน Sheets โดยตรง)
+    - ทุกครั้งที่อ่านทั้ง sheet อยู่แล้ว (remember) ตำแหน่งถูกสร้างใหม่จากค่านั้นฟรี
+    - ผู้เรียกต้อง invalidate() เมื่อการเขียนล้มเหลว แล้วค่อยสร้างใหม่
+    """
+
+    def __init__(self, ttl=CALL_MATRIX_LAYOUT_TTL):
+        self.ttl = ttl
+        self._layouts = {}  # (spreadsheet_id, worksheet id) -> CallMatrixLayout
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'builds': 0, 'remembered': 0, 'changes': 0, 'invalidations': 0}
+
+    @staticmethod
+    def _key(worksheet):
+        return worksheet.spreadsheet.id, worksheet.id
+
+    def get_layout(self, worksheet, force=False):
+        """คืน CallMatrixLayout ของ worksheet (อ่าน header + คอลัมน์ A ถ้าไม่มีหรือหมดอายุ)"""
+        key = self._key(worksheet)
+        with self._lock:
+            layout = self._layouts.get(key)
+            if (not force and layout is not None and layout.title == worksheet.title
+                    and time.monotonic() - layout.built_at < self.ttl):
+                self.stats['hits'] += 1
+                return layout
+
+        title = quote_sheet_title(worksheet.title)
+        value_ranges = worksheet.spreadsheet.values_batch_get(
+            [f"{title}!1:1", f"{title}!A:A"], params={'majorDimension': 'COLUMNS'}
+        ).get('valueRanges', [])
+        header = [cell[0] if cell else '' for cell in value_ranges[0].get('values', [])]
+        first_column = (value_ranges[1].get('values') or [[]])[0]
+
+        self.stats['builds'] += 1
+        return self._store(key, CallMatrixLayout(worksheet.title, header, first_column))
+
+    def remember(self, worksheet, all_values):
+        """สร้างตำแหน่งใหม่จากค่าทั้ง sheet ที่เพิ่งอ่านมา"""
+        self.stats['remembered'] += 1
+        return self._store(self._key(worksheet), CallMatrixLayout.from_values(worksheet.title, all_values))
+
+    def _store(self, key, layout):
+        with self._lock:
+            previous = self._layouts.get(key)
+            if previous is not None and not layout.same_as(previous):
+                self.stats['changes'] += 1
+                print(f"🔄 Call matrix layout of '{layout.title}' changed")
+            self._layouts[key] = layout
+        return layout
+
+    def invalidate(self, worksheet=None):
+        """ลบตำแหน่งที่ cache ไว้ (ทั้งหมด หรือเฉพาะ worksheet เดียว)"""
+        with self._lock:
+            self.stats['invalidations'] += 1
+            if worksheet is None:
+                self._layouts.clear()
+            else:
+                self._layouts.pop(self._key(worksheet), None)
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        with self._lock:
+            layouts = list(self._layouts.values())
+        return {
+            'ttl': self.ttl,
+            'worksheets': {
+                layout.title: {
+                    'agents': len(layout.agent_rows),
+                    'time_slots': len(layout.slot_columns),
+                    'age_seconds': round(time.monotonic() - layout.built_at, 1)
+                }
+                for layout in layouts
+            },
+            'stats': dict(self.stats)
+        }
+
+
+_layouts = None
+_layouts_lock = threading.Lock()
+
+
+def get_call_matrix_layouts():
+    """คืน CallMatrixLayoutCache ตัวเดียวของ process"""
+    global _layouts
+    with _layouts_lock:
+        if _layouts is None:
+            _layouts = CallMatrixLayoutCache()
+        return _layouts
@@ -0,0 +1,603 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from facebook_business.api import FacebookAdsApi
+from facebook_business.adobjects.adaccount import AdAccount
+from facebook_business.adobjects.adreportrun import AdReportRun
+
+from services.cache_backend import get_cache_backend
+
+
+FB_ADS_CACHE_DURATION = int(os.getenv('FB_ADS_CACHE_DURATION', 300))  # 5 นาที (300 วินาที)
+# ขนาดงานโดยประมาณ (จำนวนช่วงเวลา x น้ำหนักของ level) ที่เริ่มใช้ async report run
+FB_ASYNC_THRESHOLD = int(os.getenv('FB_ASYNC_THRESHOLD', 30))
+# รอ async report run นานสุดกี่วินาทีต่อ request (ต้องน้อยกว่า timeout ของ gunicorn)
+FB_ASYNC_TIMEOUT = int(os.getenv('FB_ASYNC_TIMEOUT', 90))
+FB_ASYNC_POLL_MAX_INTERVAL = float(os.getenv('FB_ASYNC_POLL_MAX_INTERVAL', 8))
+# อายุของข้อมูลรายวัน: วันนี้/เมื่อวาน Facebook ยังแก้ตัวเลขย้อนหลังได้ วันที่ปิดแล้วเก็บยาว
+FB_DAY_RECENT_TTL = int(os.getenv('FB_DAY_RECENT_TTL', FB_ADS_CACHE_DURATION))
+FB_DAY_CLOSED_TTL = int(os.getenv('FB_DAY_CLOSED_TTL', 365 * 24 * 3600))
+# timezone ของ ad account (Facebook ตัดวันของ insights ตาม timezone นี้)
+FB_ACCOUNT_TIMEZONE = os.getenv('FB_ACCOUNT_TIMEZONE', 'Asia/Bangkok')
+# ขนาดสูงสุดของ cache (เกินแล้วตัดแบบ LRU) เพื่อไม่ให้โตตาม uptime
+FB_ADS_CACHE_MAX_ENTRIES = int(os.getenv('FB_ADS_CACHE_MAX_ENTRIES', 200))
+FB_ADS_CACHE_MAX_BYTES = int(os.getenv('FB_ADS_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+FB_DAY_STORE_MAX_ENTRIES = int(os.getenv('FB_DAY_STORE_MAX_ENTRIES', 2000))
+FB_DAY_STORE_MAX_BYTES = int(os.getenv('FB_DAY_STORE_MAX_BYTES', 64 * 1024 * 1024))
+FB_REPORT_RUNS_MAX_ENTRIES = 100
+
+# field ที่ใช้ระบุ entity ของแต่ละ level (ใช้รวมรายวันเป็นช่วง)
+ENTITY_FIELDS = {'campaign': 'campaign_id', 'adset': 'adset_id', 'ad': 'ad_id'}
+
+# น้ำหนักโดยประมาณของจำนวนแถวต่อช่วงเวลาในแต่ละ level
+LEVEL_WEIGHTS = {'account': 1, 'campaign': 1, 'adset': 5, 'ad': 20}
+
+# Fields ที่ต้องใช้เสมอ - เฉพาะที่จำเป็น (ลดภาระ API)
+BASE_FIELDS = [
+    'campaign_id',
+    'campaign_name',
+    'spend',
+    'impressions',
+    'clicks',
+    'ctr',
+    'cpc',
+    'cpm',
+    'reach',
+    'actions',
+    'cost_per_action_type',
+    'date_start',
+    'date_stop'
+]
+
+
+class InsightsQuery:
+    """พารามิเตอร์ของ insights request หนึ่งชุด"""
+
+    __slots__ = ('level', 'since', 'until', 'time_increment', 'action_breakdowns', 'custom_fields', 'limit')
+
+    def __init__(self, level, since, until, time_increment=None, action_breakdowns=None,
+                 custom_fields=None, limit=1000):
+        self.level = level
+        self.since = since
+        self.until = until
+        self.time_increment = time_increment
+        self.action_breakdowns = action_breakdowns
+        self.custom_fields = custom_fields
+        self.limit = limit
+
+    @property
+    def cache_key(self):
+        return (f"{self.level}_{self.since}_{self.until}_{self.time_increment}_"
+                f"{self.action_breakdowns}_{self.custom_fields}_{self.limit}")
+
+    @property
+    def fields(self):
+        fields = list(BASE_FIELDS)
+
+        # เพิ่ม fields ตาม level
+        if self.level in ['adset', 'ad']:
+            fields.extend(['adset_id', 'adset_name'])
+        if self.level == 'ad':
+            fields.extend(['ad_id', 'ad_name'])
+
+        if self.custom_fields:
+            for field in self.custom_fields.split(','):
+                field = field.strip()
+                if field and field not in fields:
+                    fields.append(field)
+        return fields
+
+    @property
+    def params(self):
+        params = {
+            'level': self.level,
+            'time_range': {'since': self.since, 'until': self.until},
+            'limit': self.limit
+        }
+        if self.time_increment:
+            params['time_increment'] = self.time_increment
+        if self.action_breakdowns:
+            params['action_breakdowns'] = [x.strip() for x in self.action_breakdowns.split(',')]
+        return params
+
+    def estimated_size(self):
+        """ขนาดงานโดยประมาณ: จำนวนช่วงเวลาในผลลัพธ์ x น้ำหนักของ level"""
+        days = (datetime.strptime(self.until, '%Y-%m-%d') - datetime.strptime(self.since, '%Y-%m-%d')).days + 1
+        if str(self.time_increment).isdigit():
+            buckets = -(-days // int(self.time_increment))
+        elif self.time_increment == 'monthly':
+            buckets = -(-days // 30)
+        else:
+            buckets = 1
+        return max(buckets, 1) * LEVEL_WEIGHTS.get(self.level, 1)
+
+
+class InsightsAggregator:
+    """รวมยอด insights ทีละแถวระหว่างที่ page ทยอยมาถึง"""
+
+    def __init__(self):
+        self.data = []
+        self.total_spend = 0
+        self.total_impressions = 0
+        self.total_reach = 0
+        self.total_clicks = 0
+        self.total_conversions = 0
+        self.total_leads = 0
+        self.total_purchase = 0
+
+    def add(self, insight):
+        insight_dict = dict(insight)
+
+        # Process actions for easier access
+        processed_actions = {}
+        for action in insight_dict.get('actions') or []:
+            action_type = action.get('action_type', '')
+            action_value = int(action.get('value', 0))
+            processed_actions[action_type] = action_value
+
+            # Count specific action types
+            if action_type == 'lead':
+                self.total_leads += action_value
+            elif action_type == 'purchase':
+                self.total_purchase += action_value
+
+        insight_dict['processed_actions'] = processed_actions
+
+        # Extract key metrics
+        spend = float(insight_dict.get('spend', 0))
+        impressions = int(insight_dict.get('impressions', 0))
+        reach = int(insight_dict.get('reach', 0))
+        clicks = int(insight_dict.get('clicks', 0))
+
+        # Get conversions (from actions)
+        conversions = processed_actions.get('lead', 0) + processed_actions.get('purchase', 0)
+        insight_dict['total_conversions'] = conversions
+        insight_dict['cost_per_result'] = round(spend / conversions, 2) if conversions > 0 else 0
+
+        self.data.append(insight_dict)
+
+        self.total_spend += spend
+        self.total_impressions += impressions
+        self.total_reach += reach
+        self.total_clicks += clicks
+        self.total_conversions += conversions
+
+    def summary(self):
+        return {
+            'total_spend': round(self.total_spend, 2),
+            'total_impressions': self.total_impressions,
+            'total_reach': self.total_reach,
+            'total_clicks': self.total_clicks,
+            'total_conversions': round(self.total_conversions, 2),
+            'total_leads': self.total_leads,
+            'total_purchase': self.total_purchase,
+            'average_cpc': round(self.total_spend / self.total_clicks, 2) if self.total_clicks > 0 else 0,
+            'average_ctr': round((self.total_clicks / self.total_impressions) * 100, 2) if self.total_impressions > 0 else 0,
+            'cost_per_result': round(self.total_spend / self.total_conversions, 2) if self.total_conversions > 0 else 0,
+            'frequency': round(self.total_impressions / self.total_reach, 2) if self.total_reach > 0 else 0
+        }
+
+
+def _date_range(since, until):
+    """list ของวันที่ (YYYY-MM-DD) ตั้งแต่ since ถึง until"""
+    start = datetime.strptime(since, '%Y-%m-%d')
+    end = datetime.strptime(until, '%Y-%m-%d')
+    return [(start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range((end - start).days + 1)]
+
+
+def _contiguous_runs(days):
+    """แบ่งวันที่ที่เรียงแล้วเป็นช่วงต่อเนื่อง [(since, until), ...]"""
+    runs = []
+    previous = None
+    for day in days:
+        current = datetime.strptime(day, '%Y-%m-%d')
+        if previous is not None and current - previous == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+        previous = current
+    return [tuple(run) for run in runs]
+
+
+def rollup_daily_rows(level, rows, since, until, reach=None):
+    """รวมแถวรายวันเป็นหนึ่งแถวต่อ entity สำหรับช่วง since-until
+
+    spend, impressions, clicks และ actions รวมกันได้ตรง ส่วน ctr, cpc, cpm และ
+    cost_per_action_type คำนวณใหม่จากยอดรวม
+
+    reach รวมข้ามวันไม่ได้ (คนเดิมที่เห็นโฆษณาหลายวันจะถูกนับซ้ำ) ช่วงหลายวันจึงต้องส่ง
+    reach ของทั้งช่วงที่ดึงจาก Facebook มาด้วย
+
+    Args:
+        reach: dict entity id -> reach ของทั้งช่วง (None = ใช้ reach ของแถว ตรงเฉพาะช่วงวันเดียว)
+    """
+    entity_field = ENTITY_FIELDS.get(level)
+    groups = {}
+    for row in rows:
+        group_key = row.get(entity_field) if entity_field else level
+        group = groups.get(group_key)
+        if group is None:
+            group = groups[group_key] = {
+                'row': {name: value for name, value in row.items() if name in
+                        ('campaign_id', 'campaign_name', 'adset_id', 'adset_name', 'ad_id', 'ad_name')},
+                'spend': 0.0, 'impressions': 0, 'clicks': 0, 'reach': 0, 'actions': {}
+            }
+        group['spend'] += float(row.get('spend', 0))
+        group['impressions'] += int(row.get('impressions', 0))
+        group['clicks'] += int(row.get('clicks', 0))
+        group['reach'] += int(row.get('reach', 0))
+        for action in row.get('actions') or []:
+            action_type = action.get('action_type', '')
+            group['actions'][action_type] = group['actions'].get(action_type, 0) + int(action.get('value', 0))
+
+    result = []
+    for key, group in groups.items():
+        spend, impressions, clicks = group['spend'], group['impressions'], group['clicks']
+        row = dict(group['row'])
+        row.update({
+            'spend': f"{spend:.2f}",
+            'impressions': str(impressions),
+            'clicks': str(clicks),
+            'reach': str(group['reach'] if reach is None else reach.get(key, 0)),
+            'ctr': f"{clicks / impressions * 100:.6f}" if impressions else '0',
+            'cpc': f"{spend / clicks:.6f}" if clicks else '0',
+            'cpm': f"{spend / impressions * 1000:.6f}" if impressions else '0',
+            'date_start': since,
+            'date_stop': until
+        })
+        if group['actions']:
+            row['actions'] = [
+                {'action_type': action_type, 'value': str(value)}
+                for action_type, value in group['actions'].items()
+            ]
+            row['cost_per_action_type'] = [
+                {'action_type': action_type, 'value': f"{spend / value:.6f}"}
+                for action_type, value in group['actions'].items() if value
+            ]
+        result.append(row)
+    return result
+
+
+class InsightsDayStore:
+    """เก็บแถว insights รายวันแยกตาม (level, วันที่) ใน cache backend
+
+    แต่ละ entry คือทุก entity ของ level นั้นในวันนั้น (ผลจาก time_increment=1)
+    วันที่ไม่มีข้อมูลก็ถูกเก็บเป็น list ว่าง เพื่อไม่ต้องดึงซ้ำ
+    """
+
+    namespace = 'facebook_insight_days'
+
+    def __init__(self, backend, recent_ttl=FB_DAY_RECENT_TTL, closed_ttl=FB_DAY_CLOSED_TTL,
+                 max_entries=FB_DAY_STORE_MAX_ENTRIES, max_bytes=FB_DAY_STORE_MAX_BYTES):
+        self.backend = backend
+        self.backend.set_limits(self.namespace, max_entries, max_bytes)
+        self.recent_ttl = recent_ttl
+        self.closed_ttl = closed_ttl
+
+    @staticmethod
+    def is_recent(day):
+        """วันนี้และเมื่อวานตาม timezone ของ ad account (Facebook ยังปรับตัวเลขของวันเหล่านี้อยู่)"""
+        today = datetime.now(pytz.timezone(FB_ACCOUNT_TIMEZONE))
+        return day >= (today - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    def get(self, level, day):
+        entry = self.backend.get(self.namespace, f"{level}|{day}")
+        return entry.value if entry is not None else None
+
+    def put(self, level, day, rows):
+        ttl = self.recent_ttl if self.is_recent(day) else self.closed_ttl
+        self.backend.set(self.namespace, f"{level}|{day}", rows, ttl)
+
+
+class ReportRunTimeout(Exception):
+    """async report run ยังไม่เสร็จภายในเวลาที่กำหนด (run ยังทำงานต่อที่ Facebook)"""
+
+    def __init__(self, report_run_id, percent):
+        super().__init__(
+            f"Facebook report run {report_run_id} is still running ({percent}% complete). "
+            f"Retry shortly; the same run will be resumed."
+        )
+        self.report_run_id = report_run_id
+        self.percent = percent
+
+
+class FacebookInsightsService:
+    """ดึง Facebook Ads insights แล้ว cache ผลลัพธ์ตาม request
+
+    - request เล็กใช้ get_insights แบบ synchronous เหมือนเดิม
+    - request ใหญ่ (ดู FB_ASYNC_THRESHOLD) ใช้ async report run (is_async=True)
+      แล้ว poll สถานะแบบ backoff ถ้าเกิน FB_ASYNC_TIMEOUT จะจำ report run id ไว้
+      ใน cache backend ให้ request ถัดไปรอ run เดิมต่อแทนการสั่งใหม่
+    - ผลลัพธ์ทั้งสองแบบอ่านเป็น cursor ทีละ page และรวมยอดทันทีที่แต่ละ page มาถึง
+    - request ที่ไม่มี custom fields / action_breakdowns ประกอบจากข้อมูลรายวัน
+      (InsightsDayStore) ช่วงวันที่ที่ซ้อนกันจึงใช้วันเดียวกันร่วมกัน และดึงจาก API
+      เฉพาะวันที่ยังไม่มี ส่วน reach ของช่วงหลายวันดึงจาก API ตรงๆ (รวมจากรายวันไม่ได้)
+    - request เดียวกันที่เข้ามาพร้อมกันใน worker เดียวกันจะรอผลเดียวกัน (single-flight)
+    - ทุก namespace มีเพดานจำนวน entry และขนาดรวม (ประมาณจากขนาดที่ serialize แล้ว)
+      ตัดแบบ LRU และ entry ที่หมดอายุถูกลบล่วงหน้าโดย job 'cache:sweep' ใน app.py
+    """
+
+    namespace = 'facebook_ads'
+    report_runs_namespace = 'facebook_report_runs'
+
+    def __init__(self, backend=None, cache_ttl=FB_ADS_CACHE_DURATION, async_threshold=FB_ASYNC_THRESHOLD,
+                 async_timeout=FB_ASYNC_TIMEOUT, max_entries=FB_ADS_CACHE_MAX_ENTRIES,
+                 max_bytes=FB_ADS_CACHE_MAX_BYTES):
+        self.backend = backend or get_cache_backend()
+        self.backend.set_limits(self.namespace, max_entries, max_bytes)
+        self.backend.set_limits(self.report_runs_namespace, FB_REPORT_RUNS_MAX_ENTRIES, 1024 * 1024)
+        self.days = InsightsDayStore(self.backend)
+        self.cache_ttl = cache_ttl
+        self.async_threshold = async_threshold
+        self.async_timeout = async_timeout
+        self.access_token = os.getenv('FACEBOOK_ACCESS_TOKEN')
+        self.ad_account_id = os.getenv('FACEBOOK_AD_ACCOUNT_ID')
+        self._api_pid = None
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.stats = {
+            'sync_runs': 0, 'async_runs': 0, 'async_resumed': 0, 'async_timeouts': 0, 'rows': 0,
+            'days_from_store': 0, 'days_fetched': 0, 'reach_runs': 0
+        }
+
+    @property
+    def configured(self):
+        return bool(self.access_token and self.ad_account_id)
+
+    def _account(self):
+        # init ครั้งเดียวต่อ process (หลัง fork ต้อง init ใหม่)
+        with self._lock:
+            if self._api_pid != os.getpid():
+                FacebookAdsApi.init(access_token=self.access_token)
+                self._api_pid = os.getpid()
+        return AdAccount(self.ad_account_id)
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def get_cached(self, query):
+        """CacheEntry ของ report (None ถ้าไม่มีหรือหมดอายุ)"""
+        return self.backend.get(self.namespace, query.cache_key)
+
+    def get_report(self, query, refresh=False):
+        """คืน report ของ query (จาก cache หรือดึงใหม่)
+
+        Args:
+            query: InsightsQuery
+            refresh: True เพื่อดึงใหม่โดยไม่ใช้ cache
+
+        Returns:
+            tuple: (report dict, CacheEntry ถ้ามาจาก cache ไม่งั้น None)
+
+        Raises:
+            ReportRunTimeout: async report run ยังไม่เสร็จภายใน async_timeout
+        """
+        key = query.cache_key
+        if not refresh:
+            entry = self.get_cached(query)
+            if entry is not None:
+                return entry.value, entry
+
+        with self._key_lock(key):
+            if not refresh:
+                # request อื่นดึงให้แล้วระหว่างรอ lock
+                entry = self.get_cached(query)
+                if entry is not None:
+                    return entry.value, entry
+
+            report = self.fetch_report(query, refresh)
+            self.backend.set(self.namespace, key, report, self.cache_ttl)
+            return report, None
+
+    @staticmethod
+    def uses_day_store(query):
+        """True ถ้า query ประกอบจากข้อมูลรายวันได้ (ทุก field รวมข้ามวันได้)"""
+        return (query.level in ENTITY_FIELDS and not query.custom_fields and not query.action_breakdowns
+                and query.time_increment in (None, '', '1', 'all_days'))
+
+    def fetch_report(self, query, refresh=False):
+        """ดึง insights (จากข้อมูลรายวัน หรือจาก Facebook โดยตรง) แล้วรวมยอด
+
+        Args:
+            query: InsightsQuery
+            refresh: True เพื่อดึงวันนี้/เมื่อวานใหม่ (วันที่ปิดแล้วยังใช้ข้อมูลที่เก็บไว้)
+        """
+        started = time.monotonic()
+
+        if self.uses_day_store(query):
+            run_info = {'mode': 'days'}
+            rows = self._rows_from_days(query, refresh, run_info)
+        else:
+            run_info = {}
+            rows = self._iter_insights(query, run_info)
+
+        aggregator = InsightsAggregator()
+        for insight in rows:
+            aggregator.add(insight)
+
+        run_info['duration_ms'] = round((time.monotonic() - started) * 1000)
+        print(f"✅ Successfully fetched {len(aggregator.data)} {query.level}(s) from Facebook Ads "
+              f"in {run_info['duration_ms']}ms")
+
+        return {
+            'level': query.level,
+            'time_range': {'since': query.since, 'until': query.until},
+            'time_increment': query.time_increment,
+            'data': aggregator.data,
+            'summary': aggregator.summary(),
+            'total_records': len(aggregator.data),
+            'report_run': run_info,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def _iter_insights(self, query, run_info):
+        """แถว insights จาก Facebook (sync หรือ async report run) ทีละแถวตามที่ page มาถึง"""
+        account = self._account()
+        fields = query.fields
+        use_async = query.estimated_size() >= self.async_threshold
+
+        print(f"🔍 Requesting {query.level} insights {query.since}..{query.until} with {len(fields)} fields, "
+              f"page size: {query.limit} ({'async report run' if use_async else 'sync'})")
+
+        run_info['mode'] = 'async' if use_async else 'sync'
+        if use_async:
+            report_run = self._wait_for_report_run(account, query, fields, run_info)
+            # page ถัดไปถูกดึงระหว่างที่ผู้เรียกประมวลผล page ปัจจุบัน
+            cursor = report_run.get_result(params={'limit': query.limit})
+        else:
+            self.stats['sync_runs'] += 1
+            cursor = account.get_insights(fields=fields, params=query.params)
+
+        for insight in cursor:
+            self.stats['rows'] += 1
+            yield insight
+
+    def _rows_from_days(self, query, refresh, run_info):
+        """ประกอบแถวของ query จากข้อมูลรายวัน ดึงจาก API เฉพาะวันที่ยังไม่มี"""
+        days = _date_range(query.since, query.until)
+        daily = {}
+        for day in days:
+            if refresh and self.days.is_recent(day):
+                continue
+            rows = self.days.get(query.level, day)
+            if rows is not None:
+                daily[day] = rows
+
+        missing = [day for day in days if day not in daily]
+        fetches = []
+        for since, until in _contiguous_runs(missing):
+            fetched = {day: [] for day in _date_range(since, until)}
+            fetch_info = {}
+            day_query = InsightsQuery(query.level, since, until, '1', limit=query.limit)
+            for insight in self._iter_insights(day_query, fetch_info):
+                row = dict(insight)
+                fetched.setdefault(row.get('date_start'), []).append(row)
+            for day, rows in fetched.items():
+                self.days.put(query.level, day, rows)
+            daily.update(fetched)
+            fetches.append({'since': since, 'until': until, **fetch_info})
+
+        self.stats['days_from_store'] += len(days) - len(missing)
+        self.stats['days_fetched'] += len(missing)
+        run_info.update({
+            'days': len(days),
+            'days_from_store': len(days) - len(missing),
+            'days_fetched': len(missing),
+            'fetches': fetches
+        })
+
+        if query.time_increment == '1':
+            return [row for day in days for row in daily.get(day, [])]
+
+        reach = self._range_reach(query) if len(days) > 1 else None
+        run_info['reach'] = 'range' if reach is not None else 'day'
+        return rollup_daily_rows(query.level, [row for day in days for row in daily.get(day, [])],
+                                 query.since, query.until, reach)
+
+    def _range_reach(self, query):
+        """reach ของทั้งช่วงต่อ entity (unique คน) ด้วย sync request เล็กๆ ครั้งเดียว
+
+        ขอแค่ id กับ reach ไม่แบ่งวัน ผลจึงมีหนึ่งแถวต่อ entity
+
+        Returns:
+            dict: entity id -> reach
+        """
+        entity_field = ENTITY_FIELDS[query.level]
+        params = {
+            'level': query.level,
+            'time_range': {'since': query.since, 'until': query.until},
+            'limit': query.limit
+        }
+        self.stats['reach_runs'] += 1
+        return {
+            insight[entity_field]: int(insight.get('reach', 0))
+            for insight in self._account().get_insights(fields=[entity_field, 'reach'], params=params)
+        }
+
+    def _wait_for_report_run(self, account, query, fields, run_info):
+        """สั่ง (หรือรอต่อ) async report run แล้ว poll จนเสร็จ"""
+        key = query.cache_key
+        pending = self.backend.get(self.report_runs_namespace, key)
+        if pending is not None:
+            report_run = AdReportRun(pending.value)
+            self.stats['async_resumed'] += 1
+            print(f"⏳ Resuming Facebook report run {pending.value}")
+        else:
+            report_run = account.get_insights(fields=fields, params=query.params, is_async=True)
+            self.stats['async_runs'] += 1
+            # จำไว้เผื่อ request นี้หมดเวลาก่อน run เสร็จ (worker อื่นก็รอ run เดิมได้)
+            self.backend.set(self.report_runs_namespace, key, report_run[AdReportRun.Field.id], self.cache_ttl)
+
+        deadline = time.monotonic() + self.async_timeout
+        delay = 1.0
+        polls = 0
+        while True:
+            report_run = report_run.api_get(fields=[
+                AdReportRun.Field.async_status, AdReportRun.Field.async_percent_completion
+            ])
+            polls += 1
+            status = report_run[AdReportRun.Field.async_status]
+            percent = report_run[AdReportRun.Field.async_percent_completion]
+
+            if status == 'Job Completed':
+                break
+            if status in ('Job Failed', 'Job Skipped'):
+                self.backend.delete(self.report_runs_namespace, key)
+                raise RuntimeError(f"Facebook report run {report_run[AdReportRun.Field.id]} ended with '{status}'")
+            if time.monotonic() + delay > deadline:
+                self.stats['async_timeouts'] += 1
+                raise ReportRunTimeout(report_run[AdReportRun.Field.id], percent)
+
+            time.sleep(delay)
+            delay = min(delay * 1.5, FB_ASYNC_POLL_MAX_INTERVAL)
+
+        self.backend.delete(self.report_runs_namespace, key)
+        run_info.update({'report_run_id': report_run[AdReportRun.Field.id], 'polls': polls})
+        return report_run
+
+    def _usage(self, namespaces, namespace):
+        """จำนวน entry, ขนาด, จำนวนที่ถูกตัด และเพดานของ namespace"""
+        max_entries, max_bytes = self.backend.limits(namespace)
+        return {
+            'entries': 0, 'bytes': 0, 'evictions': 0, 'expirations': 0,
+            **namespaces.get(namespace, {}),
+            'max_entries': max_entries,
+            'max_bytes': max_bytes
+        }
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        namespaces = self.backend.status()['namespaces']
+        return {
+            **self._usage(namespaces, self.namespace),
+            'cache_duration': self.cache_ttl,
+            'async_threshold': self.async_threshold,
+            'async_timeout': self.async_timeout,
+            'day_store': {
+                **self._usage(namespaces, self.days.namespace),
+                'recent_ttl': self.days.recent_ttl,
+                'closed_ttl': self.days.closed_ttl
+            },
+            'pending_report_runs': self._usage(namespaces, self.report_runs_namespace)['entries'],
+            'stats': dict(self.stats)
+        }
+
+
+_insights_service = None
+_insights_service_lock = threading.Lock()
+
+
+def get_facebook_insights_service():
+    """คืน FacebookInsightsService ตัวเดียวของ process"""
+    global _insights_service
+    with _insights_service_lock:
+        if _insights_service is None:
+            _insights_service = FacebookInsightsService()
+        return _insights_service
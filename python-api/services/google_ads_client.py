@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.auth.transport.requests import Request
+
+
+# refresh access token ล่วงหน้าก่อนหมดอายุ (วินาที)
+GOOGLE_ADS_TOKEN_REFRESH_MARGIN = int(os.getenv('GOOGLE_ADS_TOKEN_REFRESH_MARGIN', 300))
+
+
+def load_google_ads_config():
+    """อ่าน config ของ Google Ads จาก environment variables (None ถ้าไม่ครบ)"""
+    config = {
+        'developer_token': os.getenv('GOOGLE_ADS_DEVELOPER_TOKEN'),
+        'client_id': os.getenv('GOOGLE_ADS_CLIENT_ID'),
+        'client_secret': os.getenv('GOOGLE_ADS_CLIENT_SECRET'),
+        'refresh_token': os.getenv('GOOGLE_ADS_REFRESH_TOKEN')
+    }
+    if not all(config.values()):
+        return None
+    return {**config, 'use_proto_plus': True, 'use_cloud_org_for_api_access': False}
+
+
+class GoogleAdsClientManager:
+    """GoogleAdsClient และ GoogleAdsService stub ที่ใช้ร่วมกันทั้ง process
+
+    - สร้าง client (แลก refresh token เป็น access token) และ gRPC channel ครั้งเดียวต่อ worker
+      เดิม load_from_dict + get_service ทุก request ทำให้ต้องแลก token และสร้าง channel ใหม่
+    - refresh access token ใน background ก่อนหมดอายุ request จึงไม่ต้องรอ OAuth
+    - reset() ทิ้ง client/channel เดิม (เช่นหลัง channel เสีย) แล้วสร้างใหม่ใน request ถัดไป
+    """
+
+    def __init__(self, config_factory=load_google_ads_config, refresh_margin=GOOGLE_ADS_TOKEN_REFRESH_MARGIN):
+        self._config_factory = config_factory
+        self._refresh_margin = refresh_margin
+        self._lock = threading.RLock()
+        self.customer_id = (os.getenv('GOOGLE_ADS_CUSTOMER_ID') or '').replace('-', '')
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._client = None
+        self._services = {}
+        self._built_at = None
+        self._build_error = None
+        self._refresh_thread = None
+        self._last_refresh = None
+        self._last_refresh_error = None
+
+    def _ensure_process(self):
+        # หลัง fork (gunicorn --preload) channel และ thread เดิมใช้ไม่ได้
+        if self._pid != os.getpid():
+            self._reset()
+
+    @property
+    def configured(self):
+        return bool(self.customer_id) and self._config_factory() is not None
+
+    @property
+    def client(self):
+        """GoogleAdsClient ที่ authorize แล้ว (สร้างครั้งแรกเมื่อถูกเรียกใช้)"""
+        with self._lock:
+            self._ensure_process()
+            if self._client is None:
+                config = self._config_factory()
+                if config is None:
+                    raise ValueError('Missing Google Ads credentials. Please check environment variables.')
+                try:
+                    client = GoogleAdsClient.load_from_dict(config)
+                except Exception as e:
+                    self._build_error = str(e)
+                    raise
+                self._client = client
+                self._built_at = datetime.now()
+                self._build_error = None
+                self._refresh_credentials(client)
+                self._start_refresh_thread()
+            return self._client
+
+    def get_service(self, name='GoogleAdsService'):
+        """service stub ที่สร้างไว้แล้ว (ใช้ gRPC channel เดิมทุก request)"""
+        client = self.client
+        with self._lock:
+            service = self._services.get(name)
+            if service is None:
+                service = self._services[name] = client.get_service(name)
+            return service
+
+    def reset(self):
+        """ทิ้ง client และ channel ปัจจุบัน"""
+        with self._lock:
+            self._reset()
+
+    def _refresh_credentials(self, client):
+        try:
+            client.credentials.refresh(Request())
+            self._last_refresh = datetime.now()
+            self._last_refresh_error = None
+        except Exception as e:
+            # ไม่ raise - gRPC auth plugin จะ refresh เองตอน request ถัดไป
+            self._last_refresh_error = str(e)
+            print(f"⚠️ Failed to refresh Google Ads token: {e}")
+
+    def _seconds_until_refresh(self):
+        expiry = self._client.credentials.expiry if self._client else None
+        if expiry is None:
+            return self._refresh_margin
+        # google-auth เก็บ expiry เป็น naive UTC
+        remaining = (expiry - datetime.utcnow()).total_seconds()
+        return max(remaining - self._refresh_margin, 5)
+
+    def _start_refresh_thread(self):
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        client = self._client
+
+        def refresh_loop():
+            while True:
+                time.sleep(self._seconds_until_refresh())
+                with self._lock:
+                    # หยุดเมื่อ fork แล้วหรือ client ถูก reset
+                    if self._pid != os.getpid() or self._client is not client:
+                        return
+                # refresh เป็น network call ห้ามถือ lock ไว้ (client/get_service/status จะค้างตาม)
+                self._refresh_credentials(client)
+
+        self._refresh_thread = threading.Thread(
+            target=refresh_loop, name='google-ads-token-refresh', daemon=True
+        )
+        self._refresh_thread.start()
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        with self._lock:
+            self._ensure_process()
+            credentials = self._client.credentials if self._client else None
+            expiry = credentials.expiry if credentials else None
+            return {
+                'configured': self.configured,
+                'initialized': self._client is not None,
+                'healthy': self._client is not None and self._last_refresh_error is None and bool(credentials.valid),
+                'services': sorted(self._services),
+                'built_at': self._built_at.isoformat() if self._built_at else None,
+                'build_error': self._build_error,
+                'last_token_refresh': self._last_refresh.isoformat() if self._last_refresh else None,
+                'last_token_refresh_error': self._last_refresh_error,
+                'token_expires_in': int((expiry - datetime.utcnow()).total_seconds()) if expiry else None,
+                'refresh_thread_alive': bool(self._refresh_thread and self._refresh_thread.is_alive())
+            }
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_google_ads_client_manager():
+    """คืน GoogleAdsClientManager ตัวเดียวของ process"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = GoogleAdsClientManager()
+        return _manager
@@ -0,0 +1,280 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from services.cache_backend import get_cache_backend
+from services.google_ads_client import get_google_ads_client_manager
+
+
+GOOGLE_ADS_CACHE_DURATION = int(os.getenv('GOOGLE_ADS_CACHE_DURATION', 300))  # seconds
+# อายุของข้อมูลรายวัน: วันนี้/เมื่อวานยังเปลี่ยนอยู่ วันที่ปิดแล้วเก็บนานกว่า
+# (ไม่เก็บยาวแบบ Facebook เพราะ conversions ถูกนับย้อนหลังเข้าวันเดิมได้)
+GOOGLE_ADS_DAY_RECENT_TTL = int(os.getenv('GOOGLE_ADS_DAY_RECENT_TTL', GOOGLE_ADS_CACHE_DURATION))
+GOOGLE_ADS_DAY_CLOSED_TTL = int(os.getenv('GOOGLE_ADS_DAY_CLOSED_TTL', 24 * 3600))
+GOOGLE_ADS_DAY_STORE_MAX_ENTRIES = int(os.getenv('GOOGLE_ADS_DAY_STORE_MAX_ENTRIES', 2000))
+GOOGLE_ADS_DAY_STORE_MAX_BYTES = int(os.getenv('GOOGLE_ADS_DAY_STORE_MAX_BYTES', 32 * 1024 * 1024))
+
+# ยอดรายวันของทุก campaign (segments.date ทำให้ได้หนึ่งแถวต่อ campaign ต่อวัน)
+DAILY_CAMPAIGN_QUERY = """
+    SELECT
+        campaign.id,
+        campaign.name,
+        campaign.status,
+        segments.date,
+        metrics.clicks,
+        metrics.impressions,
+        metrics.cost_micros,
+        metrics.conversions
+    FROM campaign
+    WHERE segments.date BETWEEN '{since}' AND '{until}'
+"""
+
+
+def date_range(since, until):
+    """list ของวันที่ (YYYY-MM-DD) ตั้งแต่ since ถึง until"""
+    start = datetime.strptime(since, '%Y-%m-%d')
+    end = datetime.strptime(until, '%Y-%m-%d')
+    return [(start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range((end - start).days + 1)]
+
+
+def contiguous_runs(days):
+    """แบ่งวันที่ที่เรียงแล้วเป็นช่วงต่อเนื่อง [(since, until), ...]"""
+    runs = []
+    previous = None
+    for day in days:
+        current = datetime.strptime(day, '%Y-%m-%d')
+        if previous is not None and current - previous == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+        previous = current
+    return [tuple(run) for run in runs]
+
+
+class CampaignDayStore:
+    """เก็บยอดรายวันของแต่ละ campaign แยกตาม (customer, วันที่) ใน cache backend
+
+    แต่ละ entry คือ campaign_id -> ยอดของวันนั้น วันที่ไม่มีข้อมูลเก็บเป็น dict ว่าง
+    เพื่อไม่ต้องดึงซ้ำ
+    """
+
+    namespace = 'google_ads_days'
+
+    def __init__(self, backend, recent_ttl=GOOGLE_ADS_DAY_RECENT_TTL, closed_ttl=GOOGLE_ADS_DAY_CLOSED_TTL,
+                 max_entries=GOOGLE_ADS_DAY_STORE_MAX_ENTRIES, max_bytes=GOOGLE_ADS_DAY_STORE_MAX_BYTES):
+        self.backend = backend
+        self.backend.set_limits(self.namespace, max_entries, max_bytes)
+        self.recent_ttl = recent_ttl
+        self.closed_ttl = closed_ttl
+
+    @staticmethod
+    def is_recent(day):
+        """วันนี้และเมื่อวาน (ตัวเลขของวันเหล่านี้ยังไม่นิ่ง)"""
+        return day >= (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    def get(self, customer_id, day):
+        entry = self.backend.get(self.namespace, f"{customer_id}|{day}")
+        return entry.value if entry is not None else None
+
+    def put(self, customer_id, day, campaigns):
+        ttl = self.recent_ttl if self.is_recent(day) else self.closed_ttl
+        self.backend.set(self.namespace, f"{customer_id}|{day}", campaigns, ttl)
+
+
+class GoogleAdsReportService:
+    """รายงาน Google Ads ระดับ campaign และรายวัน ประกอบจากยอดรายวันของแต่ละ campaign
+
+    - ดึงจาก API ด้วย search_stream และรวมยอดทันทีที่แต่ละ batch มาถึง
+    - ยอดราย (customer, campaign, วัน) เก็บใน CampaignDayStore ช่วงวันที่ที่ซ้อนกัน
+      จึงใช้วันเดียวกันร่วมกัน และดึงเฉพาะวันที่ยังไม่มี (รวมวันที่ติดกันเป็น query เดียว)
+    - averageCpc และ ctr คำนวณใหม่จากยอดรวมของช่วงที่ขอ
+    """
+
+    def __init__(self, backend=None, clients=None):
+        self.backend = backend or get_cache_backend()
+        self.clients = clients or get_google_ads_client_manager()
+        self.days = CampaignDayStore(self.backend)
+        self._fetch_lock = threading.Lock()
+        self.stats = {'streams': 0, 'rows': 0, 'days_from_store': 0, 'days_fetched': 0}
+
+    def _stream_days(self, customer_id, since, until, daily):
+        """ดึงยอดรายวันช่วง since-until ด้วย search_stream ลงใน daily (วัน -> campaign_id -> ยอด)"""
+        ga_service = self.clients.get_service('GoogleAdsService')
+        stream = ga_service.search_stream(
+            customer_id=customer_id, query=DAILY_CAMPAIGN_QUERY.format(since=since, until=until)
+        )
+        rows = 0
+        for batch in stream:
+            for row in batch.results:
+                campaign_id = str(row.campaign.id)
+                campaigns = daily.setdefault(row.segments.date, {})
+                totals = campaigns.get(campaign_id)
+                if totals is None:
+                    totals = campaigns[campaign_id] = {
+                        'name': row.campaign.name,
+                        'status': row.campaign.status.name,
+                        'clicks': 0, 'impressions': 0, 'cost_micros': 0, 'conversions': 0.0
+                    }
+                totals['clicks'] += row.metrics.clicks
+                totals['impressions'] += row.metrics.impressions
+                totals['cost_micros'] += row.metrics.cost_micros
+                totals['conversions'] += row.metrics.conversions
+                rows += 1
+        self.stats['streams'] += 1
+        self.stats['rows'] += rows
+        return rows
+
+    def get_days(self, since, until, refresh=False):
+        """ยอดรายวันของทุก campaign ตั้งแต่ since ถึง until ดึงจาก API เฉพาะวันที่ยังไม่มี
+
+        Args:
+            refresh: True เพื่อดึงวันนี้/เมื่อวานใหม่ (วันที่ปิดแล้วยังใช้ข้อมูลที่เก็บไว้)
+
+        Returns:
+            tuple: ({วันที่: {campaign_id: ยอด}}, run_info)
+        """
+        customer_id = self.clients.customer_id
+        days = date_range(since, until)
+
+        def load_stored():
+            stored = {}
+            for day in days:
+                if refresh and self.days.is_recent(day):
+                    continue
+                campaigns = self.days.get(customer_id, day)
+                if campaigns is not None:
+                    stored[day] = campaigns
+            return stored
+
+        daily = load_stored()
+        fetches = []
+        if len(daily) < len(days):
+            # request ที่ขอวันเดียวกันพร้อมกันใน worker นี้รอผลเดียวกันแทนการยิงซ้ำ
+            with self._fetch_lock:
+                if not refresh:
+                    daily = load_stored()
+                missing = [day for day in days if day not in daily]
+                for run_since, run_until in contiguous_runs(missing):
+                    fetched = {day: {} for day in date_range(run_since, run_until)}
+                    started = time.monotonic()
+                    rows = self._stream_days(customer_id, run_since, run_until, fetched)
+                    for day, campaigns in fetched.items():
+                        self.days.put(customer_id, day, campaigns)
+                    daily.update(fetched)
+                    fetches.append({
+                        'since': run_since, 'until': run_until, 'rows': rows,
+                        'duration_ms': round((time.monotonic() - started) * 1000)
+                    })
+
+        fetched_days = sum(len(date_range(fetch['since'], fetch['until'])) for fetch in fetches)
+        self.stats['days_from_store'] += len(days) - fetched_days
+        self.stats['days_fetched'] += fetched_days
+        return daily, {
+            'days': len(days),
+            'days_from_store': len(days) - fetched_days,
+            'days_fetched': fetched_days,
+            'fetches': fetches
+        }
+
+    def campaign_report(self, since, until, refresh=False):
+        """ยอดรวมต่อ campaign และ summary ของช่วง since-until"""
+        daily, run_info = self.get_days(since, until, refresh)
+
+        totals = {}
+        for day in sorted(daily):
+            for campaign_id, day_totals in daily[day].items():
+                campaign = totals.get(campaign_id)
+                if campaign is None:
+                    campaign = totals[campaign_id] = {
+                        'name': day_totals['name'], 'clicks': 0, 'impressions': 0, 'cost_micros': 0, 'conversions': 0.0
+                    }
+                # ใช้ชื่อ/สถานะล่าสุดของ campaign
+                campaign['name'] = day_totals['name']
+                campaign['status'] = day_totals['status']
+                for name in ('clicks', 'impressions', 'cost_micros', 'conversions'):
+                    campaign[name] += day_totals[name]
+
+        campaigns = []
+        total_clicks = 0
+        total_impressions = 0
+        total_cost = 0
+        for campaign_id, campaign in totals.items():
+            clicks = campaign['clicks']
+            impressions = campaign['impressions']
+            cost = campaign['cost_micros'] / 1000000
+            campaigns.append({
+                'id': campaign_id,
+                'name': campaign['name'],
+                'status': campaign['status'],
+                'clicks': clicks,
+                'impressions': impressions,
+                'averageCpc': round(cost / clicks, 2) if clicks else 0,
+                'cost': round(cost, 2),
+                'ctr': round(clicks / impressions * 100, 2) if impressions else 0,
+                'conversions': campaign['conversions']
+            })
+            total_clicks += clicks
+            total_impressions += impressions
+            total_cost += cost
+
+        avg_cpc = (total_cost / total_clicks) if total_clicks > 0 else 0
+        avg_ctr = (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
+
+        return {
+            'campaigns': campaigns,
+            'summary': {
+                'totalClicks': total_clicks,
+                'totalImpressions': total_impressions,
+                'averageCpc': round(avg_cpc, 2),
+                'totalCost': round(total_cost, 2),
+                'averageCtr': round(avg_ctr, 2)
+            },
+            'report_run': run_info
+        }
+
+    def daily_report(self, since, until, refresh=False):
+        """ยอดรวมทุก campaign ต่อวัน (เฉพาะวันที่มีข้อมูล เรียงจากวันล่าสุด)"""
+        daily, run_info = self.get_days(since, until, refresh)
+
+        daily_list = []
+        for day in sorted(daily, reverse=True):
+            campaigns = daily[day]
+            if not campaigns:
+                continue
+            daily_list.append({
+                'date': day,
+                'clicks': sum(campaign['clicks'] for campaign in campaigns.values()),
+                'impressions': sum(campaign['impressions'] for campaign in campaigns.values()),
+                'cost': sum(campaign['cost_micros'] for campaign in campaigns.values()) / 1000000,
+                'conversions': sum(campaign['conversions'] for campaign in campaigns.values())
+            })
+
+        return {'dailyData': daily_list, 'report_run': run_info}
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        max_entries, max_bytes = self.backend.limits(self.days.namespace)
+        usage = self.backend.status()['namespaces'].get(self.days.namespace, {})
+        return {
+            'entries': 0, 'bytes': 0, 'evictions': 0, 'expirations': 0,
+            **usage,
+            'max_entries': max_entries,
+            'max_bytes': max_bytes,
+            'recent_ttl': self.days.recent_ttl,
+            'closed_ttl': self.days.closed_ttl,
+            'stats': dict(self.stats)
+        }
+
+
+_report_service = None
+_report_service_lock = threading.Lock()
+
+
+def get_google_ads_report_service():
+    """คืน GoogleAdsReportService ตัวเดียวของ process"""
+    global _report_service
+    with _report_service_lock:
+        if _report_service is None:
+            _report_service = GoogleAdsReportService()
+        return _report_service
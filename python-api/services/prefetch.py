@@ -0,0 +1,146 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from services.cache_backend import get_cache_backend
+
+
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'true').lower() == 'true'
+PREFETCH_MAX_WORKERS = int(os.getenv('PREFETCH_MAX_WORKERS', 2))
+# สุ่มเลื่อนเวลาแต่ละรอบ ±สัดส่วนนี้ของ interval เพื่อไม่ให้ทุก job ยิงพร้อมกัน
+PREFETCH_JITTER = float(os.getenv('PREFETCH_JITTER', 0.1))
+
+
+class PrefetchJob:
+    """งานดึงข้อมูลล่วงหน้าหนึ่งชุด"""
+
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = time.monotonic()
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+
+    def status(self):
+        return {
+            'interval': self.interval,
+            'running': self.running,
+            'runs': self.runs,
+            'skipped_other_worker': self.skipped,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'last_duration_ms': round(self.last_duration * 1000) if self.last_duration is not None else None,
+            'last_error': self.last_error
+        }
+
+
+class PrefetchScheduler:
+    """Refresh ข้อมูลที่ใช้บ่อยก่อน cache หมดอายุ เพื่อให้ request ของผู้ใช้เจอ cache อุ่นเสมอ
+
+    - แต่ละ job รันทุก interval วินาที (ตั้งให้สั้นกว่า ttl ของ cache) พร้อม jitter
+    - รันพร้อมกันได้ไม่เกิน max_workers job
+    - ใช้ lease ใน cache backend ให้แต่ละรอบถูกรันโดย gunicorn worker เดียว
+
+    ใช้ class เดียวกันกับงานดูแลระบบ (name='maintenance') ที่ต้องรันเสมอแม้ปิด prefetch
+    เช่น เขียน call count ลง sheet โดยแยก lease namespace และ thread กัน
+    """
+
+    def __init__(self, backend=None, max_workers=PREFETCH_MAX_WORKERS, jitter=PREFETCH_JITTER, name='prefetch'):
+        self.backend = backend or get_cache_backend()
+        self.name = name
+        self.lease_namespace = f'{name}_leases'
+        self.max_workers = max_workers
+        self.jitter = jitter
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._pid = None
+
+    def register(self, name, func, interval):
+        """ลงทะเบียน job
+
+        Args:
+            name: ชื่อ job (ใช้เป็น key ของ lease ด้วย)
+            func: ฟังก์ชันที่ไม่รับ argument สำหรับดึงข้อมูลแล้วเขียนลง cache
+            interval: ความถี่ (วินาที)
+        """
+        with self._lock:
+            self._jobs[name] = PrefetchJob(name, func, max(interval, 1))
+        self._wakeup.set()
+
+    def _jittered(self, interval):
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def start(self):
+        """เริ่ม scheduler thread (เรียกซ้ำได้ และเริ่มใหม่หลัง fork)"""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=self.name
+            )
+            self._thread = threading.Thread(target=self._loop, name=f'{self.name}-scheduler', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                jobs = list(self._jobs.values())
+
+            for job in jobs:
+                if job.running or job.next_run > now:
+                    continue
+                job.next_run = now + self._jittered(job.interval)
+                try:
+                    # อีก worker รันรอบนี้ไปแล้ว
+                    if not self.backend.add(self.lease_namespace, job.name, os.getpid(), job.interval * 0.8):
+                        job.skipped += 1
+                        continue
+                    job.running = True
+                    self._executor.submit(self._run, job)
+                except Exception as e:
+                    # เช่น SQLite "database is locked" ตอนจอง lease ข้ามรอบนี้ไป แต่ scheduler ต้องทำงานต่อ
+                    job.running = False
+                    job.last_error = str(e)
+                    print(f"⚠️ Could not schedule {self.name} job '{job.name}': {e}")
+
+            with self._lock:
+                pending = [job.next_run for job in self._jobs.values() if not job.running]
+            delay = min(pending) - time.monotonic() if pending else 5
+            self._wakeup.wait(timeout=min(max(delay, 0.5), 5))
+            self._wakeup.clear()
+
+    def _run(self, job):
+        started = time.monotonic()
+        try:
+            job.func()
+            job.last_error = None
+        except Exception as e:
+            job.last_error = str(e)
+            print(f"⚠️ {self.name.capitalize()} job '{job.name}' failed: {e}")
+        finally:
+            job.runs += 1
+            job.last_run = datetime.now()
+            job.last_duration = time.monotonic() - started
+            job.running = False
+            self._wakeup.set()
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        with self._lock:
+            return {
+                'enabled': self._thread is not None and self._thread.is_alive(),
+                'max_workers': self.max_workers,
+                'jobs': {name: job.status() for name, job in self._jobs.items()}
+            }
@@ -0,0 +1,210 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import Response, copy_current_request_context, current_app, g, make_response, request
+
+try:
+    import brotli
+except ImportError:  # brotli เป็น optional (มากับ Flask-Compress) ถ้าไม่มีจะเก็บแค่ gzip
+    brotli = None
+
+from services.cache_backend import get_cache_backend
+
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 256))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+RESPONSE_CACHE_STALE_TTL = int(os.getenv('RESPONSE_CACHE_STALE_TTL', 60))
+# body ที่เล็กกว่านี้ไม่บีบอัด (ค่าเดียวกับ COMPRESS_MIN_SIZE ของ Flask-Compress)
+RESPONSE_CACHE_COMPRESS_MIN_SIZE = 500
+RESPONSE_CACHE_GZIP_LEVEL = 6
+RESPONSE_CACHE_BROTLI_QUALITY = 5
+
+
+def encode_body(payload):
+    """แปลง payload เป็น JSON bytes แบบเดียวกับ jsonify"""
+    return f"{current_app.json.dumps(payload)}\n".encode('utf-8')
+
+
+class EncodedBody:
+    """JSON body ที่ encode แล้ว พร้อมฉบับ gzip / brotli ที่บีบอัดไว้ล่วงหน้า"""
+
+    __slots__ = ('identity', 'gzip', 'br')
+
+    def __init__(self, identity, compress=True):
+        self.identity = identity
+        self.gzip = None
+        self.br = None
+        if compress and len(identity) >= RESPONSE_CACHE_COMPRESS_MIN_SIZE:
+            self.gzip = gzip.compress(identity, compresslevel=RESPONSE_CACHE_GZIP_LEVEL, mtime=0)
+            if brotli is not None:
+                self.br = brotli.compress(identity, quality=RESPONSE_CACHE_BROTLI_QUALITY)
+
+    def choose(self, accept_encodings):
+        """เลือก (encoding, bytes) ตาม Accept-Encoding ของ client (encoding None = ไม่บีบอัด)"""
+        if self.br is not None and accept_encodings['br']:
+            return 'br', self.br
+        if self.gzip is not None and accept_encodings['gzip']:
+            return 'gzip', self.gzip
+        return None, self.identity
+
+
+class ResponseCache:
+    """Cache ผลลัพธ์ JSON ของ route ตาม path + query string + JSON body
+
+    - แต่ละ route กำหนด ttl เองผ่าน decorator
+    - จำกัดจำนวน entry และขนาดรวม (bytes) แบบ LRU ผ่าน cache backend
+    - นับ hit/miss สำหรับ /health (นับแยกต่อ worker)
+    - เก็บ entry เป็น JSON bytes (มี 'cached': true) พร้อมฉบับ gzip/brotli ที่บีบอัดแล้ว
+      cache hit จึงส่ง bytes ออกไปตรงๆ ไม่ต้อง jsonify หรือบีบอัดใหม่ (ใส่ Content-Encoding
+      ให้ Flask-Compress ข้าม) ส่วนข้อมูลที่ต่างกันทุก hit อยู่ใน header:
+      X-Cache (HIT/STALE/MISS), Age และ X-Cache-Expires-In
+    - entry ที่เลย ttl แต่ยังอยู่ใน stale_ttl จะถูกคืนทันทีแล้ว refresh ใน background
+    """
+
+    namespace = 'responses'
+
+    def __init__(self, backend=None, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.backend = backend or get_cache_backend()
+        self.backend.set_limits(self.namespace, max_entries, max_bytes)
+        self.stats = {'hits': 0, 'misses': 0}
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+
+    @staticmethod
+    def make_key():
+        """สร้าง cache key จาก request ปัจจุบัน (ลำดับ query parameter ไม่มีผล)"""
+        query = sorted(
+            (name, value)
+            for name, values in request.args.lists()
+            if name != 'no_cache'
+            for value in values
+        )
+        key = request.path + '?' + json.dumps(query, ensure_ascii=False)
+
+        body = request.get_json(silent=True) if request.is_json else None
+        if body is not None:
+            body_json = json.dumps(body, sort_keys=True, ensure_ascii=False)
+            key += '#' + hashlib.sha1(body_json.encode('utf-8')).hexdigest()
+
+        return key
+
+    def get(self, key):
+        return self.backend.get(self.namespace, key)
+
+    def set(self, key, payload, ttl):
+        return self.backend.set(self.namespace, key, payload, ttl)
+
+    def clear(self):
+        self.backend.clear(self.namespace)
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        max_entries, max_bytes = self.backend.limits(self.namespace)
+        usage = self.backend.status()['namespaces'].get(self.namespace, {'entries': 0, 'bytes': 0})
+        return {
+            **usage,
+            'backend': self.backend.name,
+            'max_entries': max_entries,
+            'max_bytes': max_bytes,
+            'stats': dict(self.stats)
+        }
+
+    def cached(self, ttl, stale_ttl=RESPONSE_CACHE_STALE_TTL):
+        """Decorator สำหรับ cache response ของ route
+
+        Args:
+            ttl: อายุของ cache (วินาที)
+            stale_ttl: หลังหมด ttl ยังคืนค่าเดิมได้อีกกี่วินาที ระหว่างที่ refresh
+                ใน background (stale-while-revalidate)
+
+        ส่ง query parameter no_cache=true เพื่อข้าม cache
+        cache เฉพาะ response 200 ที่เป็น JSON object และไม่มี success=False (ไม่ cache response แบบ stream)
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if request.args.get('no_cache', '').lower() == 'true':
+                    return func(*args, **kwargs)
+
+                key = self.make_key()
+                entry = None if is_refresh_request() else self.get(key)
+                if entry is not None and 'body' not in entry.value:
+                    entry = None  # entry รูปแบบเก่า (เก็บเป็น dict) ให้คำนวณใหม่
+                if entry is not None:
+                    self.stats['hits'] += 1
+                    age = int(entry.age)
+                    expires_in = entry.value['fresh_until'] - time.time()
+                    if expires_in > 0:
+                        print(f"✅ Returning cached response for {request.path} (age {age}s)")
+                        return self._build_response(entry.value['body'], 'HIT', age, expires_in)
+
+                    print(f"♻️ Returning stale response for {request.path} (age {age}s), revalidating")
+                    self._revalidate_in_background(key, wrapper, args, kwargs)
+                    return self._build_response(entry.value['body'], 'STALE', age, 0)
+
+                self.stats['misses'] += 1
+                response = make_response(func(*args, **kwargs))
+
+                # response แบบ stream ส่งต่อทันที (อ่าน body เพื่อ cache จะทำให้ต้องรอจนจบ)
+                if response.is_streamed:
+                    return response
+
+                payload = response.get_json(silent=True) if response.status_code == 200 else None
+                if not isinstance(payload, dict) or payload.get('success') is False:
+                    return response
+
+                body = EncodedBody(encode_body({**payload, 'cached': True}))
+                self.set(key, {'body': body, 'fresh_until': time.time() + ttl}, ttl + stale_ttl)
+                # response ของ miss ใช้ครั้งเดียว ไม่บีบอัดล่วงหน้า ให้ Flask-Compress จัดการตามปกติ
+                miss_body = EncodedBody(encode_body({**payload, 'cached': False}), compress=False)
+                return self._build_response(miss_body, 'MISS', 0, ttl)
+
+            return wrapper
+        return decorator
+
+    def _revalidate_in_background(self, key, wrapper, args, kwargs):
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        @copy_current_request_context
+        def revalidate():
+            try:
+                # request ที่อ่าน entry เก่าไปก่อน refresh รอบก่อนเขียนเสร็จ (หรือ worker อื่น
+                # refresh ไปแล้ว) ไม่ต้องคำนวณซ้ำ
+                entry = self.get(key)
+                if entry is not None and entry.value.get('fresh_until', 0) > time.time():
+                    return
+                g.cache_refresh = True
+                wrapper(*args, **kwargs)
+            except Exception as e:
+                print(f"⚠️ Background revalidation failed for {key}: {e}")
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=revalidate, name='response-cache-revalidate', daemon=True).start()
+
+    @staticmethod
+    def _build_response(body, status, age, expires_in):
+        encoding, data = body.choose(request.accept_encodings)
+        response = Response(data, mimetype='application/json')
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        if body.gzip is not None:
+            response.vary.add('Accept-Encoding')
+        response.headers['X-Cache'] = status
+        response.headers['Age'] = str(age)
+        response.headers['X-Cache-Expires-In'] = str(max(int(expires_in), 0))
+        return response
+
+
+def is_refresh_request():
+    """True ถ้า request นี้ถูกสั่งให้คำนวณใหม่แล้วเขียนทับ cache (prefetch / revalidate)"""
+    return getattr(g, 'cache_refresh', False)
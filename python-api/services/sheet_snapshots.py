@@ -0,0 +1,279 @@
+import json
+import os
+import threading
+import time
+
+from services.sheets_client import columns_to_rows, get_sheets_registry
+from services.cache_backend import get_cache_backend
+
+
+# อายุของ snapshot ก่อนต้องตรวจ revision ใหม่ (วินาที)
+SNAPSHOT_TTL = int(os.getenv('SHEETS_SNAPSHOT_TTL', 30))
+# เก็บ snapshot ใน backend ที่ใช้ร่วมกันนานเท่าไร (ใช้เทียบ revision หลังหมด ttl)
+SNAPSHOT_RETENTION = int(os.getenv('SHEETS_SNAPSHOT_RETENTION', 3600))
+
+
+class WorksheetSnapshot:
+    """ค่าทั้งหมดของ worksheet (2-D list) ณ revision หนึ่ง"""
+
+    __slots__ = ('title', 'values', 'revision', 'version', 'fetched_at', 'checked_at')
+
+    def __init__(self, title, values, revision, version=None, fetched_at=None):
+        self.title = title
+        self.values = values
+        self.revision = revision
+        self.fetched_at = fetched_at or time.time()
+        # ระบุการดาวน์โหลดแต่ละครั้ง ใช้เทียบกับ snapshot ที่ worker อื่นเก็บไว้
+        self.version = version or f"{self.fetched_at:.6f}-{os.getpid()}"
+        self.checked_at = time.monotonic()
+
+    def to_shared(self):
+        return {
+            'title': self.title,
+            'values': self.values,
+            'revision': self.revision,
+            'version': self.version,
+            'fetched_at': self.fetched_at
+        }
+
+    @classmethod
+    def from_shared(cls, data):
+        return cls(data['title'], data['values'], data['revision'], data['version'], data['fetched_at'])
+
+
+class WorksheetSnapshotCache:
+    """Cache ค่าของ worksheet ตามชื่อ sheet ใช้ร่วมกันทุก route
+
+    - อายุ snapshot กำหนดด้วย ttl
+    - เมื่อหมดอายุจะเช็ค modifiedTime ของไฟล์จาก Drive ก่อน ถ้าไม่เปลี่ยนก็ใช้ค่าเดิมต่อ
+      โดยไม่ต้องดาวน์โหลดทั้ง sheet
+    - request ที่เข้ามาพร้อมกันจะรอ refresh ครั้งเดียวกัน (single-flight)
+    - snapshot ถูกเก็บใน cache backend ด้วย worker อื่นจึงใช้ต่อได้โดยไม่ต้องดาวน์โหลดซ้ำ
+      และ clear() ของ backend จะล้าง snapshot ในหน่วยความจำของทุก worker
+
+    - ระบุ columns เพื่อเก็บ/ดึงเฉพาะบางคอลัมน์ (projection) แยกจาก snapshot เต็ม
+      ถ้ามี snapshot เต็มที่ยังสดอยู่จะตัดคอลัมน์จากนั้นเลยโดยไม่ต้องดึงใหม่
+
+    ค่าที่คืนไปเป็น list ที่ใช้ร่วมกัน ผู้เรียกห้ามแก้ไข
+    """
+
+    namespace = 'sheet_snapshots'
+
+    def __init__(self, registry=None, backend=None, ttl=SNAPSHOT_TTL, retention=SNAPSHOT_RETENTION):
+        self.registry = registry or get_sheets_registry(readonly=True)
+        self.backend = backend or get_cache_backend()
+        self.ttl = ttl
+        self.retention = retention
+        self._entries = {}  # (spreadsheet_id, title, columns) -> WorksheetSnapshot
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._generation = self.backend.generation()
+        self.stats = {'hits': 0, 'shared_hits': 0, 'downloads': 0, 'revision_hits': 0, 'projected_hits': 0}
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _is_fresh(self, snapshot):
+        return snapshot is not None and time.monotonic() - snapshot.checked_at < self.ttl
+
+    def _check_generation(self):
+        generation = self.backend.generation()
+        if generation != self._generation:
+            with self._lock:
+                self._entries.clear()
+                self._generation = generation
+
+    def _open_worksheet(self, spreadsheet_id, sheet_names):
+        if len(sheet_names) == 1:
+            return self.registry.get_worksheet(spreadsheet_id, sheet_names[0])
+        return self.registry.get_worksheet_with_fallback(spreadsheet_id, list(sheet_names))
+
+    def _get_revision(self, worksheet):
+        """modifiedTime ของไฟล์จาก Drive API (None ถ้าอ่านไม่ได้)"""
+        try:
+            return worksheet.spreadsheet.get_lastUpdateTime()
+        except Exception as e:
+            print(f"⚠️ Could not read spreadsheet revision: {e}")
+            return None
+
+    def _load_shared(self, shared_key, version=None, revision=None):
+        """อ่าน snapshot ที่ worker อื่นเก็บไว้ ถ้า version หรือ revision ตรงกัน"""
+        entry = self.backend.get(self.namespace, shared_key)
+        if entry is None:
+            return None
+        data = entry.value
+        if version is not None and data['version'] == version:
+            return WorksheetSnapshot.from_shared(data)
+        if revision is not None and data['revision'] == revision:
+            return WorksheetSnapshot.from_shared(data)
+        return None
+
+    def _mark_checked(self, key, shared_key, snapshot):
+        snapshot.checked_at = time.monotonic()
+        self._entries[key] = snapshot
+        self.backend.set(self.namespace, shared_key + '|checked', snapshot.version, self.ttl)
+
+    def _project(self, snapshot, columns):
+        """ตัดเฉพาะ columns จาก snapshot เต็ม"""
+        header = snapshot.values[0] if snapshot.values else []
+        indexes = self.registry.resolve_columns(header, columns)
+        names = [header[index] if index < len(header) else '' for index in indexes]
+        rows = [
+            [row[index] if index < len(row) else '' for index in indexes]
+            for row in snapshot.values[1:]
+        ]
+        return [names] + rows
+
+    def _download(self, worksheet, columns):
+        if columns is None:
+            return worksheet.get_all_values()
+        _, names, values = self.registry.fetch_columns(worksheet, list(columns))
+        return [names] + columns_to_rows(values)
+
+    def get_snapshot(self, spreadsheet_id, sheet_names, force=False, revalidate=False, columns=None):
+        """คืน WorksheetSnapshot ของ sheet
+
+        Args:
+            spreadsheet_id: ID ของ spreadsheet
+            sheet_names: ชื่อ sheet หรือ list ของชื่อที่เป็นไปได้ (fallback)
+            force: True เพื่อดาวน์โหลดใหม่โดยไม่สน ttl/revision
+            revalidate: True เพื่อตรวจ revision ทันทีแม้ snapshot ยังไม่หมดอายุ
+                (ใช้โดย prefetch scheduler ให้ snapshot สดอยู่เสมอ)
+            columns: list ของชื่อ header หรือ index ของคอลัมน์ (None = ทุกคอลัมน์)
+                แถวแรกของ values จะเป็นชื่อคอลัมน์ตามลำดับที่ขอ
+
+        Raises:
+            gspread.exceptions.WorksheetNotFound: ถ้าระบุชื่อเดียวแล้วไม่พบ
+            ValueError: ถ้าระบุหลายชื่อแล้วไม่พบเลย
+            MissingColumnsError: ถ้าไม่พบคอลัมน์ที่ระบุ
+        """
+        if isinstance(sheet_names, str):
+            sheet_names = (sheet_names,)
+        columns = tuple(columns) if columns else None
+
+        self._check_generation()
+
+        # handle ของ worksheet ถูก cache ไว้ใน registry จึงไม่เสีย round trip
+        # และทำให้ชื่อ fallback ต่างกันแต่เป็น sheet เดียวกันใช้ snapshot ร่วมกัน
+        worksheet = self._open_worksheet(spreadsheet_id, sheet_names)
+        key = (spreadsheet_id, worksheet.title, columns)
+        shared_key = f"{spreadsheet_id}|{worksheet.title}"
+        if columns is not None:
+            shared_key += '|' + json.dumps(columns, ensure_ascii=False)
+
+        use_cached = not force and not revalidate
+
+        snapshot = self._entries.get(key)
+        if use_cached and self._is_fresh(snapshot):
+            self.stats['hits'] += 1
+            return snapshot
+
+        with self._key_lock(key):
+            # อาจมี request อื่น refresh ให้แล้วระหว่างรอ lock
+            snapshot = self._entries.get(key)
+            if use_cached and self._is_fresh(snapshot):
+                self.stats['hits'] += 1
+                return snapshot
+
+            if use_cached and columns is not None:
+                # มี snapshot เต็มที่ยังสด ตัดคอลัมน์จากนั้นได้เลย
+                full = self._entries.get((spreadsheet_id, worksheet.title, None))
+                if self._is_fresh(full):
+                    snapshot = WorksheetSnapshot(
+                        worksheet.title, self._project(full, columns), full.revision,
+                        version=f"{full.version}|projected", fetched_at=full.fetched_at
+                    )
+                    snapshot.checked_at = full.checked_at
+                    self._entries[key] = snapshot
+                    self.stats['projected_hits'] += 1
+                    return snapshot
+
+            if use_cached:
+                # worker อื่นตรวจ/ดาวน์โหลดไปแล้วภายใน ttl
+                checked = self.backend.get(self.namespace, shared_key + '|checked')
+                if checked is not None:
+                    if snapshot is not None and snapshot.version == checked.value:
+                        snapshot.checked_at = time.monotonic()
+                        self.stats['shared_hits'] += 1
+                        return snapshot
+                    shared = self._load_shared(shared_key, version=checked.value)
+                    if shared is not None:
+                        self._entries[key] = shared
+                        self.stats['shared_hits'] += 1
+                        return shared
+
+            revision = self._get_revision(worksheet)
+
+            if not force and revision is not None:
+                if snapshot is not None and snapshot.revision == revision:
+                    self._mark_checked(key, shared_key, snapshot)
+                    self.stats['revision_hits'] += 1
+                    return snapshot
+                shared = self._load_shared(shared_key, revision=revision)
+                if shared is not None:
+                    self._mark_checked(key, shared_key, shared)
+                    self.stats['revision_hits'] += 1
+                    return shared
+
+            values = self._download(worksheet, columns)
+            snapshot = WorksheetSnapshot(worksheet.title, values, revision)
+            self.backend.set(self.namespace, shared_key, snapshot.to_shared(), self.retention)
+            self._mark_checked(key, shared_key, snapshot)
+            self.stats['downloads'] += 1
+            print(f"📥 Downloaded snapshot of '{worksheet.title}' ({len(values)} rows)")
+            return snapshot
+
+    def get_values(self, spreadsheet_id, sheet_names, force=False, columns=None):
+        """คืนค่าทั้งหมดของ sheet (รวม header) เหมือน worksheet.get_all_values()
+
+        ระบุ columns เพื่อดึงเฉพาะบางคอลัมน์ (ดู get_snapshot)
+        """
+        return self.get_snapshot(spreadsheet_id, sheet_names, force, columns=columns).values
+
+    def invalidate(self, spreadsheet_id=None, title=None):
+        """ลบ snapshot (ทั้งหมด / ทั้ง spreadsheet / เฉพาะ sheet)"""
+        with self._lock:
+            for key in list(self._entries):
+                if spreadsheet_id is not None and key[0] != spreadsheet_id:
+                    continue
+                if title is not None and key[1] != title:
+                    continue
+                del self._entries[key]
+
+        if spreadsheet_id is not None and title is not None:
+            shared_key = f"{spreadsheet_id}|{title}"
+            self.backend.delete(self.namespace, shared_key)
+            self.backend.delete(self.namespace, shared_key + '|checked')
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        now = time.time()
+        return {
+            'ttl': self.ttl,
+            'stats': dict(self.stats),
+            'sheets': {
+                snapshot.title + (f" {list(key[2])}" if key[2] else ''): {
+                    'rows': len(snapshot.values),
+                    'revision': snapshot.revision,
+                    'age_seconds': round(now - snapshot.fetched_at, 1)
+                }
+                for key, snapshot in list(self._entries.items())
+            }
+        }
+
+
+_snapshot_cache = None
+_snapshot_cache_lock = threading.Lock()
+
+
+def get_snapshot_cache():
+    """คืน WorksheetSnapshotCache ตัวเดียวของ process"""
+    global _snapshot_cache
+    with _snapshot_cache_lock:
+        if _snapshot_cache is None:
+            _snapshot_cache = WorksheetSnapshotCache()
+        return _snapshot_cache
@@ -0,0 +1,382 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import gspread
+from gspread.utils import rowcol_to_a1
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+
+from services.cache_backend import get_cache_backend
+
+
+# สิทธิ์เขียน ใช้เฉพาะการเขียน call matrix (GoogleSheetsService)
+SHEETS_SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive'
+]
+# สิทธิ์อ่านอย่างเดียว ใช้กับทุก route ที่อ่าน sheet
+SHEETS_READONLY_SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets.readonly',
+    'https://www.googleapis.com/auth/drive.readonly'
+]
+
+# refresh token ล่วงหน้าก่อนหมดอายุ (วินาที)
+TOKEN_REFRESH_MARGIN = int(os.getenv('SHEETS_TOKEN_REFRESH_MARGIN', 300))
+# อายุของ Spreadsheet/Worksheet handle ก่อนจะเปิดใหม่ (วินาที)
+HANDLE_TTL = int(os.getenv('SHEETS_HANDLE_TTL', 3600))
+
+
+def build_service_account_credentials(scopes=None):
+    """สร้าง service account credentials จาก environment variables"""
+    private_key = os.getenv('GOOGLE_SERVICE_ACCOUNT_PRIVATE_KEY', '')
+    client_email = os.getenv('GOOGLE_SERVICE_ACCOUNT_EMAIL')
+
+    if not client_email or not private_key:
+        raise ValueError("Missing required Google credentials in environment variables")
+
+    # Replace escaped newlines in private key if needed
+    if '\\n' in private_key:
+        private_key = private_key.replace('\\n', '\n')
+
+    credentials_info = {
+        "type": "service_account",
+        "project_id": os.getenv('GOOGLE_PROJECT_ID'),
+        "private_key_id": os.getenv('GOOGLE_PRIVATE_KEY_ID'),
+        "private_key": private_key,
+        "client_email": client_email,
+        "client_id": os.getenv('GOOGLE_CLIENT_ID'),
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+        "client_x509_cert_url": os.getenv('GOOGLE_CLIENT_CERT_URL')
+    }
+
+    return Credentials.from_service_account_info(credentials_info, scopes=scopes or SHEETS_SCOPES)
+
+
+class MissingColumnsError(ValueError):
+    """ไม่พบคอลัมน์ที่ต้องการใน header ของ sheet"""
+
+    def __init__(self, missing, available_columns):
+        super().__init__(f"Required column not found: {', '.join(map(str, missing))}")
+        self.missing = missing
+        self.available_columns = available_columns
+
+
+def column_letter(index):
+    """index ของคอลัมน์ (เริ่ม 0) -> ตัวอักษร เช่น 0 -> 'A', 27 -> 'AB'"""
+    return rowcol_to_a1(1, index + 1).rstrip('0123456789')
+
+
+def quote_sheet_title(title):
+    """ใส่ quote ให้ชื่อ sheet สำหรับใช้ใน A1 notation"""
+    return "'" + title.replace("'", "''") + "'"
+
+
+def trim_row(row):
+    """ตัดช่องว่างท้ายแถว (Sheets API ไม่ส่ง cell ว่างท้ายแถวมา)"""
+    end = len(row)
+    while end and row[end - 1] == '':
+        end -= 1
+    return row[:end]
+
+
+def columns_to_rows(columns):
+    """แปลงค่าแบบรายคอลัมน์ (majorDimension=COLUMNS) เป็นรายแถว เติม '' ให้แถวยาวเท่ากัน"""
+    height = max((len(column) for column in columns), default=0)
+    return [
+        [column[i] if i < len(column) else '' for column in columns]
+        for i in range(height)
+    ]
+
+
+class SheetsClientRegistry:
+    """gspread client ที่ใช้ร่วมกันทั้ง process
+
+    authorize ครั้งเดียวต่อ worker, refresh token ใน background ก่อนหมดอายุ
+    และเก็บ Spreadsheet/Worksheet handle ไว้ตาม (spreadsheet_id, title)
+    เพื่อไม่ต้องเรียก open_by_key / fetch metadata ใหม่ทุก request
+    handle ถูกล้างเมื่อ generation ของ cache backend เปลี่ยน (/api/clear-cache จาก worker ใดก็ได้)
+    """
+
+    def __init__(self, credentials_factory=build_service_account_credentials, scopes=SHEETS_SCOPES,
+                 refresh_margin=TOKEN_REFRESH_MARGIN, handle_ttl=HANDLE_TTL, backend=None):
+        self._credentials_factory = credentials_factory
+        self.scopes = scopes
+        self._refresh_margin = refresh_margin
+        self._handle_ttl = handle_ttl
+        self.backend = backend or get_cache_backend()
+        self._generation = self.backend.generation()
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._credentials = None
+        self._client = None
+        self._spreadsheets = {}  # spreadsheet_id -> (Spreadsheet, opened_at)
+        self._worksheets = {}    # (spreadsheet_id, title) -> (Worksheet, opened_at)
+        self._headers = {}       # (spreadsheet_id, title) -> (header row, fetched_at)
+        self._refresh_thread = None
+        self._last_refresh = None
+        self._last_refresh_error = None
+
+    def _ensure_process(self):
+        # หลัง fork (gunicorn --preload) thread และ session เดิมใช้ไม่ได้
+        if self._pid != os.getpid():
+            self._reset()
+
+    @property
+    def client(self):
+        """gspread.Client ที่ authorize แล้ว (สร้างครั้งแรกเมื่อถูกเรียกใช้)"""
+        with self._lock:
+            self._ensure_process()
+            if self._client is None:
+                self._credentials = self._credentials_factory(self.scopes)
+                self._refresh_credentials(self._credentials)
+                self._client = gspread.authorize(self._credentials)
+                self._start_refresh_thread()
+            return self._client
+
+    def _refresh_credentials(self, credentials):
+        try:
+            credentials.refresh(Request())
+            self._last_refresh = datetime.now()
+            self._last_refresh_error = None
+        except Exception as e:
+            # ไม่ raise - AuthorizedSession จะ refresh เองตอน request ถัดไป
+            self._last_refresh_error = str(e)
+            print(f"⚠️ Failed to refresh Google Sheets token: {e}")
+
+    def _seconds_until_refresh(self):
+        expiry = self._credentials.expiry if self._credentials else None
+        if expiry is None:
+            return self._refresh_margin
+        # google-auth เก็บ expiry เป็น naive UTC
+        remaining = (expiry - datetime.utcnow()).total_seconds()
+        return max(remaining - self._refresh_margin, 5)
+
+    def _start_refresh_thread(self):
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+
+        def refresh_loop():
+            while True:
+                time.sleep(self._seconds_until_refresh())
+                with self._lock:
+                    if self._pid != os.getpid() or self._credentials is None:
+                        return
+                    credentials = self._credentials
+                # refresh เป็น network call ห้ามถือ lock ไว้ (client/get_worksheet/status จะค้างตาม)
+                # google-auth สลับ token ในตัว credentials เอง request อื่นใช้ token เดิมได้จนกว่าจะเสร็จ
+                self._refresh_credentials(credentials)
+
+        self._refresh_thread = threading.Thread(
+            target=refresh_loop, name='sheets-token-refresh', daemon=True
+        )
+        self._refresh_thread.start()
+
+    def _is_fresh(self, opened_at):
+        return time.monotonic() - opened_at < self._handle_ttl
+
+    def _check_generation(self):
+        generation = self.backend.generation()
+        if generation != self._generation:
+            self.invalidate()
+            self._generation = generation
+
+    def get_spreadsheet(self, spreadsheet_id):
+        """เปิด spreadsheet (ใช้ handle ที่ cache ไว้ถ้ายังไม่หมดอายุ)"""
+        self._check_generation()
+        client = self.client
+        with self._lock:
+            cached = self._spreadsheets.get(spreadsheet_id)
+            if cached and self._is_fresh(cached[1]):
+                return cached[0]
+
+        spreadsheet = client.open_by_key(spreadsheet_id)
+
+        with self._lock:
+            self._spreadsheets[spreadsheet_id] = (spreadsheet, time.monotonic())
+        return spreadsheet
+
+    def get_worksheet(self, spreadsheet_id, title):
+        """เปิด worksheet ตามชื่อ
+
+        Raises:
+            gspread.exceptions.WorksheetNotFound: ถ้าไม่พบ sheet
+        """
+        key = (spreadsheet_id, title)
+        self._check_generation()
+        with self._lock:
+            self._ensure_process()
+            cached = self._worksheets.get(key)
+            if cached and self._is_fresh(cached[1]):
+                return cached[0]
+
+        worksheet = self.get_spreadsheet(spreadsheet_id).worksheet(title)
+
+        with self._lock:
+            self._worksheets[key] = (worksheet, time.monotonic())
+        return worksheet
+
+    def get_worksheet_with_fallback(self, spreadsheet_id, titles):
+        """เปิด worksheet โดยลองหลายชื่อ (fallback)
+
+        ใช้ handle ที่ cache ไว้ก่อน ถ้าไม่มีจะดึงรายชื่อ worksheet ทั้งหมด
+        ครั้งเดียวแล้ว cache ทุก sheet ไว้
+
+        Raises:
+            ValueError: ถ้าไม่พบ sheet ใดเลย
+        """
+        self._check_generation()
+        with self._lock:
+            self._ensure_process()
+            for title in titles:
+                cached = self._worksheets.get((spreadsheet_id, title))
+                if cached and self._is_fresh(cached[1]):
+                    return cached[0]
+
+        worksheets = self.get_spreadsheet(spreadsheet_id).worksheets()
+        opened_at = time.monotonic()
+
+        with self._lock:
+            for worksheet in worksheets:
+                self._worksheets[(spreadsheet_id, worksheet.title)] = (worksheet, opened_at)
+
+        by_title = {worksheet.title: worksheet for worksheet in worksheets}
+        for title in titles:
+            if title in by_title:
+                return by_title[title]
+
+        available_sheets = list(by_title)
+        raise ValueError(f"ไม่พบ sheet ที่ต้องการ. ลอง: {titles}. Sheets ที่มี: {available_sheets}")
+
+    def get_header(self, worksheet):
+        """header (แถว 1) ของ worksheet ที่ cache ไว้ ใช้แปลงชื่อคอลัมน์เป็นตัวอักษร"""
+        key = (worksheet.spreadsheet.id, worksheet.title)
+        self._check_generation()
+        with self._lock:
+            cached = self._headers.get(key)
+            if cached and self._is_fresh(cached[1]):
+                return cached[0]
+
+        header = worksheet.row_values(1)
+        self._remember_header(worksheet, header)
+        return header
+
+    def _remember_header(self, worksheet, header):
+        with self._lock:
+            self._headers[(worksheet.spreadsheet.id, worksheet.title)] = (header, time.monotonic())
+
+    @staticmethod
+    def resolve_columns(header, columns):
+        """แปลงคอลัมน์ที่ต้องการเป็น index ใน header
+
+        Args:
+            header: header ของ sheet
+            columns: list ของชื่อ header (str) หรือ index ของคอลัมน์ (int, เริ่ม 0)
+
+        Raises:
+            MissingColumnsError: ถ้ามีชื่อที่ไม่อยู่ใน header
+        """
+        indexes = []
+        missing = []
+        for column in columns:
+            if isinstance(column, int):
+                indexes.append(column)
+            elif column in header:
+                indexes.append(header.index(column))
+            else:
+                missing.append(column)
+        if missing:
+            raise MissingColumnsError(missing, header)
+        return indexes
+
+    def fetch_columns(self, worksheet, columns, first_row=2):
+        """ดึงเฉพาะคอลัมน์ที่ต้องการตั้งแต่ first_row ถึงท้าย sheet ใน values_batch_get ครั้งเดียว
+
+        ขอ header มาใน batch เดียวกันด้วย ถ้า header เปลี่ยน (คอลัมน์ถูกย้าย)
+        จะ resolve ใหม่แล้วดึงอีกครั้ง
+
+        Args:
+            worksheet: gspread Worksheet
+            columns: list ของชื่อ header หรือ index ของคอลัมน์
+            first_row: แถวแรกที่ต้องการ (1-indexed)
+
+        Returns:
+            tuple: (header ของ sheet, ชื่อของคอลัมน์ที่ได้, list ของค่าแต่ละคอลัมน์)
+
+        Raises:
+            MissingColumnsError: ถ้ามีชื่อที่ไม่อยู่ใน header
+        """
+        header = self.get_header(worksheet)
+        title = quote_sheet_title(worksheet.title)
+
+        for attempt in range(2):
+            resolved_header = header
+            indexes = self.resolve_columns(resolved_header, columns)
+            ranges = [f"{title}!1:1"] + [
+                f"{title}!{column_letter(index)}{first_row}:{column_letter(index)}" for index in indexes
+            ]
+            value_ranges = worksheet.spreadsheet.values_batch_get(
+                ranges, params={'majorDimension': 'COLUMNS'}
+            ).get('valueRanges', [])
+
+            header = [cell[0] if cell else '' for cell in value_ranges[0].get('values', [])]
+            if trim_row(header) == trim_row(resolved_header):
+                break
+            print(f"🔄 Header of '{worksheet.title}' changed, resolving columns again")
+            self._remember_header(worksheet, header)
+
+        names = [resolved_header[index] if index < len(resolved_header) else '' for index in indexes]
+        values = [(value_range.get('values') or [[]])[0] for value_range in value_ranges[1:]]
+        return resolved_header, names, values
+
+    def invalidate(self, spreadsheet_id=None):
+        """ลบ handle ที่ cache ไว้ (ทั้งหมด หรือเฉพาะ spreadsheet เดียว)"""
+        with self._lock:
+            if spreadsheet_id is None:
+                self._spreadsheets.clear()
+                self._worksheets.clear()
+                self._headers.clear()
+                return
+            self._spreadsheets.pop(spreadsheet_id, None)
+            for cache in (self._worksheets, self._headers):
+                for key in [k for k in cache if k[0] == spreadsheet_id]:
+                    del cache[key]
+
+    def status(self):
+        """สถานะสำหรับ /health"""
+        with self._lock:
+            expiry = self._credentials.expiry if self._credentials else None
+            return {
+                'authorized': self._client is not None,
+                'token_expiry': expiry.isoformat() + 'Z' if expiry else None,
+                'last_refresh': self._last_refresh.isoformat() if self._last_refresh else None,
+                'last_refresh_error': self._last_refresh_error,
+                'cached_spreadsheets': len(self._spreadsheets),
+                'cached_worksheets': len(self._worksheets),
+                'cached_headers': len(self._headers)
+            }
+
+
+_registries = {}  # readonly -> SheetsClientRegistry
+_registry_lock = threading.Lock()
+
+
+def get_sheets_registry(readonly=False):
+    """คืน SheetsClientRegistry ตัวเดียวของ process ต่อชุดสิทธิ์
+
+    Args:
+        readonly: True สำหรับการอ่าน (spreadsheets.readonly/drive.readonly),
+                  False สำหรับการเขียน call matrix
+    """
+    with _registry_lock:
+        if readonly not in _registries:
+            _registries[readonly] = SheetsClientRegistry(
+                scopes=SHEETS_READONLY_SCOPES if readonly else SHEETS_SCOPES
+            )
+        return _registries[readonly]
@@ -0,0 +1,615 @@
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from psycopg2 import Error, OperationalError, sql
+from psycopg2.extras import Json, execute_values
+
+from db_connection import get_db_pool
+from services.call_log import CALL_LOG_SHEET_NAMES, get_call_log_reader
+from services.call_log_columns import epoch_day_to_date, parse_datetime_column, parse_duration_column
+from services.call_matrix_index import (
+    MIN_DURATION_SECONDS, REQUIRED_COLUMNS, SLOT_HOURS, TARGET_AGENTS, TIME_SLOTS, DayBucket
+)
+from services.sheet_snapshots import get_snapshot_cache
+
+
+SHEETS_READ_MODEL_ENABLED = os.getenv('SHEETS_READ_MODEL_ENABLED', 'false').lower() == 'true'
+SHEETS_READ_MODEL_SCHEMA = os.getenv('SHEETS_READ_MODEL_SCHEMA', 'sheets_mirror')
+# sync ตารางจาก sheet ทุกกี่วินาที
+SHEETS_READ_MODEL_SYNC_INTERVAL = int(os.getenv('SHEETS_READ_MODEL_SYNC_INTERVAL', os.getenv('SHEETS_SNAPSHOT_TTL', 30)))
+# ตารางที่ไม่ได้ sync นานกว่านี้ (วินาที) ถือว่าเก่า route จะกลับไปอ่านจาก Google Sheets
+SHEETS_READ_MODEL_MAX_LAG = int(os.getenv('SHEETS_READ_MODEL_MAX_LAG', SHEETS_READ_MODEL_SYNC_INTERVAL * 4))
+# หลังเชื่อมต่อ PostgreSQL ไม่ได้ ข้าม read model ไปกี่วินาที (ไม่ให้ทุก request รอ connect timeout)
+SHEETS_READ_MODEL_RETRY_AFTER = 30
+
+# Column projections ที่ routes และ sync อ่าน
+FILM_CONTACT_COLUMNS = ['ผู้ติดต่อ', 'วันที่ได้นัด consult', 'วันที่ได้นัดผ่าตัด']
+SHEETS_DATA_COLUMNS = [0, 1]  # 'เคสได้ชื่อเบอร์' คอลัมน์ A-B
+
+# ทุกตารางมี row_number (เลขแถวใน sheet) เป็น primary key
+SCHEMA_STATEMENTS = [
+    'CREATE SCHEMA IF NOT EXISTS {schema}',
+    """CREATE TABLE IF NOT EXISTS {schema}.sync_state (
+        sheet text PRIMARY KEY,
+        title text,
+        source_version text,
+        source_rows integer NOT NULL DEFAULT 0,
+        mirrored_rows integer NOT NULL DEFAULT 0,
+        stats jsonb,
+        synced_at timestamptz,
+        checked_at timestamptz
+    )""",
+    """CREATE TABLE IF NOT EXISTS {schema}.film_data (
+        row_number integer PRIMARY KEY,
+        contact_person text NOT NULL,
+        consult_date_raw text NOT NULL,
+        surgery_date_raw text NOT NULL,
+        consult_date date,
+        surgery_date date
+    )""",
+    'CREATE INDEX IF NOT EXISTS film_data_consult_date_idx ON {schema}.film_data (consult_date)',
+    'CREATE INDEX IF NOT EXISTS film_data_surgery_date_idx ON {schema}.film_data (surgery_date)',
+    """CREATE TABLE IF NOT EXISTS {schema}.call_log (
+        row_number integer PRIMARY KEY,
+        call_date date NOT NULL,
+        call_hour smallint NOT NULL,
+        agent text NOT NULL,
+        duration_seconds integer NOT NULL
+    )""",
+    'CREATE INDEX IF NOT EXISTS call_log_date_agent_idx ON {schema}.call_log (call_date, agent)',
+    """CREATE TABLE IF NOT EXISTS {schema}.named_cases (
+        row_number integer PRIMARY KEY,
+        case_date date NOT NULL,
+        date_raw text NOT NULL,
+        name_phone text NOT NULL
+    )""",
+    'CREATE INDEX IF NOT EXISTS named_cases_case_date_idx ON {schema}.named_cases (case_date)',
+    """CREATE TABLE IF NOT EXISTS {schema}.sale_incentive (
+        row_number integer PRIMARY KEY,
+        sale_date date NOT NULL,
+        sale_person text NOT NULL,
+        income double precision NOT NULL
+    )""",
+    'CREATE INDEX IF NOT EXISTS sale_incentive_sale_date_idx ON {schema}.sale_incentive (sale_date)',
+]
+
+TABLE_COLUMNS = {
+    'film_data': ['row_number', 'contact_person', 'consult_date_raw', 'surgery_date_raw', 'consult_date', 'surgery_date'],
+    'call_log': ['row_number', 'call_date', 'call_hour', 'agent', 'duration_seconds'],
+    'named_cases': ['row_number', 'case_date', 'date_raw', 'name_phone'],
+    'sale_incentive': ['row_number', 'sale_date', 'sale_person', 'income'],
+}
+
+
+class ReadModelUnavailable(Exception):
+    """read model ใช้ไม่ได้ (ปิดอยู่, ยังไม่ sync, ข้อมูลเก่าเกิน max lag หรือ PostgreSQL ล่ม)
+    ผู้เรียกควรอ่านจาก Google Sheets แทน
+    """
+
+
+def parse_sheet_date(value):
+    """แปลงวันที่จาก DD/MM/YYYY หรือ YYYY-MM-DD เป็น date (None ถ้า parse ไม่ได้)"""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        if '/' in value:
+            parts = value.split('/')
+            if len(parts) != 3:
+                return None
+            return date(int(parts[2]), int(parts[1]), int(parts[0]))
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def parse_sale_date(value):
+    """SaleDate ('2025-11-09 10:06:11' หรือ '2025-11-09') -> date"""
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def film_rows(values):
+    """แถวของตาราง film_data จาก projection FILM_CONTACT_COLUMNS (ข้ามแถวว่าง)"""
+    rows = []
+    for row_number, row in enumerate(values[1:], start=2):
+        contact, consult_raw, surgery_raw = (value.strip() for value in row[:3])
+        if not contact and not consult_raw and not surgery_raw:
+            continue
+        rows.append((row_number, contact, consult_raw, surgery_raw,
+                     parse_sheet_date(consult_raw), parse_sheet_date(surgery_raw)))
+    return rows
+
+
+def named_case_rows(values):
+    """แถวของตาราง named_cases จากคอลัมน์ A-B ของ 'เคสได้ชื่อเบอร์' (เฉพาะแถวที่มีวันที่)"""
+    rows = []
+    for row_number, row in enumerate(values[1:], start=2):
+        if not row:
+            continue
+        date_raw = row[0].strip()
+        case_date = parse_sheet_date(date_raw)
+        if case_date is None:
+            continue
+        rows.append((row_number, case_date, date_raw, row[1] if len(row) > 1 else ''))
+    return rows
+
+
+def sale_rows(values):
+    """แถวของตาราง sale_incentive จาก N_SaleIncentive (เฉพาะแถวที่ SaleDate ถูกต้อง)"""
+    headers = values[0] if values else []
+    columns = {header: index for index, header in enumerate(headers)}
+
+    def field(row, name, default=''):
+        index = columns.get(name)
+        return row[index] if index is not None and index < len(row) else default
+
+    rows = []
+    for row_number, row in enumerate(values[1:], start=2):
+        sale_date_raw = field(row, 'SaleDate').strip()
+        if not sale_date_raw:
+            continue
+        sale_date = parse_sale_date(sale_date_raw)
+        if sale_date is None:
+            continue
+        income_raw = field(row, 'InCome', '0')
+        try:
+            income = float(income_raw) if income_raw else 0
+        except ValueError:
+            income = 0
+        rows.append((row_number, sale_date, field(row, 'Sale').strip(), income))
+    return rows
+
+
+def row_fingerprint(row):
+    """ลายนิ้วมือของแถว ใช้ตรวจว่าแถวสุดท้ายที่ mirror ไว้ยังเหมือนเดิม"""
+    return hashlib.sha1('\x1f'.join(row).encode('utf-8')).hexdigest()
+
+
+class SheetsReadModel:
+    """Read model ของ Google Sheets ใน PostgreSQL (ตารางมี type และ index)
+
+    - sync_all() ดึง Film data, สรุป call_AI, เคสได้ชื่อเบอร์ และ N_SaleIncentive
+      จาก snapshot/call log ที่ใช้ร่วมกับ routes แล้วเขียนทับตารางใน transaction เดียวต่อ sheet
+      (ผู้อ่านเห็นข้อมูลชุดเก่าหรือชุดใหม่ทั้งชุด) ถ้า sheet ไม่เปลี่ยนจะไม่เขียนใหม่
+    - call log โตด้านล่างอย่างเดียว จึงเพิ่มเฉพาะแถวใหม่เมื่อแถวสุดท้ายที่ mirror ไว้ยังเหมือนเดิม
+    - query ใช้ index ของวันที่/agent และ GROUP BY ใน PostgreSQL เวลาตอบจึงไม่โตตามขนาด sheet
+    - ถ้าตารางเก่าเกิน max_lag หรือ PostgreSQL ใช้ไม่ได้ จะ raise ReadModelUnavailable
+    """
+
+    def __init__(self, pool=None, snapshots=None, call_log=None, schema=SHEETS_READ_MODEL_SCHEMA,
+                 enabled=SHEETS_READ_MODEL_ENABLED, sync_interval=SHEETS_READ_MODEL_SYNC_INTERVAL,
+                 max_lag=SHEETS_READ_MODEL_MAX_LAG):
+        self.pool = pool or get_db_pool()
+        self.snapshots = snapshots or get_snapshot_cache()
+        self.call_log = call_log or get_call_log_reader()
+        self.schema = schema
+        self.enabled = enabled
+        self.sync_interval = sync_interval
+        self.max_lag = max_lag
+        self.spreadsheet_id = os.getenv('GOOGLE_SPREADSHEET_ID')
+        self._schema_ready = False
+        self._call_log_seen = None  # (id ของ log, version) ตอน sync call log ครั้งล่าสุด
+        self._unavailable_until = 0
+        self.last_sync = {}
+        self.stats = {'queries': 0, 'fallbacks': 0, 'syncs': 0, 'unchanged': 0, 'rows_written': 0}
+
+    def _table(self, name):
+        return sql.Identifier(self.schema, name)
+
+    def source(self, table):
+        """ค่า 'source' ของ response ที่อ่านจากตารางนี้"""
+        return f"PostgreSQL ({self.schema}.{table})"
+
+    # ---------- sync ----------
+
+    def _ensure_schema(self, cursor):
+        if self._schema_ready:
+            return
+        for statement in SCHEMA_STATEMENTS:
+            cursor.execute(sql.SQL(statement).format(schema=sql.Identifier(self.schema)))
+        self._schema_ready = True
+
+    def _begin_sync(self, cursor, table):
+        # กันสอง worker เขียนตารางเดียวกันพร้อมกัน (lock หลุดเมื่อ commit/rollback)
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', (f"{self.schema}.sync",))
+        self._ensure_schema(cursor)
+        cursor.execute(
+            sql.SQL('SELECT source_version, source_rows FROM {} WHERE sheet = %s').format(self._table('sync_state')),
+            (table,)
+        )
+        return cursor.fetchone()
+
+    def _touch(self, cursor, table):
+        cursor.execute(
+            sql.SQL('UPDATE {} SET checked_at = now() WHERE sheet = %s').format(self._table('sync_state')),
+            (table,)
+        )
+
+    def _insert(self, cursor, table, rows):
+        if not rows:
+            return
+        query = sql.SQL('INSERT INTO {} ({}) VALUES %s').format(
+            self._table(table), sql.SQL(', ').join(sql.Identifier(name) for name in TABLE_COLUMNS[table])
+        )
+        execute_values(cursor, query.as_string(cursor), rows, page_size=1000)
+
+    def _put_state(self, cursor, table, title, version, source_rows, stats=None):
+        cursor.execute(sql.SQL('SELECT count(*) FROM {}').format(self._table(table)))
+        mirrored_rows = cursor.fetchone()[0]
+        cursor.execute(
+            sql.SQL(
+                'INSERT INTO {} (sheet, title, source_version, source_rows, mirrored_rows, stats, synced_at, checked_at) '
+                'VALUES (%s, %s, %s, %s, %s, %s, now(), now()) '
+                'ON CONFLICT (sheet) DO UPDATE SET title = EXCLUDED.title, source_version = EXCLUDED.source_version, '
+                'source_rows = EXCLUDED.source_rows, mirrored_rows = EXCLUDED.mirrored_rows, stats = EXCLUDED.stats, '
+                'synced_at = now(), checked_at = now()'
+            ).format(self._table('sync_state')),
+            (table, title, version, source_rows, mirrored_rows, stats)
+        )
+        return mirrored_rows
+
+    def _sync_snapshot(self, table, spreadsheet_id, sheet_name, columns, to_rows):
+        """เขียนทับตารางด้วย snapshot ของ sheet (ข้ามถ้า snapshot version เดิม)"""
+        snapshot = self.snapshots.get_snapshot(spreadsheet_id, sheet_name, columns=columns)
+        with self.pool.connection() as connection:
+            with connection.cursor() as cursor:
+                state = self._begin_sync(cursor, table)
+                if state is not None and state[0] == snapshot.version:
+                    self._touch(cursor, table)
+                    connection.commit()
+                    return None
+
+                rows = to_rows(snapshot.values)
+                # DELETE แทน TRUNCATE เพื่อไม่ block ผู้อ่านระหว่าง sync
+                cursor.execute(sql.SQL('DELETE FROM {}').format(self._table(table)))
+                self._insert(cursor, table, rows)
+                self._put_state(cursor, table, snapshot.title, snapshot.version, max(len(snapshot.values) - 1, 0))
+            connection.commit()
+        return len(rows)
+
+    def _sync_call_log(self):
+        """เพิ่มแถวใหม่ของ call log (เขียนทั้งตารางใหม่เมื่อแถวเดิมถูกแก้/ลบ)"""
+        log = self.call_log.get_log(self.spreadsheet_id, CALL_LOG_SHEET_NAMES, columns=REQUIRED_COLUMNS)
+        missing = [name for name in REQUIRED_COLUMNS if name not in log.header]
+        if missing:
+            raise ValueError(f"Missing required columns in '{log.title}': {', '.join(missing)}")
+        start_col, caller_col, duration_col = (log.header.index(name) for name in REQUIRED_COLUMNS)
+
+        rows = log.rows
+        total = len(rows)
+        seen = (id(log), log.version)
+
+        with self.pool.connection() as connection:
+            with connection.cursor() as cursor:
+                state = self._begin_sync(cursor, 'call_log')
+                start = None
+                if state is not None and self._call_log_seen in (None, seen):
+                    version, mirrored_total = state
+                    if mirrored_total <= total and (
+                            mirrored_total == 0 or row_fingerprint(rows[mirrored_total - 1]) == version):
+                        start = mirrored_total
+                if start == total:
+                    self._touch(cursor, 'call_log')
+                    connection.commit()
+                    self._call_log_seen = seen
+                    return None
+
+                if start is None:
+                    cursor.execute(sql.SQL('DELETE FROM {}').format(self._table('call_log')))
+                    start = 0
+
+                new_rows = rows[start:total]
+                epoch_days, hours = parse_datetime_column([row[start_col] for row in new_rows])
+                seconds = parse_duration_column([row[duration_col] for row in new_rows])
+                records = [
+                    (start + offset + 2, epoch_day_to_date(epoch_day), hour, row[caller_col].strip(), duration)
+                    for offset, (row, epoch_day, hour, duration) in enumerate(zip(new_rows, epoch_days, hours, seconds))
+                    if epoch_day >= 0
+                ]
+                self._insert(cursor, 'call_log', records)
+
+                # ยอดรวมทั้ง sheet แบบเดียวกับ CallMatrixIndex.counts (สำหรับ debug ของ /run-time)
+                cursor.execute(
+                    sql.SQL(
+                        'SELECT count(*) FILTER (WHERE agent <> ALL(%(agents)s)), '
+                        'count(*) FILTER (WHERE agent = ANY(%(agents)s) AND duration_seconds < %(min)s), '
+                        'count(*) FILTER (WHERE agent = ANY(%(agents)s) AND duration_seconds >= %(min)s), '
+                        'count(*) FROM {}'
+                    ).format(self._table('call_log')),
+                    {'agents': TARGET_AGENTS, 'min': MIN_DURATION_SECONDS}
+                )
+                wrong_caller, short, valid, mirrored = cursor.fetchone()
+                counts = {
+                    'total_rows': total,
+                    'valid': valid,
+                    'skipped_no_datetime': total - mirrored,
+                    'skipped_wrong_caller': wrong_caller,
+                    'skipped_duration': short
+                }
+                version = row_fingerprint(rows[total - 1]) if total else ''
+                self._put_state(cursor, 'call_log', log.title, version, total, Json(counts))
+            connection.commit()
+        self._call_log_seen = seen
+        return len(records)
+
+    def sync_all(self):
+        """sync ทุก sheet (job ของ prefetch scheduler)
+
+        Raises:
+            RuntimeError: ถ้ามี sheet ที่ sync ไม่สำเร็จ (sheet อื่นยัง sync ตามปกติ)
+        """
+        named_cases_spreadsheet = os.getenv('GOOGLE_SHEET_ID') or self.spreadsheet_id
+        jobs = [
+            ('film_data', lambda: self._sync_snapshot(
+                'film_data', self.spreadsheet_id, 'Film data', FILM_CONTACT_COLUMNS, film_rows)),
+            ('call_log', self._sync_call_log),
+            ('named_cases', lambda: self._sync_snapshot(
+                'named_cases', named_cases_spreadsheet, 'เคสได้ชื่อเบอร์', SHEETS_DATA_COLUMNS, named_case_rows)),
+            ('sale_incentive', lambda: self._sync_snapshot(
+                'sale_incentive', self.spreadsheet_id, 'N_SaleIncentive', None, sale_rows)),
+        ]
+
+        errors = []
+        for table, job in jobs:
+            started = time.monotonic()
+            try:
+                written = job()
+            except Exception as e:
+                errors.append(f"{table}: {e}")
+                self.last_sync[table] = {'at': datetime.now().isoformat(), 'error': str(e)}
+                continue
+            if written is None:
+                self.stats['unchanged'] += 1
+            else:
+                self.stats['syncs'] += 1
+                self.stats['rows_written'] += written
+            self.last_sync[table] = {
+                'at': datetime.now().isoformat(),
+                'rows_written': written or 0,
+                'duration_ms': round((time.monotonic() - started) * 1000),
+                'error': None
+            }
+
+        if errors:
+            raise RuntimeError('; '.join(errors))
+
+    # ---------- queries ----------
+
+    @contextmanager
+    def _reader(self, table):
+        """cursor สำหรับอ่าน table พร้อม sync state (ตรวจว่า sync ภายใน max_lag)
+
+        Raises:
+            ReadModelUnavailable: ถ้าใช้ read model ไม่ได้
+        """
+        if not self.enabled:
+            raise ReadModelUnavailable('Read model is disabled')
+        if time.monotonic() < self._unavailable_until:
+            raise ReadModelUnavailable('PostgreSQL was unreachable, retrying later')
+
+        try:
+            with self.pool.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        sql.SQL(
+                            'SELECT title, source_rows, mirrored_rows, stats, synced_at, '
+                            'checked_at >= now() - make_interval(secs => %s) FROM {} WHERE sheet = %s'
+                        ).format(self._table('sync_state')),
+                        (self.max_lag, table)
+                    )
+                    row = cursor.fetchone()
+                    if row is None or not row[5]:
+                        raise ReadModelUnavailable(f"{self.source(table)} is not synced")
+                    state = {
+                        'title': row[0],
+                        'source_rows': row[1],
+                        'mirrored_rows': row[2],
+                        'stats': row[3],
+                        'synced_at': row[4].isoformat()
+                    }
+                    yield cursor, state
+                connection.rollback()
+        except ReadModelUnavailable:
+            self.stats['fallbacks'] += 1
+            raise
+        except OperationalError as e:
+            self._unavailable_until = time.monotonic() + SHEETS_READ_MODEL_RETRY_AFTER
+            self.stats['fallbacks'] += 1
+            raise ReadModelUnavailable(str(e))
+        except Error as e:
+            # เช่นยังไม่เคยสร้างตาราง หรือ pool เต็ม
+            self.stats['fallbacks'] += 1
+            raise ReadModelUnavailable(str(e))
+        self.stats['queries'] += 1
+
+    def film_contacts(self, target_date=None, with_counts=False):
+        """แถวของ Film data (กรองด้วยวันที่นัด consult หรือวันที่นัดผ่าตัด)
+
+        Returns:
+            tuple: (rows, consult_counts, surgery_counts) counts คือ 'YYYY-MM-DD' -> จำนวน
+                (dict ว่างถ้า with_counts เป็น False)
+        """
+        table = self._table('film_data')
+        where = sql.SQL('')
+        params = []
+        if target_date:
+            where = sql.SQL(' WHERE (consult_date = %s OR surgery_date = %s)')
+            params = [target_date, target_date]
+
+        with self._reader('film_data') as (cursor, _):
+            cursor.execute(
+                sql.SQL(
+                    'SELECT row_number, contact_person, consult_date_raw, surgery_date_raw, consult_date, surgery_date '
+                    'FROM {}{} ORDER BY row_number'
+                ).format(table, where),
+                params
+            )
+            rows = [
+                {
+                    'id': f'film-{row_number}',
+                    'ผู้ติดต่อ': contact,
+                    'วันที่ได้นัด consult': consult_raw,
+                    'วันที่ได้นัดผ่าตัด': surgery_raw,
+                    'contact_person': contact,
+                    'consult_date': consult_raw,
+                    'consult_date_normalized': consult_date.isoformat() if consult_date else None,
+                    'surgery_appointment_date': surgery_raw,
+                    'surgery_appointment_date_normalized': surgery_date.isoformat() if surgery_date else None
+                }
+                for row_number, contact, consult_raw, surgery_raw, consult_date, surgery_date in cursor.fetchall()
+            ]
+
+            counts = []
+            for column in (['consult_date', 'surgery_date'] if with_counts else []):
+                conditions = [sql.SQL('{} IS NOT NULL').format(sql.Identifier(column))]
+                if target_date:
+                    conditions.insert(0, sql.SQL('(consult_date = %s OR surgery_date = %s)'))
+                cursor.execute(
+                    sql.SQL('SELECT {column}, count(*) FROM {table} WHERE {conditions} GROUP BY {column}').format(
+                        column=sql.Identifier(column), table=table, conditions=sql.SQL(' AND ').join(conditions)
+                    ),
+                    params
+                )
+                counts.append({day.isoformat(): count for day, count in cursor.fetchall()})
+
+        consult_counts, surgery_counts = counts or ({}, {})
+        return rows, consult_counts, surgery_counts
+
+    def named_cases(self, since, until, daily=False):
+        """เคสได้ชื่อเบอร์ ช่วง since-until (YYYY-MM-DD รวมทั้งสองวัน)
+
+        Returns:
+            dict: total, source_rows และ rows (list ของ {'date', 'namePhone'}) หรือ
+                daily_counts ('YYYY-MM-DD' -> จำนวน) ถ้า daily เป็น True
+        """
+        table = self._table('named_cases')
+        with self._reader('named_cases') as (cursor, state):
+            result = {'source_rows': state['source_rows']}
+            if daily:
+                cursor.execute(
+                    sql.SQL('SELECT case_date, count(*) FROM {} WHERE case_date BETWEEN %s AND %s '
+                            'GROUP BY case_date').format(table),
+                    (since, until)
+                )
+                result['daily_counts'] = {day.isoformat(): count for day, count in cursor.fetchall()}
+                result['total'] = sum(result['daily_counts'].values())
+            else:
+                cursor.execute(
+                    sql.SQL('SELECT date_raw, name_phone FROM {} WHERE case_date BETWEEN %s AND %s '
+                            'ORDER BY row_number').format(table),
+                    (since, until)
+                )
+                result['rows'] = [{'date': date_raw, 'namePhone': name_phone} for date_raw, name_phone in cursor.fetchall()]
+                result['total'] = len(result['rows'])
+        return result
+
+    def sales(self, month=None, year=None, with_summary=False):
+        """ยอดขายจาก N_SaleIncentive (ทั้งหมด หรือเฉพาะเดือน month/year)
+
+        Returns:
+            tuple: (rows, summary) summary คือยอดรวมต่อ Sale จาก GROUP BY (None ถ้า with_summary เป็น False)
+        """
+        table = self._table('sale_incentive')
+        where = sql.SQL('')
+        params = []
+        if month and year:
+            if not 1 <= month <= 12:
+                return [], [] if with_summary else None
+            where = sql.SQL(' WHERE sale_date >= %s AND sale_date < %s')
+            params = [date(year, month, 1), date(year + month // 12, month % 12 + 1, 1)]
+
+        with self._reader('sale_incentive') as (cursor, _):
+            cursor.execute(
+                sql.SQL('SELECT sale_person, sale_date, income FROM {}{} ORDER BY row_number').format(table, where),
+                params
+            )
+            rows = [
+                {
+                    'sale_person': sale_person,
+                    'sale_date': sale_date.isoformat(),
+                    'income': income,
+                    'day': sale_date.day,
+                    'month': sale_date.month,
+                    'year': sale_date.year
+                }
+                for sale_person, sale_date, income in cursor.fetchall()
+            ]
+
+            summary = None
+            if with_summary:
+                cursor.execute(
+                    sql.SQL('SELECT sale_person, count(*), sum(income) FROM {}{} GROUP BY sale_person '
+                            'ORDER BY sum(income) DESC, sale_person').format(table, where),
+                    params
+                )
+                summary = [
+                    {'sale_person': sale_person, 'sales': count, 'total_income': total}
+                    for sale_person, count, total in cursor.fetchall()
+                ]
+        return rows, summary
+
+    def call_matrix(self, start_date, end_date=None):
+        """ยอดสายต่อ agent ต่อช่วงเวลา ตั้งแต่ start_date ถึง end_date (GROUP BY ใน PostgreSQL)
+
+        Returns:
+            tuple: (DayBucket, state) state['stats'] คือยอดรวมทั้ง sheet แบบ CallMatrixIndex.counts
+        """
+        with self._reader('call_log') as (cursor, state):
+            if not state['source_rows']:
+                raise ReadModelUnavailable(f"{self.source('call_log')} is empty")
+            cursor.execute(
+                sql.SQL(
+                    'SELECT agent, call_hour, count(*) FROM {} '
+                    'WHERE call_date BETWEEN %s AND %s AND agent = ANY(%s) AND duration_seconds >= %s '
+                    'GROUP BY agent, call_hour'
+                ).format(self._table('call_log')),
+                (start_date, end_date or start_date, TARGET_AGENTS, MIN_DURATION_SECONDS)
+            )
+            cells = cursor.fetchall()
+
+        bucket = DayBucket()
+        slot_by_hour = dict(zip(SLOT_HOURS, TIME_SLOTS))
+        for agent, hour, count in cells:
+            bucket.matched += count
+            slot = slot_by_hour.get(hour)
+            if slot is None:
+                continue
+            bucket.matrix[agent][slot] += count
+            bucket.totals_by_agent[agent] += count
+            bucket.totals_by_slot[slot] += count
+            bucket.counted += count
+        return bucket, state
+
+    def status(self):
+        """สถานะสำหรับ /health (ไม่เปิด connection)"""
+        return {
+            'enabled': self.enabled,
+            'schema': self.schema,
+            'sync_interval': self.sync_interval,
+            'max_lag': self.max_lag,
+            'unavailable_for': max(round(self._unavailable_until - time.monotonic()), 0),
+            'last_sync': dict(self.last_sync),
+            'stats': dict(self.stats)
+        }
+
+
+_read_model = None
+_read_model_lock = threading.Lock()
+
+
+def get_sheets_read_model():
+    """คืน SheetsReadModel ตัวเดียวของ process"""
+    global _read_model
+    with _read_model_lock:
+        if _read_model is None:
+            _read_model = SheetsReadModel()
+        return _read_model
@@ -0,0 +1,95 @@
+"""
+ทดสอบ keyset cursor ของ /data_bjh (services/bjh_leads.py) โดยไม่ต้องต่อ PostgreSQL
+
+Run: python -m pytest test_bjh_leads.py   หรือ   python test_bjh_leads.py
+"""
+import base64
+import datetime as dt
+import json
+
+from services.bjh_leads import InvalidLeadsQuery, LeadsTableInfo, decode_cursor, encode_cursor
+
+FILTERS = {'status': 'new', 'source': 'facebook', 'doctor': None}
+ORDER_COLUMNS = ['created_at', 'id']
+
+
+def raises_invalid(func, *args):
+    try:
+        func(*args)
+    except InvalidLeadsQuery as e:
+        return str(e)
+    raise AssertionError('expected InvalidLeadsQuery')
+
+
+def test_cursor_round_trip():
+    """cursor ถอดกลับได้ค่า key เดิม (datetime เป็น ISO string) และเป็น string ที่ใส่ใน URL ได้"""
+    created_at = dt.datetime(2025, 11, 18, 9, 30, 15)
+    token = encode_cursor([created_at, 1042], FILTERS, ORDER_COLUMNS)
+
+    assert '=' not in token and '+' not in token and '/' not in token
+    assert decode_cursor(token, dict(FILTERS), ORDER_COLUMNS) == [str(created_at), 1042]
+    # filter ที่ไม่ได้ส่งมา (None) กับที่ไม่มีใน dict เทียบเท่ากัน
+    assert decode_cursor(token, {'status': 'new', 'source': 'facebook'}, ORDER_COLUMNS) == [str(created_at), 1042]
+
+
+def test_cursor_rejected_for_other_filters_or_order():
+    """cursor ที่สร้างจาก filter หรือการเรียงชุดอื่นใช้ไม่ได้ (ไม่งั้นจะข้ามหรือซ้ำแถว)"""
+    token = encode_cursor(['2025-11-18', 7], FILTERS, ORDER_COLUMNS)
+
+    for filters, order_columns in [
+        ({**FILTERS, 'status': 'closed'}, ORDER_COLUMNS),
+        ({**FILTERS, 'doctor': 'dr-a'}, ORDER_COLUMNS),
+        (FILTERS, ['id']),
+        (FILTERS, ['id', 'created_at'])
+    ]:
+        assert raises_invalid(decode_cursor, token, filters, order_columns) == \
+            'Cursor does not match the current filters'
+
+
+def test_broken_cursor_is_invalid():
+    """cursor ที่ถูกแก้หรือไม่ใช่ base64/JSON ได้ InvalidLeadsQuery ไม่ใช่ exception อื่น"""
+    token = encode_cursor([7], FILTERS, ['id'])
+
+    for broken in ['', 'not-a-cursor', token[:-3], token + '!!', 'eyJrIjogWzFdfQ']:
+        assert raises_invalid(decode_cursor, broken, FILTERS, ['id']) in (
+            'Invalid cursor', 'Cursor does not match the current filters'
+        )
+    # JSON ถูกรูปแบบแต่ k ไม่ใช่ list
+    fingerprint = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))['f']
+    for key_values in [5, None, {'id': 7}]:
+        forged = base64.urlsafe_b64encode(json.dumps({'k': key_values, 'f': fingerprint}).encode()).decode()
+        assert raises_invalid(decode_cursor, forged, FILTERS, ['id']) == 'Invalid cursor'
+    # key ไม่ครบตามจำนวนคอลัมน์ที่เรียง
+    short = encode_cursor([7], FILTERS, ORDER_COLUMNS)
+    assert raises_invalid(decode_cursor, short, FILTERS, ORDER_COLUMNS) == \
+        'Cursor does not match the current filters'
+
+
+def test_resolve_columns_reports_unknown_names():
+    """columns= ที่ไม่มีในตารางได้ error พร้อมรายชื่อคอลัมน์ที่ใช้ได้"""
+    info = LeadsTableInfo(['id', 'created_at', 'status'], ['id'])
+
+    assert info.resolve_columns(['status', 'id']) == ['status', 'id']
+    try:
+        info.resolve_columns(['id', 'phone', 'email'])
+    except InvalidLeadsQuery as e:
+        assert str(e) == 'Unknown column: phone, email'
+        assert e.available_columns == ['id', 'created_at', 'status']
+    else:
+        raise AssertionError('expected InvalidLeadsQuery')
+
+
+def main():
+    tests = [
+        test_cursor_round_trip,
+        test_cursor_rejected_for_other_filters_or_order,
+        test_broken_cursor_is_invalid,
+        test_resolve_columns_reports_unknown_names
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+ทดสอบ SQLiteCacheBackend (services/cache_backend.py) ด้วยไฟล์ SQLite ชั่วคราว
+
+Run: python -m pytest test_cache_backend.py   หรือ   python test_cache_backend.py
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from services.cache_backend import SQLiteCacheBackend
+
+
+def with_backends(test):
+    """เรียก test(backend, other) ด้วย backend สองตัวบนไฟล์เดียวกัน (เหมือนสอง worker)"""
+    def run():
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'cache.sqlite3')
+            test(SQLiteCacheBackend(path), SQLiteCacheBackend(path))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+
+@with_backends
+def test_add_lease_is_taken_once(backend, other):
+    """add() ที่แข่งกันหลาย thread และหลาย worker ได้ lease เพียงตัวเดียวจนกว่าจะหมดอายุ"""
+    results = []
+    barrier = threading.Barrier(8)
+
+    def take(cache):
+        barrier.wait()
+        results.append(cache.add('leases', 'job', os.getpid(), ttl=1))
+
+    threads = [threading.Thread(target=take, args=(cache,)) for cache in [backend, other] * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False] * 7 + [True]
+    assert not other.add('leases', 'job', 'again', ttl=1)
+
+    time.sleep(1.1)
+    assert other.add('leases', 'job', 'again', ttl=1)
+    assert backend.get('leases', 'job').value == 'again'
+
+
+@with_backends
+def test_lru_eviction_by_entries_and_bytes(backend, other):
+    """เกินจำนวนหรือขนาดที่กำหนดแล้ว entry ที่ถูกอ่านล่าสุดนานที่สุดถูกตัดก่อน"""
+    backend.TOUCH_INTERVAL = 0
+    backend.set_limits('pages', max_entries=2)
+    backend.set('pages', 'a', 'A', ttl=60)
+    backend.set('pages', 'b', 'B', ttl=60)
+    assert backend.get('pages', 'a').value == 'A'
+    backend.set('pages', 'c', 'C', ttl=60)
+
+    assert other.get('pages', 'b') is None
+    assert other.get('pages', 'a').value == 'A' and other.get('pages', 'c').value == 'C'
+
+    size = backend.set('blobs', 'x', b'0' * 1000, ttl=60)
+    backend.set_limits('blobs', max_bytes=size * 2)
+    backend.set('blobs', 'y', b'1' * 1000, ttl=60)
+    backend.set('blobs', 'z', b'2' * 1000, ttl=60)
+    assert other.get('blobs', 'x') is None
+
+    namespaces = other.status()['namespaces']
+    assert namespaces['pages']['entries'] == 2 and namespaces['pages']['evictions'] == 1
+    assert namespaces['blobs']['bytes'] <= size * 2 and namespaces['blobs']['evictions'] == 1
+
+
+@with_backends
+def test_clear_bumps_generation_for_every_worker(backend, other):
+    """clear() จาก worker หนึ่งลบข้อมูลและเพิ่ม generation ที่อีก worker เห็น"""
+    generation = other.generation()
+    backend.set('responses', 'key', {'rows': [1, 2]}, ttl=60)
+    assert other.get('responses', 'key').value == {'rows': [1, 2]}
+
+    backend.clear('responses')
+    assert other.get('responses', 'key') is None
+    assert other.generation() == generation + 1
+
+    other.clear()
+    assert backend.generation() == generation + 2
+
+
+@with_backends
+def test_purge_expired_counts_expirations(backend, other):
+    """purge_expired() ลบเฉพาะ entry ที่หมดอายุและนับเป็น expirations ของ namespace"""
+    backend.set('responses', 'new', 2, ttl=60)
+    backend.set('responses', 'old', 1, ttl=0.2)
+    backend.set('facebook_ads', 'old', 1, ttl=0.2)
+    time.sleep(0.3)
+
+    assert other.purge_expired() == 2
+    namespaces = backend.status()['namespaces']
+    assert namespaces['responses']['entries'] == 1 and namespaces['responses']['expirations'] == 1
+    assert namespaces['facebook_ads']['entries'] == 0 and namespaces['facebook_ads']['expirations'] == 1
+    assert backend.get('responses', 'new').value == 2
+
+
+def main():
+    tests = [
+        test_add_lease_is_taken_once,
+        test_lru_eviction_by_entries_and_bytes,
+        test_clear_bumps_generation_for_every_worker,
+        test_purge_expired_counts_expirations
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
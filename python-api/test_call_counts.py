@@ -0,0 +1,197 @@
+"""
+ทดสอบ CallCountStore (SQLite) โดยไม่ต้องต่อ Google Sheets
+
+Run: python -m pytest test_call_counts.py   หรือ   python test_call_counts.py
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from services.call_counts import CallCountStore
+
+TODAY = '2025-11-18'
+YESTERDAY = '2025-11-17'
+TOMORROW = '2025-11-19'
+
+
+def make_store(directory):
+    return CallCountStore(os.path.join(directory, 'call_counts.db'), today=lambda: TODAY)
+
+
+def call(agent_id='101', time_slot='9-10', call_date=TODAY, call_type='outgoing'):
+    return (agent_id, call_type, time_slot, time.time(), call_date)
+
+
+def with_store(test):
+    """เรียก test(store, directory) ด้วย store ใหม่ใน directory ชั่วคราว"""
+    def run():
+        directory = tempfile.mkdtemp()
+        try:
+            test(make_store(directory), directory)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+
+def _record_from_process(directory, calls):
+    store = make_store(directory)
+    for _ in range(calls):
+        store.record_calls([call()])
+
+
+@with_store
+def test_concurrent_record_calls_totals(store, directory):
+    """สายที่บันทึกพร้อมกันจากหลาย thread และหลาย process ต้องไม่หาย"""
+    store.set_values({('101', '9-10'): 0})
+    threads = [
+        threading.Thread(target=lambda: [store.record_calls([call()]) for _ in range(50)])
+        for _ in range(4)
+    ]
+    # spawn: fork ระหว่างที่ thread อื่นถือ lock ของ SQLite อยู่จะได้สถานะ lock ที่ค้างติดไปด้วย
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_record_from_process, args=(directory, 50)) for _ in range(3)]
+    for worker in threads + processes:
+        worker.start()
+    for worker in threads + processes:
+        worker.join()
+
+    assert all(process.exitcode == 0 for process in processes)
+    assert store.get('101', '9-10') == 350
+    assert store.day_counts(TODAY) == {('101', '9-10'): 350}
+
+
+@with_store
+def test_results_for_repeated_cells_in_one_batch(store, directory):
+    """แต่ละสายในช่องเดียวกันได้ค่าต่อเนื่องตามลำดับ สายของวันอื่นและช่องที่ยังไม่รู้ค่าได้ None"""
+    store.set_values({('101', '9-10'): 5, ('102', '9-10'): 0})
+    results = store.record_calls([
+        call('101'), call('102'), call('101'), call('101', call_date=YESTERDAY), call('101'), call('103')
+    ])
+
+    assert results == [6, 1, 7, None, 8, None]
+    assert store.get('101', '9-10') == 8
+    # สายย้อนหลังเก็บเป็น event แต่ไม่บวกเข้าตารางปัจจุบัน
+    assert store.day_counts(YESTERDAY) == {('101', '9-10'): 1}
+
+
+@with_store
+def test_seed_then_project(store, directory):
+    """สายที่บันทึกก่อนรู้ค่าใน sheet ถูกบวกกับค่าใน sheet แล้วเขียนเฉพาะช่องที่เปลี่ยน"""
+    sheet = {('101', '9-10'): 10, ('102', '9-10'): 3}
+    writes = []
+
+    def write(values):
+        writes.append(dict(values))
+        sheet.update(values)
+        return {}
+
+    assert store.needs_seed()
+    assert store.record_calls([call('101'), call('101'), call('999')]) == [None, None, None]
+
+    assert store.project(lambda: dict(sheet), write) == 1
+    assert writes == [{('101', '9-10'): 12}]
+    assert store.get('101', '9-10') == 12
+    # ช่องที่ไม่มีใน sheet ถูกทิ้ง
+    assert store.get('999', '9-10') is None
+    assert not store.needs_seed()
+
+    # รอบถัดไปไม่อ่าน sheet ซ้ำ และไม่มีอะไรต้องเขียน
+    assert store.project(lambda: {}, write) == 0
+    store.record_calls([call('102')])
+    assert store.project(lambda: {}, write) == 1
+    assert writes[-1] == {('102', '9-10'): 4}
+
+
+@with_store
+def test_compact_events_keeps_day_counts(store, directory):
+    """ยอดของวันหนึ่งต้องเท่าเดิมหลังสรุป event รายสายเป็นยอดรายวัน"""
+    store.record_calls([
+        call('101', '9-10', YESTERDAY), call('101', '9-10', YESTERDAY, 'incoming'),
+        call('102', '10-11', YESTERDAY, 'missed'), call('101', '9-10')
+    ])
+    before = store.day_counts(YESTERDAY)
+
+    assert store.compact_events(TODAY) == 3
+    assert store.day_counts(YESTERDAY) == before == {('101', '9-10'): 2, ('102', '10-11'): 1}
+    assert store.day_counts(TODAY) == {('101', '9-10'): 1}
+
+    # สายที่เข้ามาหลังสรุปแล้วรวมกับยอดที่สรุปไว้
+    store.record_calls([call('101', '9-10', YESTERDAY)])
+    assert store.day_counts(YESTERDAY) == {('101', '9-10'): 3, ('102', '10-11'): 1}
+    assert store.compact_events(TODAY) == 1
+    assert store.day_counts(YESTERDAY) == {('101', '9-10'): 3, ('102', '10-11'): 1}
+
+
+def test_counts_roll_over_at_midnight():
+    """ตารางเป็นยอดรายวัน: วันใหม่เริ่มจาก 0 และ sheet ถูกเขียน 0 แม้ยังไม่มีสายแรกของวัน"""
+    directory = tempfile.mkdtemp()
+    try:
+        clock = {'today': TODAY}
+        store = CallCountStore(os.path.join(directory, 'call_counts.db'), today=lambda: clock['today'])
+        sheet = {('101', '9-10'): 10, ('102', '9-10'): 3}
+        writes = []
+
+        def write(values):
+            writes.append(dict(values))
+            sheet.update(values)
+            return {}
+
+        store.record_calls([call('101'), call('101')])
+        store.project(lambda: dict(sheet), write)
+        assert sheet == {('101', '9-10'): 12, ('102', '9-10'): 3}
+
+        clock['today'] = TOMORROW
+        # flush รอบแรกหลังเที่ยงคืนตั้งทุกช่องที่ไม่ใช่ 0 เป็น 0 โดยไม่อ่าน sheet ใหม่
+        assert store.project(lambda: {}, write) == 2
+        assert sheet == {('101', '9-10'): 0, ('102', '9-10'): 0}
+        assert store.status()['counts_date'] == TOMORROW
+
+        # สายของวันใหม่นับจาก 0 สายย้อนหลังของเมื่อวานไม่กลับเข้าตาราง
+        assert store.record_calls([call('101', call_date=TOMORROW), call('101', call_date=TODAY)]) == [1, None]
+        store.project(lambda: {}, write)
+        assert writes[-1] == {('101', '9-10'): 1}
+        assert store.day_counts(TODAY) == {('101', '9-10'): 3}
+        assert store.rebuild_day(TOMORROW, sheet) == ({('101', '9-10'): 1, ('102', '9-10'): 0}, True)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_seed_after_roll_over_ignores_previous_day():
+    """ถ้ายังไม่เคย seed เมื่อวาน ค่าใน sheet วันนี้เป็นยอดเมื่อวาน ต้องไม่ถูกบวกเข้ายอดวันนี้"""
+    directory = tempfile.mkdtemp()
+    try:
+        clock = {'today': TODAY}
+        store = CallCountStore(os.path.join(directory, 'call_counts.db'), today=lambda: clock['today'])
+        store.record_calls([call('101'), call('101')])
+
+        clock['today'] = TOMORROW
+        assert store.record_calls([call('101', call_date=TOMORROW)]) == [1]
+
+        written = {}
+        store.project(lambda: {('101', '9-10'): 10, ('102', '9-10'): 3}, lambda values: written.update(values) or {})
+        assert written == {('101', '9-10'): 1, ('102', '9-10'): 0}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    tests = [
+        test_concurrent_record_calls_totals,
+        test_results_for_repeated_cells_in_one_batch,
+        test_seed_then_project,
+        test_compact_events_keeps_day_counts,
+        test_counts_roll_over_at_midnight,
+        test_seed_after_roll_over_ignores_previous_day
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
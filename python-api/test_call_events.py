@@ -0,0 +1,141 @@
+"""
+ทดสอบ group commit ของ CallEventWriter (services/call_events.py) ด้วย store ปลอมที่หน่วง commit ได้
+
+Run: python -m pytest test_call_events.py   หรือ   python test_call_events.py
+"""
+import threading
+import time
+
+from services.call_events import CallEventWriter
+
+TODAY = '2025-11-18'
+
+
+class GatedStore:
+    """store ปลอม: record_calls รอ gate เปิดก่อน commit และจำ batch ที่ commit แล้ว"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+        self.batches = []
+        self.error = None
+
+    def record_calls(self, events):
+        self.entered.set()
+        self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        self.batches.append(list(events))
+        return [event[0] for event in events]
+
+    @property
+    def recorded(self):
+        return [event for batch in self.batches for event in batch]
+
+
+def call(agent_id):
+    return (agent_id, 'outgoing', '9-10', time.time(), TODAY)
+
+
+def append_in_thread(writer, event, timeout, outcomes):
+    def run():
+        try:
+            outcomes[event[0]] = writer.append(event, timeout=timeout)
+        except Exception as e:
+            outcomes[event[0]] = e
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_concurrent_appends_share_one_commit():
+    """สายที่เข้ามาภายใน group_commit_ms commit ใน transaction เดียว แต่ละสายได้ผลของตัวเอง"""
+    store = GatedStore()
+    writer = CallEventWriter(store, group_commit_ms=200)
+    outcomes = {}
+
+    threads = [append_in_thread(writer, call(f"agent-{i}"), 5, outcomes) for i in range(10)]
+    for thread in threads:
+        thread.join()
+
+    assert outcomes == {f"agent-{i}": f"agent-{i}" for i in range(10)}
+    assert len(store.batches) == 1
+    assert writer.stats['commits'] == 1 and writer.stats['largest_batch'] == 10
+
+
+def test_timed_out_event_is_cancelled_not_recorded():
+    """สายที่ writer ยังไม่หยิบไปภายใน timeout ถูกยกเลิก ได้ TimeoutError และไม่ถูกบันทึกภายหลัง"""
+    store = GatedStore()
+    store.gate.clear()
+    writer = CallEventWriter(store, group_commit_ms=0)
+    outcomes = {}
+
+    first = append_in_thread(writer, call('first'), 5, outcomes)
+    assert store.entered.wait(5)  # writer ติดอยู่ใน commit ของ 'first'
+
+    try:
+        writer.append(call('late'), timeout=0.2)
+    except TimeoutError as e:
+        assert 'safe to retry' in str(e)
+    else:
+        raise AssertionError('expected TimeoutError')
+    assert writer.stats['cancelled'] == 1
+
+    store.gate.set()
+    first.join()
+    # retry หลัง timeout นับสายเดียว
+    assert writer.append(call('retry'), timeout=5) == 'retry'
+    assert [event[0] for event in store.recorded] == ['first', 'retry']
+    assert outcomes['first'] == 'first'
+
+
+def test_claimed_event_waits_for_its_commit():
+    """สายที่อยู่ใน commit แล้วไม่ถูกยกเลิกเมื่อเกิน timeout แต่รอจน commit นั้นเสร็จ"""
+    store = GatedStore()
+    store.gate.clear()
+    writer = CallEventWriter(store, group_commit_ms=0)
+    outcomes = {}
+
+    thread = append_in_thread(writer, call('slow'), 0.5, outcomes)
+    assert store.entered.wait(5)
+    time.sleep(0.8)  # เลย timeout ของผู้เรียกระหว่างที่ commit ยังไม่เสร็จ
+    store.gate.set()
+    thread.join()
+
+    assert outcomes == {'slow': 'slow'}
+    assert writer.stats['cancelled'] == 0
+    assert [event[0] for event in store.recorded] == ['slow']
+
+
+def test_commit_error_reaches_every_event_in_batch():
+    """commit ที่ล้มเหลวส่ง exception ให้ทุกสายในรอบนั้น และ writer ยังทำงานต่อได้"""
+    store = GatedStore()
+    store.error = RuntimeError('database is locked')
+    writer = CallEventWriter(store, group_commit_ms=200)
+    outcomes = {}
+
+    threads = [append_in_thread(writer, call(name), 5, outcomes) for name in ('a', 'b')]
+    for thread in threads:
+        thread.join()
+    assert all(outcome is store.error for outcome in outcomes.values()) and len(outcomes) == 2
+    assert writer.stats['errors'] == 1
+
+    store.error = None
+    assert writer.append(call('c'), timeout=5) == 'c'
+
+
+def main():
+    tests = [
+        test_concurrent_appends_share_one_commit,
+        test_timed_out_event_is_cancelled_not_recorded,
+        test_claimed_event_waits_for_its_commit,
+        test_commit_error_reaches_every_event_in_batch
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+ทดสอบการ parse คอลัมน์ของ Call Log (services/call_log_columns.py)
+
+Run: python -m pytest test_call_log_columns.py   หรือ   python test_call_log_columns.py
+"""
+from services.call_log_columns import date_to_epoch_day, epoch_day_to_date, parse_datetime_column
+
+
+def test_parse_datetime_column_iso_format():
+    """'YYYY-MM-DD H:MM:SS' (ชั่วโมงหลักเดียวหรือสองหลัก)"""
+    epoch_days, hours = parse_datetime_column(['2025-11-18 9:05:00', '2025-11-18 17:59:59', '2025-1-2 10:00'])
+
+    assert [epoch_day_to_date(day) for day in epoch_days] == ['2025-11-18', '2025-11-18', '2025-01-02']
+    assert hours == [9, 17, 10]
+
+
+def test_parse_datetime_column_day_first_format():
+    """'DD/MM/YYYY, HH:MM:SS' เป็นวัน/เดือน/ปี ไม่ใช่เดือน/วัน"""
+    epoch_days, hours = parse_datetime_column(['18/11/2025, 09:15:00', '2/1/2025, 19:00:00', ' 18/11/2025,13:00'])
+
+    assert [epoch_day_to_date(day) for day in epoch_days] == ['2025-11-18', '2025-01-02', '2025-11-18']
+    assert hours == [9, 19, 13]
+
+
+def test_parse_datetime_column_mixed_formats_agree():
+    """วันเดียวกันในสองรูปแบบได้ epoch day เดียวกัน"""
+    epoch_days, _ = parse_datetime_column(['2025-11-18 9:00:00', '18/11/2025, 09:00:00'])
+
+    assert epoch_days[0] == epoch_days[1] == date_to_epoch_day('2025-11-18')
+
+
+def test_parse_datetime_column_invalid_values():
+    """ค่าที่ parse ไม่ได้ (รวมวันที่ที่ไม่มีจริง) ได้ -1 ทั้งวันและชั่วโมง"""
+    epoch_days, hours = parse_datetime_column(['', 'n/a', '2025-11-18', '31/02/2025, 10:00:00', '2025-13-01 10:00'])
+
+    assert epoch_days == [-1, -1, -1, -1, -1]
+    assert hours == [-1, -1, -1, -1, -1]
+
+
+def main():
+    tests = [
+        test_parse_datetime_column_iso_format,
+        test_parse_datetime_column_day_first_format,
+        test_parse_datetime_column_mixed_formats_agree,
+        test_parse_datetime_column_invalid_values
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
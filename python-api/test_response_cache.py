@@ -0,0 +1,194 @@
+"""
+ทดสอบ ResponseCache (services/response_cache.py) ด้วย Flask test client และ cache ในหน่วยความจำ
+
+Run: python -m pytest test_response_cache.py   หรือ   python test_response_cache.py
+"""
+import gzip
+import json
+import time
+
+from flask import Flask, jsonify, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from services.cache_backend import InProcessCacheBackend
+from services.response_cache import ResponseCache
+
+
+def make_app(cache, ttl=60, stale_ttl=60):
+    """app ที่มี route /data ผ่าน cache คืน (app, list ของ request ที่ถึง route จริง)"""
+    app = Flask(__name__)
+    calls = []
+
+    @app.route('/data', methods=['GET', 'POST'])
+    @cache.cached(ttl=ttl, stale_ttl=stale_ttl)
+    def data():
+        calls.append(request.args.to_dict())
+        if request.args.get('fail'):
+            return jsonify({'success': False, 'error': 'upstream failed'})
+        return jsonify({'success': True, 'call': len(calls), 'rows': ['row'] * 200})
+
+    return app, calls
+
+
+def test_query_order_does_not_change_key():
+    """ลำดับ query parameter และ no_cache ไม่มีผลกับ key ค่าที่ต่างกันได้ entry แยก"""
+    app, calls = make_app(ResponseCache(InProcessCacheBackend()))
+    client = app.test_client()
+
+    miss = client.get('/data?a=1&b=2')
+    hit = client.get('/data?b=2&a=1')
+    assert miss.headers['X-Cache'] == 'MISS' and miss.get_json()['cached'] is False
+    assert hit.headers['X-Cache'] == 'HIT' and hit.get_json()['cached'] is True
+    assert hit.get_json()['call'] == 1
+
+    assert client.get('/data?a=1&b=3').headers['X-Cache'] == 'MISS'
+    assert len(calls) == 2
+
+    # no_cache=true ข้าม cache ทั้งอ่านและเขียน
+    assert 'X-Cache' not in client.get('/data?a=1&b=2&no_cache=true').headers
+    assert len(calls) == 3
+
+
+def test_json_body_is_part_of_key():
+    """body JSON เดียวกัน (ลำดับ key ไม่มีผล) ใช้ entry เดียวกัน body ต่างกันได้ entry แยก"""
+    app, calls = make_app(ResponseCache(InProcessCacheBackend()))
+    client = app.test_client()
+
+    assert client.post('/data', json={'a': 1, 'b': 2}).headers['X-Cache'] == 'MISS'
+    assert client.post('/data', data=json.dumps({'b': 2, 'a': 1}),
+                       content_type='application/json').headers['X-Cache'] == 'HIT'
+    assert client.post('/data', json={'a': 1, 'b': 3}).headers['X-Cache'] == 'MISS'
+    assert len(calls) == 2
+
+
+def test_failures_are_not_cached():
+    """response ที่มี success=False ไม่ถูก cache"""
+    app, calls = make_app(ResponseCache(InProcessCacheBackend()))
+    client = app.test_client()
+
+    client.get('/data?fail=1')
+    response = client.get('/data?fail=1')
+    assert 'X-Cache' not in response.headers
+    assert len(calls) == 2
+
+
+def test_lru_bound_evicts_least_recently_used():
+    """เกิน max_entries แล้ว entry ที่ใช้ล่าสุดนานที่สุดถูกตัดก่อน"""
+    app, calls = make_app(ResponseCache(InProcessCacheBackend(), max_entries=2))
+    client = app.test_client()
+
+    client.get('/data?page=a')
+    client.get('/data?page=b')
+    assert client.get('/data?page=a').headers['X-Cache'] == 'HIT'
+    client.get('/data?page=c')  # ตัด b (a เพิ่งถูกใช้)
+
+    assert client.get('/data?page=a').headers['X-Cache'] == 'HIT'
+    assert client.get('/data?page=b').headers['X-Cache'] == 'MISS'
+    assert len(calls) == 4
+
+
+def test_entry_expires_after_route_ttl():
+    """หลัง ttl ของ route (ไม่มี stale_ttl) ต้องคำนวณใหม่ และ metadata บอกอายุที่เหลือ"""
+    app, calls = make_app(ResponseCache(InProcessCacheBackend()), ttl=1, stale_ttl=0)
+    client = app.test_client()
+
+    assert client.get('/data').headers['X-Cache-Expires-In'] == '1'
+    hit = client.get('/data')
+    assert hit.headers['X-Cache'] == 'HIT' and hit.headers['Age'] == '0'
+
+    time.sleep(1.1)
+    assert client.get('/data').headers['X-Cache'] == 'MISS'
+    assert len(calls) == 2
+
+
+def test_stale_entry_is_served_then_revalidated():
+    """หลัง ttl ได้ค่าเดิม (STALE) ทันที แล้ว refresh ใน background ครั้งเดียวให้ request ถัดไปได้ค่าใหม่"""
+    app, calls = make_app(ResponseCache(InProcessCacheBackend()), ttl=1, stale_ttl=60)
+    client = app.test_client()
+
+    client.get('/data')
+    time.sleep(1.1)
+    stale = client.get('/data')
+    again = client.get('/data')
+    assert stale.headers['X-Cache'] == 'STALE' and stale.headers['X-Cache-Expires-In'] == '0'
+    assert stale.get_json()['call'] == 1 and again.get_json()['call'] == 1
+
+    deadline = time.time() + 5
+    while len(calls) < 2 and time.time() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.1)
+
+    fresh = client.get('/data')
+    assert fresh.headers['X-Cache'] == 'HIT' and fresh.get_json()['call'] == 2
+    # STALE สองครั้งติดกันสั่ง refresh แค่ครั้งเดียว
+    assert len(calls) == 2
+
+
+def test_hit_serves_precompressed_variants():
+    """cache hit ส่งฉบับ br/gzip ตาม Accept-Encoding ทุกฉบับ decode แล้วได้ JSON เดียวกัน"""
+    app, calls = make_app(ResponseCache(InProcessCacheBackend()))
+    client = app.test_client()
+
+    miss = client.get('/data')
+    assert 'Content-Encoding' not in miss.headers
+
+    identity = client.get('/data', headers={'Accept-Encoding': 'identity'})
+    gzipped = client.get('/data', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in identity.headers
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    for response in (identity, gzipped):
+        assert response.headers['X-Cache'] == 'HIT'
+        assert 'Accept-Encoding' in response.headers['Vary']
+
+    expected = identity.get_json()
+    assert expected['cached'] is True
+    assert json.loads(gzip.decompress(gzipped.data)) == expected
+
+    if brotli is not None:
+        brotlied = client.get('/data', headers={'Accept-Encoding': 'gzip, br'})
+        assert brotlied.headers['Content-Encoding'] == 'br'
+        assert json.loads(brotli.decompress(brotlied.data)) == expected
+
+    assert len(calls) == 1
+
+
+def test_small_body_is_not_compressed():
+    """body ที่เล็กกว่าเกณฑ์ส่งแบบไม่บีบอัดและไม่มี Vary: Accept-Encoding"""
+    app = Flask(__name__)
+    cache = ResponseCache(InProcessCacheBackend())
+
+    @app.route('/small')
+    @cache.cached(ttl=60)
+    def small():
+        return jsonify({'success': True})
+
+    client = app.test_client()
+    client.get('/small')
+    hit = client.get('/small', headers={'Accept-Encoding': 'gzip, br'})
+    assert hit.headers['X-Cache'] == 'HIT'
+    assert 'Content-Encoding' not in hit.headers and 'Vary' not in hit.headers
+    assert hit.get_json() == {'success': True, 'cached': True}
+
+
+def main():
+    tests = [
+        test_query_order_does_not_change_key,
+        test_json_body_is_part_of_key,
+        test_failures_are_not_cached,
+        test_lru_bound_evicts_least_recently_used,
+        test_entry_expires_after_route_ttl,
+        test_stale_entry_is_served_then_revalidated,
+        test_hit_serves_precompressed_variants,
+        test_small_body_is_not_compressed
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -116,7 +116,7 @@ def test_facebook_ads_cached():
         data = response.json()
         print(f"Success: {data.get('success')}")
         print(f"✅ Cached: {data.get('cached')}")
-        print(f"Cache Expires In: {data.get('cache_expires_in')}s")
+        print(f"Cache Expires In: {response.headers.get('X-Cache-Expires-In')}s")
         print(f"Total Records: {data.get('total_records')}")
     else:
         print(f"Error: {response.text}")